@@ -7,6 +7,11 @@ points_files = {
         "มิถุนายน": "มิถุนา.kml",
     }
 
+site_files = [
+        "SiteTest001.kml",
+        "RawData/U1 Site PN-DN.kml",
+    ]
+
 redlines_files = [
         "A/ยังไม่ได้แยก/U1/BJ 3007.kml",
         "A/ยังไม่ได้แยก/U1/CMI0072_DN-CMI1000_DN.kml",
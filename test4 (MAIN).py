@@ -5,9 +5,9 @@ from pyproj import Transformer
 from tqdm import tqdm
 from collections import defaultdict
 from pyproj import CRS
-from visualize import visualize_kml_data_interactive
 from shapely.ops import unary_union
 import os
+from utils.main_controller.corridor_engine import corridor_match_indices
 
 def make_project_fn(lon, lat):
     """สร้าง projection function สำหรับแปลง WGS84 -> UTM"""
@@ -112,8 +112,9 @@ def count_faults_per_redline(points, redlines, redlines_files, threshold_m):
             "lines": file_lines
         })
     
-    # วิเคราะห์แต่ละไฟล์
-    for file_data in tqdm(lines_per_file, desc="ตรวจสอบแต่ละไฟล์"):
+    # รวมเส้นทั้งหมดในแต่ละไฟล์เป็น geometry เดียว
+    file_redlines = []
+    for file_data in lines_per_file:
         file_name = file_data["name"]
         file_lines = file_data["lines"]
         
@@ -121,82 +122,37 @@ def count_faults_per_redline(points, redlines, redlines_files, threshold_m):
             print(f"[WARN] ไม่พบเส้นในไฟล์ {file_name}")
             continue
             
-        # รวมเส้นทั้งหมดในไฟล์เป็น geometry เดียว
         combined_geom = unary_union(file_lines) if len(file_lines) > 1 else file_lines[0]
-        
-        # หาจุดใดจุดหนึ่งเพื่อกำหนด UTM zone
-        if hasattr(combined_geom, 'coords'):
-            # Single LineString
-            lon, lat = list(combined_geom.coords)[0]
-        elif hasattr(combined_geom, 'geoms'):
-            # MultiLineString
-            lon, lat = list(combined_geom.geoms[0].coords)[0]
-        else:
-            print(f"[WARN] ไม่สามารถหา coordinate สำหรับ {file_name}")
+        file_redlines.append({"name": file_name, "geom": combined_geom, "epsg_cache": {}})
+
+    # buffer(threshold_m) ของแต่ละไฟล์สร้างครั้งเดียว (prepared) + STRtree ของจุด
+    matches, _, _ = corridor_match_indices(
+        [p['lon'] for p in points], [p['lat'] for p in points], file_redlines, threshold_m
+    )
+    for file_redline, (point_ids, _) in zip(file_redlines, matches):
+        if len(point_ids) == 0:
             continue
-            
-        project_fn = make_project_fn(lon, lat)
-
-        # แปลง redline ไป UTM และสร้าง buffer
-        utm_redline = project_fn(combined_geom)
-        buffer_zone = utm_redline.buffer(threshold_m)
-
-        for point in points:
-            wgs_point = Point(point['lon'], point['lat'])
-            utm_point = project_fn(wgs_point)
-
-            if buffer_zone.contains(utm_point):
-                redline_summary[file_name].append(point)
+        redline_summary[file_redline["name"]].extend(points[k] for k in point_ids)
 
     return redline_summary
 
 def count_points_near_redlines(points, redlines, threshold_m):
     """นับจำนวน point ที่อยู่ใกล้ redlines รวมทั้งหมด"""
-    count = 0
-    
-    for point in points:
-        found_match = False
-        wgs_point = Point(point['lon'], point['lat'])
-        
-        for redline_geom in redlines:
-            # หา coordinate สำหรับ projection
-            if hasattr(redline_geom, 'coords'):
-                lon, lat = list(redline_geom.coords)[0]
-            elif hasattr(redline_geom, 'geoms'):
-                lon, lat = list(redline_geom.geoms[0].coords)[0]
-            else:
-                continue
-                
-            project_fn = make_project_fn(lon, lat)
-            utm_point = project_fn(wgs_point)
-            utm_redline = project_fn(redline_geom)
-            buffer_zone = utm_redline.buffer(threshold_m)
+    redline_dicts = [{"name": str(i), "geom": geom, "epsg_cache": {}} for i, geom in enumerate(redlines)]
+    matches, _, best_dist = corridor_match_indices(
+        [p['lon'] for p in points], [p['lat'] for p in points], redline_dicts, threshold_m
+    )
+    matched = set()
+    for point_ids, _ in matches:
+        matched.update(point_ids.tolist())
 
-            if buffer_zone.contains(utm_point):
-                count += 1
-                print(f"TICKET: {point.get('ticket', 'N/A')}, SIGN: {point.get('sign', 'N/A')} → ภายใน {threshold_m} เมตร")
-                found_match = True
-                break
-                
-        if not found_match:
-            # ตรวจสอบระยะใกล้สุด (สำหรับ debug)
-            min_dist = float('inf')
-            for redline_geom in redlines:
-                if hasattr(redline_geom, 'coords'):
-                    lon, lat = list(redline_geom.coords)[0]
-                elif hasattr(redline_geom, 'geoms'):
-                    lon, lat = list(redline_geom.geoms[0].coords)[0]
-                else:
-                    continue
-                    
-                project_fn = make_project_fn(lon, lat)
-                utm_point = project_fn(wgs_point)
-                utm_redline = project_fn(redline_geom)
-                dist = utm_redline.distance(utm_point)
-                min_dist = min(min_dist, dist)
-                
-            if min_dist < threshold_m + 50:  # ใกล้เกินไปแต่ไม่เข้า?
-                print(f"[WARN] ใกล้มาก (ระยะ {min_dist:.2f} m) แต่ไม่โดน buffer - ticket: {point['ticket']}")
+    count = 0
+    for k, point in enumerate(points):
+        if k in matched:
+            count += 1
+            print(f"TICKET: {point.get('ticket', 'N/A')}, SIGN: {point.get('sign', 'N/A')} → ภายใน {threshold_m} เมตร")
+        elif best_dist[k] < threshold_m + 50:  # ใกล้เกินไปแต่ไม่เข้า? (สำหรับ debug)
+            print(f"[WARN] ใกล้มาก (ระยะ {best_dist[k]:.2f} m) แต่ไม่โดน buffer - ticket: {point['ticket']}")
 
     return count
 
@@ -497,8 +453,9 @@ if __name__ == "__main__":
     print(f"\n✅ รวมทั้งหมดเจอ {total_unique} fault points ภายใน {threshold_m} เมตร")
     # print(f"🔍 การนับแบบเก่า: {total_count} points")
 
-    # สร้างภาพ (ถ้ามี visualize function)
+    # สร้างภาพ (ถ้ามี visualize function) - import ตอนใช้เพื่อไม่ให้โหลด plotly ตอน start
     # try:
+    #     from visualize import visualize_kml_data_interactive
     #     print("\n🔄 สร้างภาพแสดงผล...")
     #     visualize_kml_data_interactive(points, redlines)
     #     print("✅ สร้างภาพสำเร็จ")
@@ -1,34 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os
 import logging
-from collections import defaultdict
-from tqdm import tqdm
-
-import pandas as pd
-import xml.etree.ElementTree as ET
-
-from shapely.geometry import LineString, Point, MultiLineString, GeometryCollection
-from shapely.ops import unary_union, transform
-
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-from pyproj import CRS, Transformer
-from datetime import datetime
 
 from utils.parse_controller.parse_points import parse_kml_points
 from utils.parse_controller.parse_lines import parse_kml_lines
 from utils.excel_controller.save_points_to_excel import save_points_to_excel
 from utils.main_controller.main_analysis import analyze_points_vs_redlines  
 from utils.excel_controller.write_results_to_excel import write_results_to_excel
+from utils.kml_controller.write_matches_kml import write_matches_kml
+from utils.kml_controller.super_overlay import write_super_overlay
+from utils.kml_controller.heatmap import write_heatmap_kmz
 
 # ---------- config ----------
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 ns = {'kml': 'http://www.opengis.net/kml/2.2'}
 # ปรับ threshold ตามต้องการ (เมตร)
 THRESHOLD_M = 100
+# ช่วง (km) ของ histogram fault ตามระยะเส้นทางจาก A-end
+CHAINAGE_BIN_KM = 1
+# รัศมี (เมตร) ของ hotspot ที่ใช้จัดกลุ่มจุดที่ match
+HOTSPOT_RADIUS_M = 200
+# รัศมี (เมตร) ที่ถือว่าเป็นตำแหน่งเดียวกันเมื่อหา fault ที่เกิดซ้ำข้ามเดือน
+REPEAT_RADIUS_M = 50
+# การนับ fault: "all" = นับให้ทุกเส้นที่อยู่ในระยะ, "exclusive" = นับให้เส้นที่ใกล้ที่สุดเส้นเดียว
+ASSIGNMENT = "all"
+# ใช้ผลเดิมจาก run cache (.cache/runs ใต้ root ของ repo) เมื่อ input และ option เหมือนเดิม
+# (False = คำนวณใหม่ทุกครั้ง; ไม่มีผลเมื่อกำหนด PROFILE_DIR)
+USE_CACHE = True
+# โฟลเดอร์เก็บ profile (cProfile + folded stack ต่อ stage) ของการวิเคราะห์และการเขียน Excel (None = ไม่ profile)
+PROFILE_DIR = None
 # --------------------------------
 
 # ---------- parsing functions ----------
@@ -92,7 +93,7 @@ if __name__ == "__main__":
     
     # redline files list
     
-    from config import redlines_files
+    from config import redlines_files, site_files
 
     points_files = {
         # "มกราคม": "มกรา.kml",
@@ -251,7 +252,13 @@ if __name__ == "__main__":
         "Root/SKT1338-SKT8528.kml",
     ]
 
-    points_df, redline_summary = analyze_points_vs_redlines(points_files, redlines_files, threshold_m=THRESHOLD_M)
+    reports = {}
+    points_df, redline_summary = analyze_points_vs_redlines(points_files, redlines_files, threshold_m=THRESHOLD_M,
+                                                            reports=reports, chainage_bin_km=CHAINAGE_BIN_KM,
+                                                            hotspot_radius_m=HOTSPOT_RADIUS_M,
+                                                            repeat_radius_m=REPEAT_RADIUS_M,
+                                                            site_files=site_files, assignment=ASSIGNMENT, use_cache=USE_CACHE,
+                                                            profile_dir=PROFILE_DIR)
 
     if points_df is None:
         logging.error("ไม่มีผลลัพธ์จากการวิเคราะห์")
@@ -263,7 +270,14 @@ if __name__ == "__main__":
 
         # เขียน excel
         name = "test004_100m"
-        write_results_to_excel(points_df, redline_summary,THRESHOLD_M, name +".xlsx", use_detail_count=True)
+        write_results_to_excel(points_df, redline_summary,THRESHOLD_M, name +".xlsx", use_detail_count=True,
+                               extra_sheets=reports, profile_dir=PROFILE_DIR)
+        # KMZ สำหรับเปิดใน Google Earth (1 folder ต่อ redline)
+        write_matches_kml(redline_summary, name + ".kmz")
+        # super-overlay (quadtree + Region) สำหรับจุดจำนวนมาก
+        write_super_overlay(points_df, name + "_overlay.kmz", redline_summary)
+        # ภาพความหนาแน่นของ fault ทั้งหมด (GroundOverlay)
+        write_heatmap_kmz(points_df, name + "_heatmap.kmz")
 
         # ถ้าต้องการดูสรุปใน console
         for rl_name, info in redline_summary.items():
@@ -0,0 +1,22 @@
+"""
+add_chainage ของ utils/main_controller/chainage.py: histogram นับชุดเดียวกับ count ของ summary
+"""
+from shapely.geometry import LineString
+
+from utils.main_controller.chainage import add_chainage
+from utils.main_controller.main_analysis import summarize_redline_matches
+
+
+def test_histogram_counts_deduplicated_points():
+    rl = {'name': "AAA1000-BBB2000.kml", 'geom': LineString([(101.0, 15.0), (101.03, 15.0)]), 'epsg_cache': {}}
+    matches = [{'lat': 15.0, 'lon': 101.001, 'ticket': f"T{i}", 'distance_m': 0.0} for i in range(3)]
+    matches.append({'lat': 15.0, 'lon': 101.02, 'ticket': "T9", 'distance_m': 0.0})
+    summary = summarize_redline_matches([rl], {rl['name']: matches})
+    reports = {}
+    add_chainage([rl], summary, bin_km=1.0, reports=reports)
+
+    info = summary[rl['name']]
+    assert info['count_by_coords'] == 2
+    assert reports['chainage_histogram']['จำนวนจุด'].sum() == info['count_by_coords']
+    assert info['chainage_histogram'].sum() == info['count_by_coords']
+    assert all('chainage_m' in r for r in info['raw_matches'])
@@ -0,0 +1,42 @@
+"""
+run_benchmark ของ utils/bench_controller/corpus_benchmark.py: รอบจับเวลาต้องไม่รันขณะ tracemalloc เปิดอยู่
+"""
+import tracemalloc
+
+from utils.bench_controller import corpus_benchmark
+from utils.bench_controller.stage_timer import StageRecorder
+
+
+def test_recorder_stops_only_tracing_it_started():
+    assert not tracemalloc.is_tracing()
+    with StageRecorder(trace_memory=True) as recorder:
+        with recorder.stage("a"):
+            pass
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+
+    tracemalloc.start()
+    try:
+        StageRecorder(trace_memory=True).close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_timed_runs_are_not_traced(monkeypatch):
+    calls = []
+
+    def fake_pipeline(points_grouped, redlines_files, site_files, engine, recorder, output_dir):
+        calls.append((engine, recorder.trace_memory, tracemalloc.is_tracing()))
+        with recorder.stage("end_to_end"):
+            pass
+        return 0
+
+    monkeypatch.setattr(corpus_benchmark, "prepare_corpus", lambda corpus, root: ({}, [], [], {}))
+    monkeypatch.setattr(corpus_benchmark, "_run_pipeline", fake_pipeline)
+    corpus_benchmark.run_benchmark(engines=("distance", "corridor"), repeats=2)
+
+    assert [c[:2] for c in calls] == [("distance", False), ("distance", False), ("distance", True),
+                                      ("corridor", False), ("corridor", False), ("corridor", True)]
+    assert all(traced == trace_memory for _, trace_memory, traced in calls)
+    assert not tracemalloc.is_tracing()
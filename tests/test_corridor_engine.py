@@ -0,0 +1,23 @@
+"""
+corridor_engine ของ utils/main_controller/corridor_engine.py: การ project ที่ไม่สำเร็จต้องไม่ค้างใน cache ที่ engine อื่นใช้ร่วม
+"""
+from shapely.geometry import LineString
+
+from utils.geom_controller.geom import point_to_geom_distance_m, utm_epsg_for_lon
+from utils.main_controller import corridor_engine
+
+
+def test_failed_projection_does_not_poison_shared_cache(monkeypatch):
+    rl = {'name': "a", 'geom': LineString([(101.0, 15.0), (101.01, 15.0)]), 'epsg_cache': {}}
+    epsg = utm_epsg_for_lon(101.0, 15.0)
+
+    def fail(geom, transformer):
+        raise ValueError("projection failed")
+
+    monkeypatch.setattr(corridor_engine, "project_geom_with_transformer", fail)
+    assert corridor_engine.corridor_buffer(rl, epsg, 100) is None
+    assert epsg not in rl['epsg_cache']
+
+    distance, used = point_to_geom_distance_m(101.005, 15.0005, rl['geom'], rl['epsg_cache'])
+    assert used == epsg
+    assert 50 < distance < 60
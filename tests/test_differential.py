@@ -0,0 +1,30 @@
+"""
+synthetic case ของ utils/verify_controller/differential.py: ทุก engine, exclusive assignment,
+analyze_points_chunked และ shard job (plan_job / run_worker / merge_job) ต้องไม่มี mismatch นอกขอบ threshold
+"""
+import pytest
+
+from utils.verify_controller.differential import MODES, run_differential, synthetic_case, synthetic_center
+
+SEEDS = [0, 1]  # 1 = คร่อมขอบ UTM zone
+
+
+def _hard_mismatches(mismatches):
+    return mismatches[~mismatches['boundary'].astype(bool)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_synthetic_case(tmp_path, seed):
+    points_grouped, redlines_files = synthetic_case(str(tmp_path), seed, center=synthetic_center(seed))
+    mismatches = run_differential(points_grouped, redlines_files, case=f"synthetic_{seed}", modes=MODES)
+    hard = _hard_mismatches(mismatches)
+    assert hard.empty, hard.to_string()
+
+
+def test_synthetic_case_with_route_reports(tmp_path):
+    # report ที่ต้องใช้จุดทั้งหมด (hotspot, chainage) ต้องเท่ากันทั้ง chunked และ sharded
+    points_grouped, redlines_files = synthetic_case(str(tmp_path), 2)
+    mismatches = run_differential(points_grouped, redlines_files, case="synthetic_2", modes=("chunked", "sharded"),
+                                  hotspot_radius_m=200, chainage_bin_km=1)
+    hard = _hard_mismatches(mismatches)
+    assert hard.empty, hard.to_string()
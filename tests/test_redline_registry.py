@@ -0,0 +1,26 @@
+"""
+build_redline_registry ของ utils/geom_controller/redline_registry.py: รวมเฉพาะ geometry ที่ตรงกันทุกประการ
+"""
+from shapely.geometry import LineString
+
+from utils.geom_controller.redline_registry import build_redline_registry
+
+COORDS = [(101.0, 15.0), (101.01, 15.0), (101.02, 15.01)]
+
+
+def _redline(name, coords):
+    return {'name': name, 'geom': LineString(coords), 'epsg_cache': {}}
+
+
+def test_reversed_copy_is_an_alias():
+    unique, report = build_redline_registry([_redline("a", COORDS), _redline("b", COORDS[::-1])])
+    assert [rl['aliases'] for rl in unique] == [["a", "b"]]
+    assert report['ประเภท'].tolist() == ["exact"]
+
+
+def test_line_moved_a_few_centimetres_is_only_an_overlap():
+    # ~4 cm (4e-7 องศา) - เดิมปัดพิกัด 6 ตำแหน่งแล้วรวมเป็นเส้นเดียว
+    moved = [(lon + 4e-7, lat) for lon, lat in COORDS]
+    unique, report = build_redline_registry([_redline("a", COORDS), _redline("b", moved)])
+    assert [rl['aliases'] for rl in unique] == [["a"], ["b"]]
+    assert report['ประเภท'].tolist() == ["overlap"]
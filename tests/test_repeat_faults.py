@@ -0,0 +1,48 @@
+"""
+detect_repeat_faults ของ utils/main_controller/repeat_faults.py: ตำแหน่งตามรัศมี (ไม่ใช่ขอบช่อง grid) และไม่ต่อกันเป็นทอด ๆ
+"""
+import pandas as pd
+import pyproj
+
+from utils.geom_controller.geom import utm_epsg_for_lon
+from utils.main_controller.repeat_faults import NO_REPEAT, detect_repeat_faults
+
+LON, LAT = 101.5, 15.0
+
+
+def _points(xy_groups):
+    """[(x, y, group), ...] เมตรรอบจุดอ้างอิง (ช่อง grid เริ่มที่พิกัด UTM ที่หารรัศมีลงตัว) → points_df"""
+    epsg = utm_epsg_for_lon(LON, LAT)
+    to_utm = pyproj.Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+    to_lonlat = pyproj.Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+    x0, y0 = to_utm.transform(LON, LAT)
+    x0, y0 = x0 - x0 % 1000, y0 - y0 % 1000
+    rows = []
+    for i, (x, y, group) in enumerate(xy_groups):
+        lon, lat = to_lonlat.transform(x0 + x, y0 + y)
+        rows.append({'group': group, 'ticket': f"T{i}", 'lon': lon, 'lat': lat, 'nearest_redline': "R"})
+    return pd.DataFrame(rows)
+
+
+def test_pair_across_cell_edge_is_one_location():
+    points_df = _points([(49.0, 10.0, "ม.ค."), (51.0, 10.0, "ก.พ.")])
+    table = detect_repeat_faults(points_df, radius_m=50)
+    assert len(table) == 1
+    assert table.loc[0, 'จำนวนเดือน'] == 2
+    assert (points_df['repeat_id'] == 0).all()
+
+
+def test_pair_farther_than_radius_in_one_cell_is_not_a_repeat():
+    # ช่อง grid เดียวกัน (0-50 m) แต่ห่างกัน 66 m
+    points_df = _points([(1.0, 1.0, "ม.ค."), (48.0, 48.0, "ก.พ.")])
+    table = detect_repeat_faults(points_df, radius_m=50)
+    assert table.empty
+    assert (points_df['repeat_id'] == NO_REPEAT).all()
+
+
+def test_line_of_faults_does_not_chain():
+    # จุดห่างกัน 30 m ตลอด 3 km สลับเดือน: ทุกคู่ติดกันอยู่ในรัศมี แต่ต้องไม่รวมเป็นตำแหน่งเดียว
+    points_df = _points([(30.0 * i, 10.0, "ม.ค." if i % 2 else "ก.พ.") for i in range(100)])
+    table = detect_repeat_faults(points_df, radius_m=50)
+    assert len(table) > 10
+    assert (table['รัศมี (m)'] <= 2 * 50).all()
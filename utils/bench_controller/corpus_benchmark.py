@@ -0,0 +1,238 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..main_controller.main_analysis import ENGINES, analyze_points_vs_redlines
+from ..excel_controller.write_results_to_excel import write_results_to_excel
+from .stage_timer import StageRecorder
+
+pd = lazy_import("pandas")
+
+BENCH_DIR = ".bench"
+BASELINE_PATH = os.path.join(BENCH_DIR, "corpus_baseline.json")
+
+# corpus จริงใน repo (path สัมพัทธ์กับ root ของ repo)
+CORPUS = {
+    # ไฟล์ fault แบบ KML
+    'points': {
+        "M1 Confirm": "Test/M1/Confirm.kml",
+        "M1 Revise": "Test/M1/Revise.kml",
+        "M2 Close Action": "Test/M2/Close Action.kml",
+        "M2 Confirm": "Test/M2/Confirm.kml",
+        "M2 Revise": "Test/M2/Revise.kml",
+        "M3 Confirm": "Test/M3/Confirm.kml",
+        "M3 Revise": "Test/M3/Revise.kml",
+        "ConfirmTest001": "ConfirmTest001.kml",
+        "ReviseTest001": "RawData/ReviseTest001.kml",
+    },
+    # จุดที่ match แล้ว (ไม่ใช่ข้อมูลดิบ): sheet ของ redline ใน workbook ผลรายเดือน *_100m.xlsx
+    # มีเฉพาะจุดที่อยู่ในระยะ 100 m ของ redline อยู่แล้ว ถูกรวมเป็น CSV (ผ่าน parse_table_points)
+    # จึงวัดงาน table input + การ match ที่เกือบทุกจุดเจอ redline - ไม่แทนสัดส่วนจุดไม่ match ของข้อมูลดิบ
+    'matched_workbooks': {
+        "มกราคม (matched 100m)": "มกราคม_100m.xlsx",
+        "กุมภาพันธ์ (matched 100m)": "กุมภาพันธ์_100m.xlsx",
+        "มีนาคม (matched 100m)": "มีนาคม_100m.xlsx",
+        "เมษายน (matched 100m)": "เมษายน_100m.xlsx",
+        "พฤษภาคม (matched 100m)": "พฤภาคม_100m.xlsx",
+        "มิถุนายน (matched 100m)": "มิถุนายน_100m.xlsx",
+    },
+    'redlines': ["Root/*.kml", "RN-PN DWDM.kml"],
+    'sites': ["SiteTest001.kml", "RawData/U1 Site PN-DN.kml"],
+}
+# option ของ analyze_points_vs_redlines ที่ใช้วัด (เปิดทุก stage)
+ANALYSIS_OPTIONS = {
+    'threshold_m': 100,
+    'chainage_bin_km': 1,
+    'hotspot_radius_m': 200,
+    'repeat_radius_m': 50,
+}
+# ต่ำกว่านี้ถือเป็น noise ไม่ flag (วินาที / MB)
+MIN_SECONDS = 0.05
+MIN_MB = 1.0
+
+
+def _workbook_points_csv(workbook, group, cache_dir):
+    """รวมจุดที่ match แล้วจาก sheet ของ redline ใน workbook ผลรายเดือนเป็น CSV (cache ตาม mtime ของ workbook)"""
+    csv_path = os.path.join(cache_dir, f"{group}.csv")
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) >= os.path.getmtime(workbook):
+        return csv_path
+    sheets = pd.read_excel(workbook, sheet_name=None)
+    frames = [df for df in sheets.values() if {'lat', 'lon'} <= set(df.columns)]
+    points = pd.concat(frames, ignore_index=True).drop(columns=['distance_m', 'group'], errors="ignore")
+    points = points.drop_duplicates(subset=[c for c in ('lat', 'lon', 'ticket') if c in points.columns])
+    points.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    return csv_path
+
+
+def prepare_corpus(corpus=CORPUS, root=".", cache_dir=None):
+    """
+    แปลง corpus เป็น input ของ analyze_points_vs_redlines คืน (points_grouped, redlines_files, site_files, files)
+    files = รายการไฟล์ที่ใช้พร้อมขนาด (เก็บใน baseline เพื่อรู้ว่า corpus เปลี่ยนหรือไม่)
+    ไฟล์ที่ไม่มีใน repo จะถูกข้ามพร้อม log
+    """
+    cache_dir = cache_dir or os.path.join(root, BENCH_DIR, "corpus")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    def existing(path):
+        full = os.path.join(root, path)
+        if not os.path.exists(full):
+            logging.warning("corpus: ไม่พบไฟล์ %s - ข้าม", path)
+            return None
+        return full
+
+    points_grouped = {}
+    for group, path in corpus.get('points', {}).items():
+        full = existing(path)
+        if full:
+            points_grouped[group] = full
+    for group, path in corpus.get('matched_workbooks', {}).items():
+        full = existing(path)
+        if full:
+            points_grouped[group] = _workbook_points_csv(full, group, cache_dir)
+
+    redlines_files = []
+    for pattern in corpus.get('redlines', []):
+        redlines_files.extend(sorted(glob.glob(os.path.join(root, pattern))))
+    site_files = [full for full in (existing(p) for p in corpus.get('sites', [])) if full]
+
+    files = {os.path.relpath(f, root): os.path.getsize(f)
+             for f in list(points_grouped.values()) + redlines_files + site_files}
+    return points_grouped, redlines_files, site_files, files
+
+
+def _run_pipeline(points_grouped, redlines_files, site_files, engine, recorder, output_dir):
+    reports = {}
+    with recorder.stage("end_to_end"):
+        points_df, summary = analyze_points_vs_redlines(points_grouped, redlines_files, reports=reports,
+                                                        engine=engine, site_files=site_files, stages=recorder,
+                                                        use_cache=False,
+                                                        **ANALYSIS_OPTIONS)
+        with recorder.stage("write_excel"):
+            write_results_to_excel(points_df, summary, ANALYSIS_OPTIONS['threshold_m'],
+                                   os.path.join(output_dir, f"bench_{engine}.xlsx"), extra_sheets=reports)
+    return len(points_df)
+
+
+def run_benchmark(corpus=CORPUS, engines=ENGINES, repeats=3, root="."):
+    """
+    รัน pipeline ทั้งหมด (analyze + write_results_to_excel) บน corpus ต่อ engine
+    - เวลา: ค่าน้อยที่สุดจาก repeats รอบ (ไม่เปิด tracemalloc)
+    - memory: peak ของ Python (tracemalloc) จากรอบแยกอีก 1 รอบ
+    คืน dict {'meta': ..., 'stages': {"<engine>/<stage>": {'seconds', 'peak_mb'}}}
+    """
+    points_grouped, redlines_files, site_files, files = prepare_corpus(corpus, root)
+    stages = {}
+    n_points = 0
+    with tempfile.TemporaryDirectory() as output_dir:
+        for engine in engines:
+            best = {}
+            for _ in range(repeats):
+                recorder = StageRecorder()
+                n_points = _run_pipeline(points_grouped, redlines_files, site_files, engine, recorder, output_dir)
+                for name, t in recorder.totals().items():
+                    best[name] = min(best.get(name, float("inf")), t['seconds'])
+            with StageRecorder(trace_memory=True) as recorder:
+                _run_pipeline(points_grouped, redlines_files, site_files, engine, recorder, output_dir)
+            for name, t in recorder.totals().items():
+                stages[f"{engine}/{name}"] = {'seconds': round(best[name], 4), 'peak_mb': round(t['peak_mb'], 2)}
+            logging.info("benchmark %s: end_to_end %.2f s", engine, best['end_to_end'])
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    meta = {
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeats': repeats,
+        'n_points': n_points,
+        'n_redlines': len(redlines_files),
+        'files': files,
+    }
+    return {'meta': meta, 'stages': stages}
+
+
+def save_baseline(result, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_to_baseline(current, baseline, time_threshold=0.2, memory_threshold=0.2):
+    """
+    เทียบผลกับ baseline ทีละ stage คืน DataFrame
+    flag 'ช้าลง' ถ้าเวลาเพิ่มเกิน time_threshold (สัดส่วน) และเกิน MIN_SECONDS
+    flag 'memory เพิ่ม' ถ้า peak เพิ่มเกิน memory_threshold และเกิน MIN_MB
+    """
+    rows = []
+    for name, now in current['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            rows.append({'stage': name, 'seconds': now['seconds'], 'peak_mb': now['peak_mb'], 'flags': "ใหม่"})
+            continue
+        flags = []
+        dt = now['seconds'] - base['seconds']
+        if dt > MIN_SECONDS and now['seconds'] > base['seconds'] * (1 + time_threshold):
+            flags.append("ช้าลง")
+        dm = now['peak_mb'] - base['peak_mb']
+        if dm > MIN_MB and now['peak_mb'] > base['peak_mb'] * (1 + memory_threshold):
+            flags.append("memory เพิ่ม")
+        rows.append({
+            'stage': name,
+            'baseline_s': base['seconds'], 'seconds': now['seconds'],
+            'time_change_%': round(dt / base['seconds'] * 100, 1) if base['seconds'] else None,
+            'baseline_mb': base['peak_mb'], 'peak_mb': now['peak_mb'],
+            'memory_change_%': round(dm / base['peak_mb'] * 100, 1) if base['peak_mb'] else None,
+            'flags': ", ".join(flags),
+        })
+    if baseline['meta'].get('files') != current['meta'].get('files'):
+        logging.warning("corpus เปลี่ยนจาก baseline (ไฟล์/ขนาดต่างกัน) - ผลเทียบอาจไม่ตรง")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark pipeline ทั้งหมดบน corpus จริงใน repo เทียบกับ baseline")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("--repeats", type=int, default=3, help="จำนวนรอบวัดเวลาต่อ engine")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="ไฟล์ baseline (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="บันทึกผลครั้งนี้เป็น baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.2, help="สัดส่วนเวลาที่เพิ่มที่ถือว่าช้าลง")
+    parser.add_argument("--memory-threshold", type=float, default=0.2, help="สัดส่วน memory ที่เพิ่มที่ถือว่าโตขึ้น")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    result = run_benchmark(engines=args.engines, repeats=args.repeats)
+    baseline = load_baseline(args.baseline)
+
+    regressions = 0
+    if baseline is not None and not args.save_baseline:
+        report = compare_to_baseline(result, baseline, args.time_threshold, args.memory_threshold)
+        print(f"เทียบกับ baseline {args.baseline} ({baseline['meta']['created']}, commit {baseline['meta']['commit']})")
+        print(report.to_string(index=False))
+        regressions = int((report['flags'].fillna("").str.contains("ช้าลง|memory")).sum())
+        print(f"stage ที่ถดถอย: {regressions}")
+    else:
+        print(pd.DataFrame([{'stage': k, **v} for k, v in result['stages'].items()]).to_string(index=False))
+    if args.save_baseline or baseline is None:
+        save_baseline(result, args.baseline)
+        print(f"บันทึก baseline: {args.baseline}")
+    raise SystemExit(1 if regressions else 0)
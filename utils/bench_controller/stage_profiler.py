@@ -0,0 +1,105 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# ตัวอักษรที่ใช้ในชื่อไฟล์ไม่ได้ (ชื่อ stage)
+UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+# จำนวนฟังก์ชันใน .txt (เรียงตาม cumulative time)
+TOP_FUNCTIONS = 40
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ",").replace(" ", "_")
+
+
+class _StackSampler:
+    """thread ที่อ่าน stack ของ thread เป้าหมายทุก interval_s วินาที นับเป็น folded stack (root;...;leaf)"""
+
+    def __init__(self, thread_id, interval_s):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class StageProfiler:
+    """
+    profile แต่ละ stage (ส่งแทน StageRecorder ให้ analyze_points_vs_redlines / write_results_to_excel ได้)
+    ต่อ stage เขียน 3 ไฟล์ใน profile_dir ชื่อ <prefix>_<ลำดับ>_<stage>:
+      - .prof   : cProfile stats (เปิดด้วย pstats / snakeviz)
+      - .txt    : ฟังก์ชันที่ใช้เวลาสูงสุด TOP_FUNCTIONS อันดับ (cumulative)
+      - .folded : folded stack จากการ sample ทุก sample_interval_s วินาที ใช้กับ flamegraph.pl / speedscope ได้เลย
+    stage ซ้อนกัน: profile เฉพาะ stage นอกสุด (cProfile เปิดได้ทีละตัวต่อ thread) stage ในถูกส่งต่อให้ recorder อย่างเดียว
+    recorder: StageRecorder (ถ้ามี) จะได้เวลาของทุก stage ตามปกติ
+    files: list ของ path ที่เขียนแล้ว
+    """
+
+    def __init__(self, profile_dir, prefix="run", sample_interval_s=0.005, recorder=None):
+        self.profile_dir = profile_dir
+        self.prefix = prefix
+        self.sample_interval_s = sample_interval_s
+        self.recorder = recorder
+        self.files = []
+        self._active = False
+        self._seq = 0
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name):
+        timed = self.recorder.stage(name) if self.recorder is not None else nullcontext()
+        if self._active:
+            with timed:
+                yield
+            return
+
+        self._active = True
+        self._seq += 1
+        base = os.path.join(self.profile_dir, f"{self.prefix}_{self._seq:02d}_{UNSAFE_NAME_RE.sub('_', name)}")
+        profiler = cProfile.Profile()
+        sampler = _StackSampler(threading.get_ident(), self.sample_interval_s)
+        try:
+            with timed, sampler:
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+        finally:
+            self._active = False
+            self._write(base, profiler, sampler.counts)
+
+    def _write(self, base, profiler, folded):
+        profiler.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(profiler, stream=f).strip_dirs().sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in sorted(folded.items()):
+                f.write(f"{stack} {count}\n")
+        self.files.extend([base + ".prof", base + ".txt", base + ".folded"])
+        logging.info("profile: %s (.prof/.txt/.folded, %d samples)", base, sum(folded.values()))
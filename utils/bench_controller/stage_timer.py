@@ -0,0 +1,71 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class StageRecorder:
+    """
+    บันทึกเวลาของแต่ละ stage (ส่งให้ analyze_points_vs_redlines(stages=...) หรือใช้ with recorder.stage(...) เอง)
+    trace_memory=True: บันทึก peak memory ของ Python (tracemalloc) ระหว่าง stage ด้วย
+      stage ซ้อนกันได้ (peak ของ stage นอกรวม stage ใน) ไม่นับ memory ของ worker process / library ที่ไม่ผ่าน allocator ของ Python
+      ปิด tracemalloc ด้วย close() หรือ with StageRecorder(trace_memory=True) as recorder: (ปิดเฉพาะถ้า recorder นี้เปิดเอง)
+    records: list ของ {'stage', 'seconds', 'peak_mb'} ตามลำดับที่ stage จบ
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._frames = []
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def close(self):
+        """หยุด tracemalloc ถ้า recorder นี้เป็นคนเปิด (stage ที่จับเวลาหลังจากนี้จะไม่ช้าลงเพราะ tracing)"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def stage(self, name):
+        frame = {'start_current': 0, 'peak': 0}
+        if self.trace_memory:
+            frame['start_current'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._frames.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._frames.pop()
+            peak_mb = None
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                peak_mb = (peak - frame['start_current']) / 1e6
+                if self._frames:
+                    self._frames[-1]['peak'] = max(self._frames[-1]['peak'], peak)
+                tracemalloc.reset_peak()
+            self.records.append({'stage': name, 'seconds': seconds, 'peak_mb': peak_mb})
+
+    def totals(self):
+        """รวมเวลา (และ peak สูงสุด) ต่อชื่อ stage"""
+        totals = {}
+        for r in self.records:
+            t = totals.setdefault(r['stage'], {'seconds': 0.0, 'peak_mb': None})
+            t['seconds'] += r['seconds']
+            if r['peak_mb'] is not None:
+                t['peak_mb'] = max(t['peak_mb'] or 0.0, r['peak_mb'])
+        return totals
+
+
+def stage(stages, name):
+    """with stage(stages, "ชื่อ"): ... → บันทึกเมื่อส่ง recorder มา ไม่งั้นไม่ทำอะไร"""
+    return stages.stage(name) if stages is not None else nullcontext()
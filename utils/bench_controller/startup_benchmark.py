@@ -0,0 +1,104 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# entry point ที่ต้องการวัด: (ชื่อที่แสดง, โค้ดที่รันใน process ใหม่)
+ENTRY_POINTS = [
+    ("parse_points", "import utils.parse_controller.parse_points"),
+    ("parse_lines", "import utils.parse_controller.parse_lines"),
+    ("geom", "import utils.geom_controller.geom"),
+    ("main_analysis", "import utils.main_controller.main_analysis"),
+    ("save_points_to_excel", "import utils.excel_controller.save_points_to_excel"),
+    ("write_results_to_excel", "import utils.excel_controller.write_results_to_excel"),
+    ("visualize", "import visualize"),
+    ("test5 beta.py", "import runpy; runpy.run_path('test5 beta.py', run_name='__bench__')"),
+    ("test4 (MAIN).py", "import runpy; runpy.run_path('test4 (MAIN).py', run_name='__bench__')"),
+]
+
+# dependency หนักที่ควรถูกโหลดเฉพาะตอนใช้งานจริง
+HEAVY_MODULES = ("pandas", "openpyxl", "shapely", "pyproj", "tqdm", "plotly", "xml.etree.ElementTree")
+
+
+def _run_once(code, repo_root):
+    """รัน code ใน interpreter ใหม่ คืน (เวลาที่ใช้ (s), stderr ของ -X importtime หรือ None ถ้า error)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=repo_root, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        return elapsed, None
+    return elapsed, proc.stderr
+
+
+def _heavy_loaded(importtime_log):
+    """ดึงรายชื่อ dependency หนักที่ถูก import จาก log ของ -X importtime"""
+    loaded = set()
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        name = line.rsplit("|", 1)[-1].strip()
+        for heavy in HEAVY_MODULES:
+            if name == heavy:
+                loaded.add(heavy)
+    return sorted(loaded)
+
+
+def measure_startup(entry_points=None, repeats=5, repo_root=None):
+    """
+    วัดเวลา import ของแต่ละ entry point ใน process ใหม่ (cold interpreter)
+    คืน list ของ dict {'entry', 'min_ms', 'median_ms', 'heavy_loaded', 'ok'}
+    """
+    entry_points = entry_points or ENTRY_POINTS
+    repo_root = repo_root or os.getcwd()
+
+    # baseline: interpreter เปล่า เพื่อหักเวลา start ของ python เอง
+    baseline = min(_run_once("pass", repo_root)[0] for _ in range(repeats))
+
+    results = []
+    for label, code in entry_points:
+        timings = []
+        log = None
+        for _ in range(repeats):
+            elapsed, log = _run_once(code, repo_root)
+            if log is None:
+                break
+            timings.append(max(elapsed - baseline, 0.0))
+
+        if log is None:
+            results.append({"entry": label, "min_ms": None, "median_ms": None,
+                            "heavy_loaded": [], "ok": False})
+            continue
+
+        results.append({
+            "entry": label,
+            "min_ms": round(min(timings) * 1000, 1),
+            "median_ms": round(statistics.median(timings) * 1000, 1),
+            "heavy_loaded": _heavy_loaded(log),
+            "ok": True,
+        })
+    return results
+
+
+def print_report(results):
+    """แสดงผลเป็นตาราง"""
+    print(f"{'entry point':<26} {'min (ms)':>10} {'median (ms)':>12}  heavy modules loaded")
+    print("-" * 80)
+    for r in results:
+        if not r["ok"]:
+            print(f"{r['entry']:<26} {'error':>10} {'':>12}  (import ไม่สำเร็จ - dependency ไม่ครบ?)")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "-"
+        print(f"{r['entry']:<26} {r['min_ms']:>10.1f} {r['median_ms']:>12.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="วัดเวลา startup (import cost) ของแต่ละ entry point")
+    parser.add_argument("--repeats", type=int, default=5, help="จำนวนรอบต่อ entry point")
+    args = parser.parse_args()
+
+    print_report(measure_startup(repeats=args.repeats))
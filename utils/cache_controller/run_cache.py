@@ -0,0 +1,142 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+# อยู่ใต้ root ของ repo เสมอ (ไม่ขึ้นกับ cwd ตอนรัน) และถูก ignore ใน .gitignore
+RUN_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             ".cache", "runs")
+# ขนาดรวมสูงสุดของ cache (byte) เกินแล้วลบรายการที่ใช้ล่าสุดนานที่สุดก่อน (LRU)
+RUN_CACHE_MAX_BYTES = 1 << 30
+ENTRY_SUFFIX = ".pkl"
+HASH_CHUNK = 1 << 20
+
+# fingerprint ของไฟล์ที่คำนวณแล้วใน process นี้: (path, size, mtime_ns) → hash
+_file_hashes = {}
+
+
+def file_fingerprint(path):
+    """hash เนื้อหาไฟล์ (blake2b) - ย้าย/touch ไฟล์แล้วยังได้ค่าเดิม แก้เนื้อหาแล้วค่าเปลี่ยน"""
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if stamp not in _file_hashes:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(block)
+        _file_hashes[stamp] = digest.hexdigest()
+    return _file_hashes[stamp]
+
+
+def run_key(inputs, params):
+    """
+    key ของการรัน 1 ครั้ง
+      - inputs: dict ชื่อ → list ของ (ชื่อที่ใช้ในผลลัพธ์, path) ใช้ fingerprint ของเนื้อหาไฟล์ตามลำดับ
+      - params: dict ของค่าที่มีผลต่อผลลัพธ์ (ต้องแปลงเป็น JSON ได้)
+    """
+    payload = {
+        'inputs': {name: [(label, file_fingerprint(path)) for label, path in files]
+                   for name, files in inputs.items()},
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RunCache:
+    """
+    cache ผลการวิเคราะห์ทั้งก้อนบน disk (1 ไฟล์ pickle ต่อ key)
+    - get: อ่านแล้ว touch ไฟล์ (mtime = เวลาใช้ล่าสุด)
+    - put: เขียนแบบ atomic แล้วลบรายการที่ใช้ล่าสุดนานที่สุดจนขนาดรวมไม่เกิน max_bytes
+    ไฟล์ที่อ่านไม่ได้ (เสีย / version ของ library เปลี่ยน) ถือเป็น miss และถูกลบ
+    """
+
+    def __init__(self, cache_dir=RUN_CACHE_DIR, max_bytes=RUN_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("run cache: อ่าน %s ไม่ได้ (%s) - ลบทิ้ง", path, e)
+            self._remove(path)
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            logging.info("run cache: ผลลัพธ์ %.1f MB ใหญ่กว่าขนาด cache - ไม่เก็บ", len(data) / 1e6)
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self.evict()
+        return True
+
+    def entries(self):
+        """รายการใน cache [(path, size, เวลาใช้ล่าสุด)] เรียงจากใช้ล่าสุดนานที่สุด"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIX):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                found.append((os.path.join(self.cache_dir, name), st.st_size, st.st_mtime))
+        return sorted(found, key=lambda e: e[2])
+
+    def evict(self, max_bytes=None):
+        """ลบรายการเก่าสุดจนขนาดรวม <= max_bytes คืนจำนวนที่ลบ"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        if removed:
+            logging.info("run cache: ลบ %d รายการ (เหลือ %.1f MB)", removed, total / 1e6)
+        return removed
+
+    def clear(self):
+        return self.evict(0)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ดู/ล้าง cache ผลการวิเคราะห์")
+    parser.add_argument("--cache-dir", default=RUN_CACHE_DIR)
+    parser.add_argument("--clear", action="store_true", help="ลบทุกรายการ")
+    args = parser.parse_args()
+
+    cache = RunCache(args.cache_dir)
+    if args.clear:
+        print(f"ลบ {cache.clear()} รายการ")
+    entries = cache.entries()
+    for path, size, used in entries:
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(used))}  {size / 1e6:8.1f} MB  "
+              f"{os.path.basename(path)}")
+    print(f"รวม {len(entries)} รายการ {sum(e[1] for e in entries) / 1e6:.1f} MB (สูงสุด {cache.max_bytes / 1e6:.0f} MB)")
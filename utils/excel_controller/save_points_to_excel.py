@@ -1,4 +1,6 @@
-import pandas as pd
+from ..lazy_controller.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 def save_points_to_excel(points, output_filename):
     """บันทึก list ของ dict เป็นไฟล์ Excel"""
@@ -1,12 +1,109 @@
 import logging
-import pandas as pd
+import os
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill
 
+from ..lazy_controller.lazy_import import lazy_import
+from ..bench_controller.stage_timer import stage
+from ..bench_controller.stage_profiler import StageProfiler
 
-def write_results_to_excel(points_df, redline_summary, threshold_m, output_path=None, use_detail_count=False):
+pd = lazy_import("pandas")
+openpyxl = lazy_import("openpyxl")
+openpyxl_utils = lazy_import("openpyxl.utils")
+openpyxl_styles = lazy_import("openpyxl.styles")
+
+
+MONTHS = ["มกราคม", "กุมภาพันธ์", "มีนาคม", "เมษายน", "พฤษภาคม", "มิถุนายน",
+          "กรกฎาคม", "สิงหาคม", "กันยายน", "ตุลาคม", "พฤศจิกายน", "ธันวาคม"]
+OTHER = "อื่นๆ"
+
+
+def _density_column(use_detail_count):
+    return "จุดต่อ km (รายละเอียดไม่ซ้ำ)" if use_detail_count else "จุดต่อ km (coordinate ไม่ซ้ำ)"
+
+
+def _route_columns(info, use_detail_count=False):
+    """
+    คอลัมน์ความยาวเส้นทาง/จุดต่อ km (มีเฉพาะเมื่อ analyze_points_vs_redlines คำนวณ chainage)
+    จุดต่อ km ใช้จำนวนที่ dedupe แล้ว (count_by_details / count_by_coords ตาม use_detail_count)
+    """
+    if "route_length_m" not in info:
+        return {}
+    length_km = info["route_length_m"] / 1000
+    n_points = info["count_by_details" if use_detail_count else "count_by_coords"]
+    return {
+        "ความยาวเส้นทาง (km)": round(length_km, 3),
+        _density_column(use_detail_count): round(n_points / length_km, 3) if length_km > 0 else 0,
+    }
+
+
+def build_summary_table(redline_summary, dimension="key", categories=None, use_detail_count=False):
+    """
+    ตารางสรุปต่อ redline: จำนวนจุดทั้งหมด + จำนวนแยกตาม dimension (pivot ครั้งเดียวของทุก match)
+    use_detail_count: จุดต่อ km นับแบบรายละเอียดไม่ซ้ำ (True) หรือ coordinate ไม่ซ้ำ (False)
+    dimension: ชื่อ field ใน record เช่น "key" (เดือน), "sign", "region", "sla", "online/mobile"
+               ("key" ใช้ "group" แทนถ้า record ไม่มี key)
+    categories: ลำดับคอลัมน์ที่ต้องการ ค่าที่ไม่อยู่ในนี้รวมเป็น "อื่นๆ"
+               ค่าเริ่มต้น: dimension "key"/"group" → 12 เดือน + "อื่นๆ", dimension อื่น → ทุกค่าที่พบ (เรียงตามตัวอักษร)
+    แถวสุดท้ายคือ "รวมทั้งหมด"
+    """
+    if categories is None and dimension in ("key", "group"):
+        categories = MONTHS
+
+    # รวม match ทุก redline เป็นตารางเดียว (redline, ค่า dimension, distance)
+    names, values, distances = [], [], []
+    for rl_name, info in redline_summary.items():
+        for r in info["raw_matches"]:
+            names.append(rl_name)
+            value = r.get(dimension)
+            if value is None and dimension == "key":
+                value = r.get("group")
+            values.append(OTHER if value is None else value)
+            distances.append(r.get("distance_m"))
+    matches = pd.DataFrame({"redline": names, "value": values,
+                            "distance_m": pd.to_numeric(pd.Series(distances, dtype=object))})
+
+    if categories is None:
+        columns = sorted({str(v) for v in values})
+        matches["value"] = matches["value"].astype(str)
+    else:
+        columns = list(categories) + [OTHER]
+        matches.loc[~matches["value"].isin(categories), "value"] = OTHER
+
+    order = list(redline_summary.keys())
+    counts = pd.crosstab(matches["redline"], matches["value"]).reindex(index=order, columns=columns, fill_value=0)
+    counts = counts.fillna(0).astype(int)
+    grouped = matches.groupby("redline", sort=False)
+    totals = grouped.size().reindex(order, fill_value=0)
+    avg_distance = grouped["distance_m"].mean().reindex(order).fillna(0).round(2)
+
+    summary_df = pd.DataFrame({"เส้นสายไฟ": order, "จำนวนจุดทั้งหมด": totals.to_numpy()})
+    for col in columns:
+        summary_df[col] = counts[col].to_numpy()
+    summary_df["ระยะเฉลี่ย (m)"] = avg_distance.to_numpy()
+
+    route_rows = [_route_columns(info, use_detail_count) for info in redline_summary.values()]
+    if any(route_rows):
+        route_df = pd.DataFrame(route_rows)
+        for col in route_df.columns:
+            summary_df[col] = route_df[col].fillna(0).to_numpy()
+
+    # แถวรวม
+    total_row = {"เส้นสายไฟ": "รวมทั้งหมด", "จำนวนจุดทั้งหมด": summary_df["จำนวนจุดทั้งหมด"].sum()}
+    for col in columns:
+        total_row[col] = summary_df[col].sum()
+    total_row["ระยะเฉลี่ย (m)"] = round(summary_df["ระยะเฉลี่ย (m)"].mean(), 2) if len(summary_df) else 0
+    if "ความยาวเส้นทาง (km)" in summary_df.columns:
+        total_km = summary_df["ความยาวเส้นทาง (km)"].sum()
+        total_row["ความยาวเส้นทาง (km)"] = round(total_km, 3)
+        count_field = "count_by_details" if use_detail_count else "count_by_coords"
+        n_points = sum(info[count_field] for info in redline_summary.values() if "route_length_m" in info)
+        total_row[_density_column(use_detail_count)] = round(n_points / total_km, 3) if total_km > 0 else 0
+    return pd.concat([summary_df, pd.DataFrame([total_row])], ignore_index=True)
+
+
+def write_results_to_excel(points_df, redline_summary, threshold_m, output_path=None, use_detail_count=False,
+                           extra_sheets=None, summary_dimension="key", summary_categories=None, stages=None,
+                           profile_dir=None):
     """
     เขียนผลไปเป็น Excel:
       - sheet 'points_summary' = สรุปเส้น + นับแยกรายเดือน พร้อม hyperlink
@@ -16,101 +113,33 @@ def write_results_to_excel(points_df, redline_summary, threshold_m, output_path=
     
     Args:
         use_detail_count (bool): ถ้า True ใช้ points_by_details, ถ้า False ใช้ points (coordinate-based)
+        extra_sheets (dict): sheet_name -> DataFrame เพิ่มเติม (เช่น reports จาก analyze_points_vs_redlines)
+        summary_dimension (str): field ที่ใช้แยกคอลัมน์ใน points_summary (ค่าเริ่มต้น "key" = รายเดือน)
+        summary_categories (list): ลำดับคอลัมน์ของ summary_dimension ค่าอื่นรวมเป็น "อื่นๆ" (ดู build_summary_table)
+        stages: StageRecorder (utils/bench_controller/stage_timer.py) บันทึกเวลาแยก summary/sheets/format/save
+        profile_dir (str | True): profile แต่ละขั้น (cProfile + folded stack) เขียนไฟล์ excel_* ลงโฟลเดอร์นี้
+            True = โฟลเดอร์ <ชื่อไฟล์ผลลัพธ์>_profile ข้างไฟล์ Excel
     """
     # ตั้งชื่อไฟล์ถ้าไม่ได้ส่งมา
     if not output_path:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         count_type = "details" if use_detail_count else "coords"
         output_path = f"results_points_redlines_{threshold_m}m_{count_type}_{timestamp}.xlsx"
+    if profile_dir:
+        if profile_dir is True:
+            profile_dir = os.path.splitext(output_path)[0] + "_profile"
+        stages = StageProfiler(profile_dir, "excel", recorder=stages)
 
     # -------------------
     # 1) Summary
     # -------------------
-    summary_rows = []
-    for rl_name, info in redline_summary.items():
-        pts_for_summary = info["raw_matches"]
-        raw_matches = info["raw_matches"]
-
-        if not pts_for_summary:
-            summary_rows.append({
-                "เส้นสายไฟ": rl_name,
-                "จำนวนจุดทั้งหมด": 0,
-                "มกราคม": 0, "กุมภาพันธ์": 0, "มีนาคม": 0, "เมษายน": 0,
-                "พฤษภาคม": 0, "มิถุนายน": 0, "กรกฎาคม": 0, "สิงหาคม": 0,
-                "กันยายน": 0, "ตุลาคม": 0, "พฤศจิกายน": 0, "ธันวาคม": 0,
-                "อื่นๆ": 0,
-                "ระยะเฉลี่ย (m)": 0
-            })
-            continue
-
-        df_summary = pd.DataFrame(pts_for_summary)
-        df_raw = pd.DataFrame(raw_matches) if raw_matches else pd.DataFrame()
-
-        # ตรวจสอบว่ามีคอลัมน์ key หรือไม่
-        if "key" in df_summary.columns:
-            jan = (df_summary["key"] == "มกราคม").sum()
-            feb = (df_summary["key"] == "กุมภาพันธ์").sum()
-            mar = (df_summary["key"] == "มีนาคม").sum()
-            apr = (df_summary["key"] == "เมษายน").sum()
-            may = (df_summary["key"] == "พฤษภาคม").sum()
-            jun = (df_summary["key"] == "มิถุนายน").sum()
-            jul = (df_summary["key"] == "กรกฎาคม").sum()
-            aug = (df_summary["key"] == "สิงหาคม").sum()
-            sep = (df_summary["key"] == "กันยายน").sum()
-            octb = (df_summary["key"] == "ตุลาคม").sum()
-            nov = (df_summary["key"] == "พฤศจิกายน").sum()
-            dec = (df_summary["key"] == "ธันวาคม").sum()
-
-            # นับ "อื่นๆ"
-            months = {"มกราคม","กุมภาพันธ์","มีนาคม","เมษายน","พฤษภาคม","มิถุนายน",
-                      "กรกฎาคม","สิงหาคม","กันยายน","ตุลาคม","พฤศจิกายน","ธันวาคม"}
-            other_count = df_summary[~df_summary["key"].isin(months)].shape[0]
-        else:
-            # ถ้าไม่มี group → ตั้งค่าเป็นศูนย์หมด
-            jan = feb = mar = apr = may = jun = jul = aug = sep = octb = nov = dec = 0
-            other_count = 0
-
-
-        # คำนวณระยะเฉลี่ย
-        avg_distance = df_raw["distance_m"].mean() if "distance_m" in df_raw.columns and len(df_raw) > 0 else 0
-
-        summary_rows.append({
-            "เส้นสายไฟ": rl_name,
-            "จำนวนจุดทั้งหมด": len(df_summary),
-            "มกราคม": jan, "กุมภาพันธ์": feb, "มีนาคม": mar, "เมษายน": apr,
-            "พฤษภาคม": may, "มิถุนายน": jun, "กรกฎาคม": jul, "สิงหาคม": aug,
-            "กันยายน": sep, "ตุลาคม": octb, "พฤศจิกายน": nov, "ธันวาคม": dec,
-            "อื่นๆ": other_count,
-            "ระยะเฉลี่ย (m)": round(avg_distance, 2)
-        })
-
-    summary_df = pd.DataFrame(summary_rows)
-
-    # แถวรวม
-    total_row = {
-        "เส้นสายไฟ": "รวมทั้งหมด",
-        "จำนวนจุดทั้งหมด": summary_df["จำนวนจุดทั้งหมด"].sum(),
-        "มกราคม": summary_df["มกราคม"].sum(),
-        "กุมภาพันธ์": summary_df["กุมภาพันธ์"].sum(),
-        "มีนาคม": summary_df["มีนาคม"].sum(),
-        "เมษายน": summary_df["เมษายน"].sum(),
-        "พฤษภาคม": summary_df["พฤษภาคม"].sum(),
-        "มิถุนายน": summary_df["มิถุนายน"].sum(),
-        "กรกฎาคม": summary_df["กรกฎาคม"].sum(),
-        "สิงหาคม": summary_df["สิงหาคม"].sum(),
-        "กันยายน": summary_df["กันยายน"].sum(),
-        "ตุลาคม": summary_df["ตุลาคม"].sum(),
-        "พฤศจิกายน": summary_df["พฤศจิกายน"].sum(),
-        "ธันวาคม": summary_df["ธันวาคม"].sum(),
-        "อื่นๆ": summary_df["อื่นๆ"].sum(),
-        "ระยะเฉลี่ย (m)": round(summary_df["ระยะเฉลี่ย (m)"].mean(), 2)
-    }
-    summary_df = pd.concat([summary_df, pd.DataFrame([total_row])], ignore_index=True)
+    with stage(stages, "excel_summary"):
+        summary_df = build_summary_table(redline_summary, summary_dimension, summary_categories, use_detail_count)
 
     # -------------------
     # 2) เขียนลง Excel
     # -------------------
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+    with stage(stages, "excel_sheets"), pd.ExcelWriter(output_path, engine="openpyxl") as writer:
         # summary
         summary_df.to_excel(writer, sheet_name="points_summary", index=False)
 
@@ -140,7 +169,7 @@ def write_results_to_excel(points_df, redline_summary, threshold_m, output_path=
         # statistics
         stats_data = []
         for rl_name, info in redline_summary.items():
-            stats_data.append({
+            row = {
                 "เส้นสายไฟ": rl_name,
                 "Count by Coordinates": info["count_by_coords"],
                 "Count by Details": info["count_by_details"],
@@ -149,59 +178,76 @@ def write_results_to_excel(points_df, redline_summary, threshold_m, output_path=
                     ((info["total_matches"] - info["count_by_coords"]) / info["total_matches"] * 100)
                     if info["total_matches"] > 0 else 0, 2
                 )
-            })
+            }
+            # นับทั้งสองแบบ (ทุกเส้นในระยะ / เส้นที่ใกล้ที่สุดเส้นเดียว) ดู analyze_points_vs_redlines(assignment=...)
+            if "count_exclusive" in info:
+                row["Count ทุกเส้นในระยะ"] = info["count_all"]
+                row["Count เส้นใกล้สุดเส้นเดียว"] = info["count_exclusive"]
+            stats_data.append(row)
         stats_df = pd.DataFrame(stats_data)
+        if "Count เส้นใกล้สุดเส้นเดียว" in stats_df:
+            totals = stats_df.drop(columns=["เส้นสายไฟ", "Duplicate Rate (%)"]).sum()
+            stats_df = pd.concat([stats_df, pd.DataFrame([{"เส้นสายไฟ": "รวมทั้งหมด", **totals.to_dict()}])],
+                                 ignore_index=True)
         stats_df.to_excel(writer, sheet_name="statistics", index=False)
 
+        # รายงานเพิ่มเติม
+        for sheet_name, table in (extra_sheets or {}).items():
+            if table is None:
+                continue
+            table.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+
     # -------------------
     # 3) ปรับแต่งด้วย openpyxl
     # -------------------
-    wb = load_workbook(output_path)
-    ws_summary = wb["points_summary"]
-
-    # เพิ่ม hyperlink
-    for row_idx in range(2, len(summary_df) + 1):  # รวม header = 1
-        rl_name = ws_summary.cell(row=row_idx, column=1).value
-        if rl_name == "รวมทั้งหมด":
-            continue
-
-        safe_name = rl_name.replace("/", "_").replace("\\", "_").replace(":", "_")
-        target_sheet = None
-        if safe_name in wb.sheetnames:
-            target_sheet = safe_name
-        else:
-            for sname in wb.sheetnames:
-                if sname.startswith(safe_name[:25]):
-                    target_sheet = sname
-                    break
-
-        if target_sheet:
-            cell = ws_summary.cell(row=row_idx, column=1)
-            cell.hyperlink = f"#'{target_sheet}'!A1"
-            cell.style = "Hyperlink"
-
-    # จัด bold + fill แถวรวม
-    total_row_idx = len(summary_df) + 1
-    for col in range(1, ws_summary.max_column + 1):
-        cell = ws_summary.cell(row=total_row_idx, column=col)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
-
-    # ปรับความกว้าง column ทุก sheet
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        for col in range(1, ws.max_column + 1):
-            max_len = 0
-            col_letter = get_column_letter(col)
-            for cell in ws[col_letter]:
-                try:
-                    if cell.value:
-                        max_len = max(max_len, len(str(cell.value)))
-                except:
-                    pass
-            ws.column_dimensions[col_letter].width = max_len + 2
-
-    wb.save(output_path)
+    with stage(stages, "excel_format"):
+        wb = openpyxl.load_workbook(output_path)
+        ws_summary = wb["points_summary"]
+
+        # เพิ่ม hyperlink
+        for row_idx in range(2, len(summary_df) + 1):  # รวม header = 1
+            rl_name = ws_summary.cell(row=row_idx, column=1).value
+            if rl_name == "รวมทั้งหมด":
+                continue
+
+            safe_name = rl_name.replace("/", "_").replace("\\", "_").replace(":", "_")
+            target_sheet = None
+            if safe_name in wb.sheetnames:
+                target_sheet = safe_name
+            else:
+                for sname in wb.sheetnames:
+                    if sname.startswith(safe_name[:25]):
+                        target_sheet = sname
+                        break
+
+            if target_sheet:
+                cell = ws_summary.cell(row=row_idx, column=1)
+                cell.hyperlink = f"#'{target_sheet}'!A1"
+                cell.style = "Hyperlink"
+
+        # จัด bold + fill แถวรวม
+        total_row_idx = len(summary_df) + 1
+        for col in range(1, ws_summary.max_column + 1):
+            cell = ws_summary.cell(row=total_row_idx, column=col)
+            cell.font = openpyxl_styles.Font(bold=True)
+            cell.fill = openpyxl_styles.PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
+
+        # ปรับความกว้าง column ทุก sheet
+        for sheet in wb.sheetnames:
+            ws = wb[sheet]
+            for col in range(1, ws.max_column + 1):
+                max_len = 0
+                col_letter = openpyxl_utils.get_column_letter(col)
+                for cell in ws[col_letter]:
+                    try:
+                        if cell.value:
+                            max_len = max(max_len, len(str(cell.value)))
+                    except:
+                        pass
+                ws.column_dimensions[col_letter].width = max_len + 2
+
+    with stage(stages, "excel_save"):
+        wb.save(output_path)
 
     # -------------------
     # 4) Logging
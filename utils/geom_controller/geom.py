@@ -1,19 +1,11 @@
-import os
 import logging
-from collections import defaultdict
-from tqdm import tqdm
 
-import pandas as pd
-import xml.etree.ElementTree as ET
+from ..lazy_controller.lazy_import import lazy_import
 
-from shapely.geometry import LineString, Point, MultiLineString, GeometryCollection
-from shapely.ops import unary_union, transform
-
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-from pyproj import CRS, Transformer
-from datetime import datetime
+shapely = lazy_import("shapely")
+geometry = lazy_import("shapely.geometry")
+ops = lazy_import("shapely.ops")
+pyproj = lazy_import("pyproj")
 
 _transformer_cache = {}
 
@@ -27,19 +19,54 @@ def get_transformer_to_utm(epsg):
     """Cache transformer จาก EPSG:4326 -> EPSG:xxxx"""
     key = int(epsg)
     if key not in _transformer_cache:
-        _transformer_cache[key] = Transformer.from_crs("EPSG:4326", f"EPSG:{key}", always_xy=True)
+        _transformer_cache[key] = pyproj.Transformer.from_crs("EPSG:4326", f"EPSG:{key}", always_xy=True)
     return _transformer_cache[key]
 
 def project_geom_with_transformer(geom, transformer):
     """แปลง shapely geometry โดยใช้ pyproj transformer"""
-    return transform(transformer.transform, geom)
+    return ops.transform(transformer.transform, geom)
+
+def simplify_projected_geom(projected_geom, tolerance_m):
+    """
+    ลดจำนวน vertex ของเส้นที่ project แล้ว (Douglas-Peucker, ไม่ preserve topology)
+    ระยะ Hausdorff ระหว่างเส้นเดิมกับเส้นใหม่ไม่เกิน tolerance_m
+    """
+    simplified = projected_geom.simplify(tolerance_m, preserve_topology=False)
+    if simplified.is_empty:
+        return projected_geom
+    return simplified
+
+def simplification_stats(epsg_cache_for_geom, tolerance_m=None):
+    """
+    สรุปผลการ simplify ที่อยู่ใน cache ของ redline หนึ่งเส้น (tolerance_m: เฉพาะ tolerance นี้, None = ทุกค่า)
+    คืน list ของ dict {'epsg', 'vertices_before', 'vertices_after', 'hausdorff_m'}
+    """
+    stats = []
+    for key, simplified in epsg_cache_for_geom.items():
+        if not isinstance(key, tuple) or key[1] != 'simplified':
+            continue
+        if tolerance_m is not None and key[2] != tolerance_m:
+            continue
+        epsg = key[0]
+        original = epsg_cache_for_geom[epsg]
+        stats.append({
+            'epsg': epsg,
+            'vertices_before': int(shapely.get_num_coordinates(original)),
+            'vertices_after': int(shapely.get_num_coordinates(simplified)),
+            'hausdorff_m': float(original.hausdorff_distance(simplified)),
+        })
+    return stats
 
 # ---------- distance computation ----------
-def point_to_geom_distance_m(point_lon, point_lat, geom, epsg_cache_for_geom):
+def point_to_geom_distance_m(point_lon, point_lat, geom, epsg_cache_for_geom, simplify_tolerance_m=None,
+                             recheck_within_m=None):
     """
     คำนวณระยะ (เมตร) จากจุด (lon,lat) ไปยัง geom (shapely geometry ใน lon/lat)
     - ใช้ UTM zone ของ point เป็น EPSG
     - epsg_cache_for_geom: dict mapping epsg -> projected_geom (เพื่อ cache per redline)
+    - simplify_tolerance_m: ถ้ากำหนด จะวัดกับเส้นที่ simplify แล้ว (cache ที่ key (epsg, 'simplified', tolerance))
+      ระยะที่ได้คลาดจากระยะจริงไม่เกิน tolerance
+    - recheck_within_m: ถ้าระยะกับเส้นที่ simplify ไม่เกินค่านี้ จะวัดกับเส้นเต็มอีกครั้ง (ใช้จุดที่ project แล้วเดิม)
     คืนค่า distance (float, meters) และ epsg ที่ใช้
     """
     epsg = utm_epsg_for_lon(point_lon, point_lat)
@@ -53,7 +80,14 @@ def point_to_geom_distance_m(point_lon, point_lat, geom, epsg_cache_for_geom):
         epsg_cache_for_geom[epsg] = projected_geom
 
     transformer = get_transformer_to_utm(epsg)
-    utm_point = project_geom_with_transformer(Point(point_lon, point_lat), transformer)
+    utm_point = project_geom_with_transformer(geometry.Point(point_lon, point_lat), transformer)
     projected_geom = epsg_cache_for_geom[epsg]
+    if simplify_tolerance_m:
+        key = (epsg, 'simplified', simplify_tolerance_m)
+        if key not in epsg_cache_for_geom:
+            epsg_cache_for_geom[key] = simplify_projected_geom(projected_geom, simplify_tolerance_m)
+        dist_m = epsg_cache_for_geom[key].distance(utm_point)
+        if recheck_within_m is None or dist_m > recheck_within_m:
+            return dist_m, epsg
     dist_m = projected_geom.distance(utm_point)
     return dist_m, epsg
\ No newline at end of file
@@ -0,0 +1,100 @@
+from ..lazy_controller.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+# จำนวนคู่จุดสูงสุดที่สร้าง/วัดระยะพร้อมกันใน 1 block (จำกัด memory ของการเทียบระยะระหว่างช่อง)
+PAIR_BLOCK = 1 << 20
+# ช่อง (dx, dy) รอบตัวที่อาจมีจุดห่างไม่เกิน r เมื่อช่องกว้าง r/√2 (5x5 ตัดมุม - มุมห่างเกิน r เสมอ) รวมช่องตัวเอง
+NEAR_CELLS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if abs(dx) + abs(dy) < 4]
+
+
+def collapse_points(xs, ys):
+    """
+    รวมจุดที่พิกัดตรงกันทุกประการเป็นจุดเดียวที่มีน้ำหนัก (hash ครั้งเดียว ไม่เรียง)
+    คืน (ux, uy, weights, inverse) - จุดไม่ซ้ำตามลำดับที่พบครั้งแรก, จำนวนจุดเดิม, index ของจุดไม่ซ้ำของทุกจุด
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    inverse = pd.DataFrame({'x': xs, 'y': ys}).groupby(['x', 'y'], sort=False).ngroup().to_numpy()
+    weights = np.bincount(inverse)
+    first = np.full(len(weights), len(xs), dtype=np.int64)
+    np.minimum.at(first, inverse, np.arange(len(xs)))
+    return xs[first], ys[first], weights, inverse
+
+
+def _pack(cx, cy):
+    return (cx << 32) ^ (cy & 0xFFFFFFFF)
+
+
+def group_cells(xs, ys, cell_m):
+    """
+    hash จุด (พิกัดเมตร) ลงช่อง grid ขนาด cell_m (ช่องเรียงตามลำดับจุดแรกที่พบ)
+    คืน (cell_of, cell_xy, order, start)
+      - cell_of: index ช่องของแต่ละจุด
+      - cell_xy: array (n_cells, 2) ของ (cx, cy)
+      - order, start: จุดของช่อง c คือ order[start[c]:start[c + 1]] (เรียง index จากน้อยไปมาก)
+    """
+    cx = np.floor(np.asarray(xs, dtype=float) / cell_m).astype(np.int64)
+    cy = np.floor(np.asarray(ys, dtype=float) / cell_m).astype(np.int64)
+    cell_of, _ = pd.factorize(_pack(cx, cy))
+    order = np.argsort(cell_of, kind="stable")
+    start = np.concatenate([[0], np.cumsum(np.bincount(cell_of))])
+    first = order[start[:-1]]
+    return cell_of, np.column_stack([cx[first], cy[first]]), order, start
+
+
+def near_cells(cell_xy, offsets=NEAR_CELLS):
+    """array (n_cells, len(offsets)) ของ index ช่องรอบตัวตาม offsets (-1 = ไม่มีจุด)"""
+    index = pd.Index(_pack(cell_xy[:, 0], cell_xy[:, 1]))
+    return np.column_stack([index.get_indexer(_pack(cell_xy[:, 0] + dx, cell_xy[:, 1] + dy))
+                            for dx, dy in offsets])
+
+
+def cell_pairs(cells, order, start):
+    """
+    แจกแจงคู่ (i, p) ของทุก p ที่อยู่ในช่อง cells[i] (ข้าม cells[i] = -1) ทีละ block ไม่เกิน PAIR_BLOCK คู่
+    (ยกเว้นช่องเดียวที่ใหญ่กว่านั้น) - ใช้แทนการสร้างรายการเพื่อนบ้านของแต่ละจุด
+    """
+    cells = np.asarray(cells)
+    valid = np.flatnonzero(cells >= 0)
+    counts = start[cells[valid] + 1] - start[cells[valid]]
+    ends = np.cumsum(counts)
+    lo = 0
+    while lo < len(valid):
+        hi = max(lo + 1, int(np.searchsorted(ends, ends[lo] - counts[lo] + PAIR_BLOCK, side="right")))
+        c = counts[lo:hi]
+        offs = np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)
+        yield np.repeat(valid[lo:hi], c), order[np.repeat(start[cells[valid[lo:hi]]], c) + offs]
+        lo = hi
+
+
+def any_within(ax, ay, bx, by, radius_m):
+    """
+    True ถ้ามีคู่ (a, b) ที่ห่างกันไม่เกิน radius_m
+    ชุดเล็กเทียบตรง ๆ ชุดใหญ่ใช้ STRtree ของ b หาจุดใกล้สุดของแต่ละ a (ไม่สร้างตารางระยะทุกคู่)
+    """
+    r2 = radius_m * radius_m
+    if len(ax) * len(bx) <= PAIR_BLOCK:
+        return bool((((ax[:, None] - bx[None, :]) ** 2 + (ay[:, None] - by[None, :]) ** 2) <= r2).any())
+    if len(ax) > len(bx):
+        ax, ay, bx, by = bx, by, ax, ay
+    tree = shapely.STRtree(shapely.points(bx, by))
+    ia, ib = tree.query_nearest(shapely.points(ax, ay), max_distance=radius_m, all_matches=False)
+    return bool((((ax[ia] - bx[ib]) ** 2 + (ay[ia] - by[ib]) ** 2) <= r2).any())
+
+
+def find_root(parent, i):
+    """union-find: หา root ของ i (path halving)"""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def union(parent, i, j):
+    """union-find: รวมกลุ่มของ i และ j (root = index ที่น้อยกว่า)"""
+    ri, rj = find_root(parent, i), find_root(parent, j)
+    if ri != rj:
+        parent[max(ri, rj)] = min(ri, rj)
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+
+from ..lazy_controller.lazy_import import lazy_import
+from .geom import utm_epsg_for_lon, get_transformer_to_utm, project_geom_with_transformer
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+
+def geometry_fingerprint(geom):
+    """
+    hash ของ geometry หลัง normalize (ทิศทางเส้น/ลำดับ part ไม่มีผล)
+    ใช้พิกัดตามจริงไม่ปัดเศษ: เส้นที่ต่างกันแม้ไม่กี่ cm ให้ distance_m ต่างกันได้ จึงไม่รวมเป็นเส้นเดียว
+    (เส้นที่เกือบเหมือนกันรายงานเป็นคู่ overlap ใน build_redline_registry)
+    """
+    normalized = shapely.normalize(geom)
+    parts = shapely.get_parts(normalized)
+    digest = hashlib.sha1(normalized.geom_type.encode())
+    for part in parts:
+        coords = shapely.get_coordinates(part) + 0.0  # กัน -0.0
+        digest.update(len(coords).to_bytes(4, "little"))
+        digest.update(coords.tobytes())
+    return digest.hexdigest()
+
+
+def _overlap_pairs(unique_redlines, tolerance_m, min_overlap):
+    """
+    หาคู่ redline ที่ทับกันบางส่วน (near-duplicate)
+    overlap_ratio(a, b) = ความยาวของ a ที่อยู่ใน buffer(b, tolerance_m) / ความยาว a
+    """
+    if len(unique_redlines) < 2:
+        return []
+
+    # project ทุกเส้นไป UTM zone เดียวกัน (zone ของค่ากลาง) - ใช้สำหรับรายงานเท่านั้น
+    first_coords = np.array([shapely.get_coordinates(rl['geom'])[0] for rl in unique_redlines])
+    lon, lat = np.median(first_coords[:, 0]), np.median(first_coords[:, 1])
+    transformer = get_transformer_to_utm(utm_epsg_for_lon(lon, lat))
+    projected = [project_geom_with_transformer(rl['geom'], transformer) for rl in unique_redlines]
+    buffers = [g.buffer(tolerance_m) for g in projected]
+    lengths = [g.length for g in projected]
+
+    tree = shapely.STRtree(buffers)
+    pairs = []
+    for i, geom in enumerate(projected):
+        for j in tree.query(geom, predicate="intersects"):
+            j = int(j)
+            if j <= i or lengths[i] == 0 or lengths[j] == 0:
+                continue
+            ratio_ij = geom.intersection(buffers[j]).length / lengths[i]
+            ratio_ji = projected[j].intersection(buffers[i]).length / lengths[j]
+            if max(ratio_ij, ratio_ji) >= min_overlap:
+                pairs.append((i, j, ratio_ij, ratio_ji))
+    return pairs
+
+
+def build_redline_registry(redline_geoms, overlap_tolerance_m=5.0, min_overlap=0.5):
+    """
+    รวม redline ที่ geometry เหมือนกันทุกประการ (คนละไฟล์/คนละชื่อ) ให้คำนวณครั้งเดียว
+    redline_geoms: list ของ dict {'name', 'geom', 'epsg_cache'} จาก analyze_points_vs_redlines
+    คืน (unique_redlines, alias_report)
+      - unique_redlines: list ของ dict เดิม (ตัวแรกของแต่ละกลุ่ม) เพิ่ม key
+            'aliases' = ชื่อทุกไฟล์ที่ geometry เดียวกัน (รวมตัวเอง, ตามลำดับเดิม)
+            'fingerprint' = hash ของ geometry
+      - alias_report: DataFrame รายการ alias (exact) และคู่ที่ทับกันบางส่วน (overlap)
+    """
+    by_fingerprint = {}
+    unique_redlines = []
+    for rl in redline_geoms:
+        fp = geometry_fingerprint(rl['geom'])
+        if fp in by_fingerprint:
+            by_fingerprint[fp]['aliases'].append(rl['name'])
+            continue
+        rl['fingerprint'] = fp
+        rl['aliases'] = [rl['name']]
+        by_fingerprint[fp] = rl
+        unique_redlines.append(rl)
+
+    rows = []
+    for rl in unique_redlines:
+        for alias in rl['aliases'][1:]:
+            rows.append({
+                'redline': alias,
+                'เหมือนกับ': rl['name'],
+                'ประเภท': 'exact',
+                'overlap_ratio': 1.0,
+                'overlap_ratio (กลับด้าน)': 1.0,
+            })
+
+    try:
+        pairs = _overlap_pairs(unique_redlines, overlap_tolerance_m, min_overlap)
+    except Exception as e:
+        logging.warning("คำนวณ overlap ของ redlines ไม่สำเร็จ: %s", e)
+        pairs = []
+    for i, j, ratio_ij, ratio_ji in pairs:
+        rows.append({
+            'redline': unique_redlines[i]['name'],
+            'เหมือนกับ': unique_redlines[j]['name'],
+            'ประเภท': 'overlap',
+            'overlap_ratio': round(ratio_ij, 4),
+            'overlap_ratio (กลับด้าน)': round(ratio_ji, 4),
+        })
+
+    alias_report = pd.DataFrame(rows, columns=['redline', 'เหมือนกับ', 'ประเภท',
+                                               'overlap_ratio', 'overlap_ratio (กลับด้าน)'])
+    return unique_redlines, alias_report
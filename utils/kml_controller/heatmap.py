@@ -0,0 +1,115 @@
+import logging
+import math
+import struct
+import zipfile
+import zlib
+
+from ..lazy_controller.lazy_import import lazy_import
+from .write_matches_kml import KmlWriter
+
+np = lazy_import("numpy")
+
+# สีของ heatmap ตามความหนาแน่น 0..1: (ตำแหน่ง, R, G, B, A) ไล่จากโปร่งใส → เหลือง → ส้ม → แดง
+COLOR_STOPS = (
+    (0.0, 255, 255, 0, 0),
+    (0.15, 255, 255, 0, 140),
+    (0.5, 255, 140, 0, 190),
+    (1.0, 200, 0, 0, 230),
+)
+MAX_IMAGE_PX = 4096
+
+
+def density_grid(lons, lats, bounds, width_px, height_px):
+    """นับจุดลง grid (height_px, width_px) ของ bounds (west, south, east, north) - แถว 0 = ทิศเหนือ"""
+    west, south, east, north = bounds
+    ix = ((lons - west) / (east - west) * width_px).astype(np.int64)
+    iy = ((north - lats) / (north - south) * height_px).astype(np.int64)
+    inside = (ix >= 0) & (ix < width_px) & (iy >= 0) & (iy < height_px)
+    counts = np.bincount(iy[inside] * width_px + ix[inside], minlength=width_px * height_px)
+    return counts.reshape(height_px, width_px).astype(float)
+
+
+def gaussian_smooth(grid, sigma_px):
+    """Gaussian blur แบบแยกแกน (convolution 1 มิติทีละแกน) numpy ล้วน"""
+    if not sigma_px:
+        return grid
+    radius = max(int(math.ceil(3 * sigma_px)), 1)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma_px) ** 2)
+    kernel /= kernel.sum()
+    for axis in (0, 1):
+        padded = np.pad(grid, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)])
+        out = np.zeros_like(grid)
+        n = grid.shape[axis]
+        for k, w in enumerate(kernel):
+            out += w * (padded[k:k + n] if axis == 0 else padded[:, k:k + n])
+        grid = out
+    return grid
+
+
+def colorize(grid, log_scale=True):
+    """ความหนาแน่น → RGBA uint8 (h, w, 4) ตาม COLOR_STOPS ช่องที่ไม่มีจุดโปร่งใส"""
+    values = np.log1p(grid) if log_scale else grid
+    peak = values.max()
+    norm = values / peak if peak > 0 else values
+    stops = np.array(COLOR_STOPS, dtype=float)
+    rgba = np.stack([np.interp(norm, stops[:, 0], stops[:, c]) for c in range(1, 5)], axis=-1)
+    rgba[norm < 1e-3, 3] = 0
+    return rgba.round().astype(np.uint8)
+
+
+def encode_png(rgba):
+    """RGBA uint8 (h, w, 4) → PNG bytes (zlib + struct, ไม่ใช้ library ภาพ)"""
+    height, width = rgba.shape[:2]
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # byte แรกของแต่ละแถว = filter 0
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def write_heatmap_kmz(points_df, output_path, only_matched=False, width_px=1024, smooth_px=2.0,
+                      log_scale=True, padding=0.02):
+    """
+    ส่งออกภาพความหนาแน่นของ fault เป็น GroundOverlay (KMZ: doc.kml + heatmap.png)
+    - นับจุด (ทั้งหมด หรือ only_matched) ลง grid ครอบทุกจุด (+ padding) ด้วย bincount
+      ความสูงของภาพคิดจาก cos(latitude) ให้ช่องเป็นสี่เหลี่ยมจัตุรัสบนพื้นโดยประมาณ
+    - smooth_px: sigma (pixel) ของ Gaussian blur (0 = ไม่ blur), log_scale: ไล่สีแบบ log
+    ทำงานด้วย numpy ล้วน ไม่เรียก network
+    คืน (width_px, height_px) ของภาพ
+    """
+    df = points_df[points_df['matched']] if only_matched and 'matched' in points_df else points_df
+    lons = df['lon'].to_numpy(dtype=float)
+    lats = df['lat'].to_numpy(dtype=float)
+    if len(lons) == 0:
+        logging.warning("ไม่มีจุดสำหรับ heatmap - ไม่สร้าง %s", output_path)
+        return None
+
+    west, east = float(lons.min()), float(lons.max())
+    south, north = float(lats.min()), float(lats.max())
+    pad = max(east - west, north - south, 1e-3) * padding
+    west, east, south, north = west - pad, east + pad, south - pad, north + pad
+
+    width_px = min(int(width_px), MAX_IMAGE_PX)
+    ground_ratio = (north - south) / ((east - west) * math.cos(math.radians((north + south) / 2)))
+    height_px = min(max(int(round(width_px * ground_ratio)), 1), MAX_IMAGE_PX)
+
+    grid = gaussian_smooth(density_grid(lons, lats, (west, south, east, north), width_px, height_px), smooth_px)
+    png = encode_png(colorize(grid, log_scale))
+
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open("doc.kml", "w") as doc, KmlWriter(output_path, fileobj=doc) as kml:
+            kml.write(
+                f"<GroundOverlay><name>fault density ({len(lons)} จุด)</name>"
+                f"<color>ffffffff</color><Icon><href>heatmap.png</href></Icon>"
+                f"<LatLonBox><north>{north:.7f}</north><south>{south:.7f}</south>"
+                f"<east>{east:.7f}</east><west>{west:.7f}</west></LatLonBox></GroundOverlay>\n"
+            )
+        kmz.writestr("heatmap.png", png, compress_type=zipfile.ZIP_STORED)
+
+    logging.info("✅ บันทึก heatmap แล้ว: %s (%d จุด, ภาพ %dx%d)", output_path, len(lons), width_px, height_px)
+    return width_px, height_px
@@ -0,0 +1,167 @@
+import io
+import logging
+import os
+import zipfile
+
+from ..lazy_controller.lazy_import import lazy_import
+from .write_matches_kml import KmlWriter
+
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+
+# tile ถูกโหลดเมื่อกรอบของ tile บนจอใหญ่อย่างน้อยเท่านี้ (pixel, sqrt ของพื้นที่)
+MIN_LOD_PIXELS = 128
+# จำนวนช่อง (ต่อด้าน) ที่ใช้รวมจุดเป็นตัวเลขในระดับหยาบ
+AGGREGATE_GRID = 4
+CLUSTER_ICON = "http://maps.google.com/mapfiles/kml/shapes/donut.png"
+
+
+def tile_name(key):
+    z, x, y = key
+    return f"tiles/{z}/{x}_{y}.kml"
+
+
+def build_quadtree(lons, lats, max_points=1000, max_level=12):
+    """
+    แบ่งจุดเป็น quadtree บนกรอบสี่เหลี่ยมจัตุรัส (องศา) ที่ครอบทุกจุด
+    tile ที่มีจุดไม่เกิน max_points (หรือถึง max_level) เป็น leaf เก็บจุดจริง
+    tile อื่นแตกเป็น 4 ลูก (เฉพาะลูกที่มีจุด)
+    คืน list ของ dict {'key': (z, x, y), 'bounds': (west, south, east, north), 'idx', 'children'}
+    """
+    west, south = float(lons.min()), float(lats.min())
+    size = max(float(lons.max()) - west, float(lats.max()) - south, 1e-6) * (1 + 1e-9)
+    tiles = []
+    stack = [((0, 0, 0), (west, south, west + size, south + size), np.arange(len(lons)))]
+    while stack:
+        key, bounds, idx = stack.pop()
+        z, x, y = key
+        children = []
+        if len(idx) > max_points and z < max_level:
+            w, s, e, n = bounds
+            mx, my = (w + e) / 2, (s + n) / 2
+            east = lons[idx] >= mx
+            north = lats[idx] >= my
+            for dx in (0, 1):
+                for dy in (0, 1):
+                    sel = idx[(east == bool(dx)) & (north == bool(dy))]
+                    if len(sel) == 0:
+                        continue
+                    child_bounds = (mx if dx else w, my if dy else s, e if dx else mx, n if dy else my)
+                    child_key = (z + 1, 2 * x + dx, 2 * y + dy)
+                    children.append((child_key, child_bounds))
+                    stack.append((child_key, child_bounds, sel))
+        tiles.append({'key': key, 'bounds': bounds, 'idx': idx, 'children': children})
+    return tiles
+
+
+def _region(bounds, min_lod, max_lod=-1):
+    w, s, e, n = bounds
+    return (f"<Region><LatLonAltBox><north>{n:.7f}</north><south>{s:.7f}</south>"
+            f"<east>{e:.7f}</east><west>{w:.7f}</west></LatLonAltBox>"
+            f"<Lod><minLodPixels>{min_lod}</minLodPixels><maxLodPixels>{max_lod}</maxLodPixels></Lod></Region>")
+
+
+def _aggregate(bounds, lons, lats):
+    """รวมจุดใน tile เป็นตาราง AGGREGATE_GRID x AGGREGATE_GRID คืน [(lon, lat, count)] (ตำแหน่ง = ค่าเฉลี่ยของจุดในช่อง)"""
+    w, s, e, n = bounds
+    cx = np.clip(((lons - w) / (e - w) * AGGREGATE_GRID).astype(np.int64), 0, AGGREGATE_GRID - 1)
+    cy = np.clip(((lats - s) / (n - s) * AGGREGATE_GRID).astype(np.int64), 0, AGGREGATE_GRID - 1)
+    cell = cx * AGGREGATE_GRID + cy
+    counts = np.bincount(cell, minlength=AGGREGATE_GRID ** 2)
+    sum_lon = np.bincount(cell, weights=lons, minlength=AGGREGATE_GRID ** 2)
+    sum_lat = np.bincount(cell, weights=lats, minlength=AGGREGATE_GRID ** 2)
+    hit = np.flatnonzero(counts)
+    return list(zip((sum_lon[hit] / counts[hit]).tolist(), (sum_lat[hit] / counts[hit]).tolist(), counts[hit].tolist()))
+
+
+def render_tile(key, bounds, children, records=None, lons=None, lats=None):
+    """
+    เขียน KML ของ tile หนึ่งเป็น bytes (เรียกใน worker process ได้)
+    - leaf (records): placemark ของทุก fault (style/ExtendedData เดียวกับ write_matches_kml)
+    - tile ที่มีลูก: จุดรวมพร้อมจำนวน (แสดงจนกว่า tile ลูกจะถูกโหลด) + NetworkLink ไปยังลูกพร้อม Region
+    """
+    buf = io.BytesIO()
+    with KmlWriter(name=f"{key[0]}/{key[1]}_{key[2]}", fileobj=buf) as kml:
+        kml.write(_region(bounds, 0 if key[0] == 0 else MIN_LOD_PIXELS) + "\n")
+        kml.write_styles()
+        kml.write(f'<Style id="cluster"><IconStyle><Icon><href>{CLUSTER_ICON}</href></Icon></IconStyle></Style>\n')
+        if records is not None:
+            for rec in records:
+                kml.write_fault(rec)
+        else:
+            # ซ่อนจุดรวมเมื่อ tile ลูก (กรอบครึ่งหนึ่ง) ถึง MIN_LOD_PIXELS
+            kml.write(f"<Folder><name>จำนวนจุด</name>{_region(bounds, 0, 2 * MIN_LOD_PIXELS)}\n")
+            for lon, lat, count in _aggregate(bounds, lons, lats):
+                scale = 0.8 + 0.4 * np.log10(count)
+                kml.write(f"<Placemark><name>{count}</name><styleUrl>#cluster</styleUrl>"
+                          f"<Style><IconStyle><scale>{scale:.2f}</scale></IconStyle></Style>"
+                          f"<Point><coordinates>{lon:.7f},{lat:.7f}</coordinates></Point></Placemark>\n")
+            kml.write("</Folder>\n")
+        for child_key, child_bounds in children:
+            # href สัมพัทธ์จาก tiles/z/ ไปยัง tiles/z+1/
+            href = f"../{child_key[0]}/{child_key[1]}_{child_key[2]}.kml"
+            kml.write(f"<NetworkLink><name>{child_key[0]}/{child_key[1]}_{child_key[2]}</name>"
+                      f"{_region(child_bounds, MIN_LOD_PIXELS)}"
+                      f"<Link><href>{href}</href><viewRefreshMode>onRegion</viewRefreshMode></Link></NetworkLink>\n")
+    return buf.getvalue()
+
+
+def _render_task(task):
+    return task[0], render_tile(*task)
+
+
+def write_super_overlay(points_df, output_path, redline_summary=None, only_matched=True,
+                        max_points=1000, max_level=12, workers=None):
+    """
+    ส่งออก fault เป็น regionated super-overlay (KMZ) สำหรับจุดจำนวนมาก
+    - จุดถูกแบ่งเป็น quadtree: tile ที่มีจุดไม่เกิน max_points แสดงจุดจริง tile ที่ใหญ่กว่าแสดงจำนวนรวม
+    - tile เชื่อมกันด้วย NetworkLink + Region/Lod → Google Earth โหลดเฉพาะ tile ที่อยู่ในมุมมองและละเอียดพอ
+    - render tile แบบขนานใน workers process (None = จำนวน CPU, 1 = process หลัก) แล้วเขียนลง KMZ ทีละ tile
+    points_df: ผลจาก analyze_points_vs_redlines (only_matched=True ใช้เฉพาะแถว matched)
+    redline_summary: ถ้าส่งมา จะใส่เส้น redline (info['geom']) ไว้ใน doc.kml หลัก
+    คืนจำนวน tile
+    """
+    df = points_df[points_df['matched']] if only_matched and 'matched' in points_df else points_df
+    df = df.reset_index(drop=True)
+    lons = df['lon'].to_numpy(dtype=float)
+    lats = df['lat'].to_numpy(dtype=float)
+
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open("doc.kml", "w") as doc, KmlWriter(output_path, fileobj=doc) as kml:
+            kml.write_styles()
+            if redline_summary:
+                kml.open_folder("redlines")
+                for rl_name, info in redline_summary.items():
+                    if info.get('geom') is not None:
+                        kml.write_line(rl_name, info['geom'])
+                kml.close_folder()
+            if len(df):
+                kml.write(f"<NetworkLink><name>faults ({len(df)})</name>"
+                          f"<Link><href>{tile_name((0, 0, 0))}</href></Link></NetworkLink>\n")
+
+        if len(df) == 0:
+            logging.warning("ไม่มีจุดสำหรับ super-overlay - เขียนเฉพาะ redline")
+            return 0
+
+        tiles = build_quadtree(lons, lats, max_points, max_level)
+        tasks = []
+        for tile in tiles:
+            idx = tile['idx']
+            if tile['children']:
+                tasks.append((tile['key'], tile['bounds'], tile['children'], None, lons[idx], lats[idx]))
+            else:
+                tasks.append((tile['key'], tile['bounds'], [], df.iloc[idx].to_dict('records')))
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(tasks) <= 1:
+            for key, data in map(_render_task, tasks):
+                kmz.writestr(tile_name(key), data)
+        else:
+            with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                for key, data in pool.map(_render_task, tasks, chunksize=8):
+                    kmz.writestr(tile_name(key), data)
+
+    n_leaf = sum(1 for t in tiles if not t['children'])
+    logging.info("✅ บันทึก super-overlay แล้ว: %s (%d จุด, %d tile, leaf %d, ลึก %d ระดับ)",
+                 output_path, len(df), len(tiles), n_leaf, max(t['key'][0] for t in tiles) + 1)
+    return len(tiles)
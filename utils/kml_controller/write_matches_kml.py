@@ -0,0 +1,168 @@
+import logging
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+from ..lazy_controller.lazy_import import lazy_import
+
+shapely = lazy_import("shapely")
+
+KML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+# ขนาด buffer ก่อนเขียนลงไฟล์ (byte) - หน่วยความจำของ writer คงที่ไม่ขึ้นกับจำนวนจุด
+FLUSH_BYTES = 1 << 16
+
+# สี KML เป็น aabbggrr
+REDLINE_COLOR = "ff0000ff"
+SIGN_STYLES = {
+    'confirm': "ff0000ff",
+    'revise': "ff00a5ff",
+    'close': "ff00ff00",
+    'other': "ffffffff",
+}
+FAULT_ICON = "http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png"
+
+# field ใน ExtendedData ของแต่ละ fault (ชื่อใน KML, key ใน match record, ชนิด)
+FAULT_FIELDS = (
+    ('ticket', 'ticket', 'string'),
+    ('sign', 'sign', 'string'),
+    ('distance_m', 'distance_m', 'double'),
+    ('month', 'group', 'string'),
+    ('sla', 'sla', 'string'),
+    ('region', 'region', 'string'),
+    ('site', 'site', 'string'),
+)
+
+
+def sign_style(sign):
+    """style id ของ fault ตาม sign (Confirm / Revise / Close Action / อื่น ๆ)"""
+    sign = str(sign or "").lower()
+    for key in ('confirm', 'revise', 'close'):
+        if key in sign:
+            return f"fault-{key}"
+    return "fault-other"
+
+
+class KmlWriter:
+    """
+    เขียน KML แบบ stream: ต่อ string เข้า buffer แล้ว flush ลงไฟล์ทุก FLUSH_BYTES
+    ไม่สร้าง XML tree ทั้งไฟล์ในหน่วยความจำ
+    output_path ลงท้าย .kmz → เขียน doc.kml ลง zip (deflate) แบบ stream เช่นกัน
+    fileobj: เขียนลง file object (binary) ที่เปิดไว้แล้วแทน output_path (writer ไม่ปิดให้)
+    ใช้กับ with: เปิด <Document> ตอนเข้า ปิดและ flush ตอนออก
+    """
+
+    def __init__(self, output_path=None, name=None, fileobj=None):
+        self.output_path = output_path
+        self.name = name or os.path.splitext(os.path.basename(output_path or "doc"))[0]
+        self._zip = None
+        self._file = fileobj
+        self._owns_file = fileobj is None
+        self._parts = []
+        self._size = 0
+
+    def __enter__(self):
+        if self._owns_file and self.output_path.lower().endswith(".kmz"):
+            self._zip = zipfile.ZipFile(self.output_path, "w", compression=zipfile.ZIP_DEFLATED)
+            self._file = self._zip.open("doc.kml", "w", force_zip64=True)
+        elif self._owns_file:
+            self._file = open(self.output_path, "wb")
+        self.write(KML_HEADER)
+        self.write(f"<Document><name>{escape(self.name)}</name>\n")
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.write("</Document>\n</kml>\n")
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+        if self._zip is not None:
+            self._zip.close()
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self._file.write("".join(self._parts).encode("utf-8"))
+            self._parts, self._size = [], 0
+
+    # ---------- shared definitions ----------
+    def write_styles(self):
+        """style และ schema ที่ทุก placemark อ้างถึงผ่าน styleUrl / schemaUrl (ประกาศครั้งเดียว)"""
+        self.write(f'<Style id="redline"><LineStyle><color>{REDLINE_COLOR}</color><width>3</width></LineStyle></Style>\n')
+        for key, color in SIGN_STYLES.items():
+            self.write(
+                f'<Style id="fault-{key}"><IconStyle><color>{color}</color><scale>0.8</scale>'
+                f'<Icon><href>{FAULT_ICON}</href></Icon></IconStyle>'
+                f'<LabelStyle><scale>0</scale></LabelStyle></Style>\n'
+            )
+        fields = "".join(f'<SimpleField type="{kind}" name="{name}"/>' for name, _, kind in FAULT_FIELDS)
+        self.write(f'<Schema name="fault" id="fault">{fields}</Schema>\n')
+
+    # ---------- features ----------
+    def open_folder(self, name, visible=True):
+        self.write(f"<Folder><name>{escape(str(name))}</name><visibility>{int(visible)}</visibility>\n")
+
+    def close_folder(self):
+        self.write("</Folder>\n")
+
+    def write_line(self, name, geom, style="redline"):
+        """redline (LineString / MultiLineString, lon/lat) เป็น placemark เดียว"""
+        parts = shapely.get_parts(geom)
+        self.write(f"<Placemark><name>{escape(str(name))}</name><styleUrl>#{style}</styleUrl><MultiGeometry>")
+        for part in parts:
+            coords = shapely.get_coordinates(part)
+            self.write("<LineString><tessellate>1</tessellate><coordinates>")
+            self.write(" ".join(f"{x:.7f},{y:.7f}" for x, y in coords.tolist()))
+            self.write("</coordinates></LineString>")
+        self.write("</MultiGeometry></Placemark>\n")
+
+    def write_fault(self, rec):
+        """match record (จาก match_record) เป็น placemark จุด + ExtendedData ตาม FAULT_FIELDS"""
+        data = []
+        for name, key, kind in FAULT_FIELDS:
+            value = rec.get(key)
+            if value is None:
+                continue
+            value = f"{value:.1f}" if kind == "double" else escape(str(value))
+            data.append(f'<SimpleData name="{name}">{value}</SimpleData>')
+        self.write(
+            f"<Placemark><name>{escape(str(rec.get('ticket') or ''))}</name>"
+            f"<styleUrl>#{sign_style(rec.get('sign'))}</styleUrl>"
+            f'<ExtendedData><SchemaData schemaUrl="#fault">{"".join(data)}</SchemaData></ExtendedData>'
+            f"<Point><coordinates>{rec['lon']:.7f},{rec['lat']:.7f}</coordinates></Point></Placemark>\n"
+        )
+
+
+def write_matches_kml(redline_summary, output_path, points_key="points_by_details", include_empty=False):
+    """
+    ส่งออกผล match เป็น KML/KMZ สำหรับเปิดใน Google Earth
+    - 1 folder ต่อ redline: เส้น redline + จุด fault ที่ match (ExtendedData: ticket, sign, distance_m, month, ...)
+    - style ของเส้นและจุด (ตาม sign) ประกาศครั้งเดียวที่หัวไฟล์ ทุก placemark อ้างด้วย styleUrl
+    - เขียนแบบ stream (KmlWriter) ใช้ .kmz เพื่อให้ไฟล์เล็ก
+    redline_summary: ผลจาก analyze_points_vs_redlines (ใช้ info['geom'] และ info[points_key])
+    points_key: 'points_by_details' (ค่าเริ่มต้น), 'points_by_coords' หรือ 'raw_matches'
+    include_empty: ใส่ redline ที่ไม่มีจุด match ด้วยหรือไม่
+    คืนจำนวนจุดที่เขียน
+    """
+    n_points = n_folders = 0
+    with KmlWriter(output_path) as kml:
+        kml.write_styles()
+        for rl_name, info in redline_summary.items():
+            points = info.get(points_key) or []
+            if not points and not include_empty:
+                continue
+            kml.open_folder(f"{rl_name} ({len(points)})")
+            if info.get('geom') is not None:
+                kml.write_line(rl_name, info['geom'])
+            for rec in points:
+                kml.write_fault(rec)
+            kml.close_folder()
+            n_points += len(points)
+            n_folders += 1
+    logging.info("✅ บันทึก KML แล้ว: %s (%d redline, %d จุด)", output_path, n_folders, n_points)
+    return n_points
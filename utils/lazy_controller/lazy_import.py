@@ -0,0 +1,47 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    module proxy ที่ยังไม่ import จริงจนกว่าจะมีการเข้าถึง attribute ครั้งแรก
+    - หลัง import แล้วจะ copy namespace ของ module จริงมาไว้ใน proxy
+      ครั้งต่อไปจึงเป็นการ lookup ปกติ ไม่ผ่าน __getattr__ อีก
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    คืน module แบบ lazy: import จริงตอนใช้งานครั้งแรก
+    ใช้แทน `import pandas as pd` → `pd = lazy_import("pandas")`
+    """
+    return LazyModule(name)
+
+
+def is_loaded(module):
+    """เช็คว่า lazy module ถูก import จริงไปแล้วหรือยัง (module ปกติถือว่า loaded)"""
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_module"] is not None
+    return True
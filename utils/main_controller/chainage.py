@@ -0,0 +1,129 @@
+import logging
+import os
+import re
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import utm_epsg_for_lon, get_transformer_to_utm, project_geom_with_transformer
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+# รหัส site ต้นทาง (A-end) จากชื่อไฟล์ เช่น "CMI1000-LPN3052.kml", "CMI1000_DN-LPN3052_DN.kml", "CMI1000 to LPN3052"
+SITE_CODE_RE = re.compile(r"\s*([A-Z]{3}[A-Z0-9]{4})")
+# count_field ของ summary → list ของ record ที่นับ (subset ของ raw_matches)
+COUNTED_POINTS = {'count': 'points_by_details', 'count_by_details': 'points_by_details',
+                  'count_by_coords': 'points_by_coords'}
+
+
+def a_end_site(redline_name):
+    """รหัส site ต้นทางจากชื่อ redline (None ถ้าชื่อไม่อยู่ในรูป SITE-SITE)"""
+    match = SITE_CODE_RE.match(os.path.splitext(redline_name)[0])
+    return match.group(1) if match else None
+
+
+def _route_projection(rl):
+    """
+    เส้นทางของ redline ใน UTM zone ของ vertex แรก (ใช้ cache เดียวกับ distance engine)
+    MultiLineString ที่ต่อกันได้จะถูก line_merge ก่อน
+    คืน (epsg, projected_route)
+    """
+    lon, lat = shapely.get_coordinates(rl['geom'])[0]
+    epsg = utm_epsg_for_lon(lon, lat)
+    cache = rl.setdefault('epsg_cache', {})
+    key = (epsg, 'route')
+    if key not in cache:
+        projected = cache.get(epsg)
+        if projected is None:
+            projected = project_geom_with_transformer(rl['geom'], get_transformer_to_utm(epsg))
+            cache[epsg] = projected
+        route = shapely.line_merge(projected) if projected.geom_type == "MultiLineString" else projected
+        cache[key] = route
+    return epsg, cache[key]
+
+
+def _starts_at_a_end(route, epsg, site_lonlat):
+    """True ถ้าต้นเส้นอยู่ใกล้ site ต้นทางมากกว่าปลายเส้น (ไม่มีพิกัด site → ถือว่าต้นเส้นคือ A-end)"""
+    if site_lonlat is None:
+        return True
+    x, y = get_transformer_to_utm(epsg).transform(*site_lonlat)
+    coords = shapely.get_coordinates(route)
+    start, end = coords[0], coords[-1]
+    return np.hypot(*(start - (x, y))) <= np.hypot(*(end - (x, y)))
+
+
+def chainage_for_redline(rl, lons, lats, site_locations=None):
+    """
+    chainage (m) ของจุดบน redline วัดจาก A-end - project ทุกจุดลงเส้นใน pass เดียว (line_locate_point)
+    site_locations: dict รหัส site -> (lon, lat) ใช้กลับทิศเส้นให้เริ่มที่ A-end (ถ้ามี)
+    คืน (chainage_m array, route_length_m)
+    """
+    epsg, route = _route_projection(rl)
+    length = float(route.length)
+    if len(lons) == 0:
+        return np.empty(0), length
+
+    xs, ys = get_transformer_to_utm(epsg).transform(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+    chainage = shapely.line_locate_point(route, shapely.points(xs, ys))
+
+    site = a_end_site(rl['name'])
+    site_lonlat = (site_locations or {}).get(site)
+    if not _starts_at_a_end(route, epsg, site_lonlat):
+        chainage = length - chainage
+    return chainage, length
+
+
+def add_chainage(redline_geoms, redline_summary, bin_km=1.0, site_locations=None, reports=None,
+                 count_field="count_by_coords"):
+    """
+    ขั้น linear referencing หลัง summarize:
+      - ใส่ 'chainage_m' ให้ทุก record ใน raw_matches (ระยะตามเส้นจาก A-end)
+      - ใส่ 'route_length_m', 'faults_per_km' ลง summary ของแต่ละ redline
+        faults_per_km = จำนวนที่ dedupe แล้ว (count_field ค่าเริ่มต้น count_by_coords) / ความยาวเส้น
+        ตรงกับ count ของ summary ไม่ใช่จำนวน match ดิบ
+      - reports['chainage_histogram']: จำนวน fault ต่อช่วง bin_km ต่อ redline นับเฉพาะ record ที่ dedupe แล้ว
+        ชุดเดียวกับ count_field (ผลรวมทั้งเส้น = count_field)
+    """
+    points_key = COUNTED_POINTS[count_field]
+    rows = []
+    for rl in redline_geoms:
+        info = redline_summary.get(rl['name'])
+        if info is None:
+            continue
+        matches = info['raw_matches']
+        try:
+            chainage, length = chainage_for_redline(
+                rl, [r['lon'] for r in matches], [r['lat'] for r in matches], site_locations
+            )
+        except Exception as e:
+            logging.warning("คำนวณ chainage ของ %s ไม่สำเร็จ: %s", rl['name'], e)
+            continue
+
+        for r, c in zip(matches, chainage.tolist()):
+            r['chainage_m'] = round(c, 1)
+        by_record = dict(zip(map(id, matches), chainage.tolist()))
+        counted = np.array([by_record[id(r)] for r in info[points_key]], dtype=float)
+        info['route_length_m'] = length
+        info['faults_per_km'] = info[count_field] / (length / 1000) if length > 0 else 0.0
+
+        # histogram ต่อช่วง bin_km (ครอบคลุมทั้งเส้นแม้ช่วงที่ไม่มี fault)
+        bin_m = bin_km * 1000
+        n_bins = max(int(np.ceil(length / bin_m)), 1)
+        bins = np.minimum((counted // bin_m).astype(np.int64), n_bins - 1)
+        counts = np.bincount(bins, minlength=n_bins)
+        info['chainage_histogram'] = counts
+        a_end = a_end_site(rl['name'])
+        for b, n in enumerate(counts.tolist()):
+            rows.append({
+                'redline': rl['name'],
+                'A-end': a_end,
+                'km_from': round(b * bin_km, 3),
+                'km_to': round(min((b + 1) * bin_m, length) / 1000, 3),
+                'จำนวนจุด': n,
+            })
+
+    if reports is not None:
+        reports['chainage_histogram'] = pd.DataFrame(
+            rows, columns=['redline', 'A-end', 'km_from', 'km_to', 'จำนวนจุด']
+        )
+    return redline_summary
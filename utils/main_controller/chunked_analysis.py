@@ -0,0 +1,309 @@
+import logging
+import math
+import os
+import shutil
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..parse_controller.parse_points import parse_kml_points
+from ..parse_controller.parse_table import is_table_file, iter_table_points
+from ..store_controller.columnar_store import POINT_SCHEMA, ColumnStore, iter_points
+from ..bench_controller.stage_timer import stage
+from .main_analysis import (ENGINES, prepare_redlines, match_points, add_route_reports, report_simplification,
+                            simplify_tolerance)
+from .duplicate_report import build_duplicate_coords_report
+from .exclusive_assignment import ASSIGNMENTS, assign_exclusive, shared_faults_table, split_by_assignment
+from .summary_accumulator import SummaryAccumulator
+from .hotspot import NOISE, cluster_hotspots
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DEFAULT_CHUNK_SIZE = 100_000
+# ผลต่อจุด (1 แถวต่อจุด ลำดับเดียวกับ points_df ของ analyze_points_vs_redlines) เก็บใน ColumnStore
+RESULT_SCHEMA = {'group': 'str', **POINT_SCHEMA, 'nearest_redline': 'str', 'distance_m': 'f8', 'matched': '?'}
+# ลำดับคอลัมน์ของ points_df
+POINT_RESULT_COLUMNS = ['group', 'lat', 'lon', 'ticket', 'sign', 'sla', 'region', 'site', 'online/mobile',
+                        'nearest_redline', 'distance_m', 'matched', 'key']
+# record ของไฟล์ bucket สำหรับหา coordinate ซ้ำ
+DUPLICATE_RECORD = [('lat', '<f8'), ('lon', '<f8'), ('pos', '<i8')]
+
+
+def iter_point_chunks(points_grouped, chunk_size=DEFAULT_CHUNK_SIZE, point_columns=None, point_store=None):
+    """
+    points ทีละ chunk (list ของ dict แบบ load_points ไม่เกิน chunk_size จุด) ลำดับเดียวกับ load_points / read_points
+    - point_store: อ่านทีละช่วงแถวจาก memmap (points_grouped = รายชื่อกลุ่ม, None = ทุกกลุ่ม)
+    - ไฟล์ตาราง: อ่านทีละ chunk (iter_table_points)
+    - KML: อ่านทีละไฟล์ (parse_kml_points) แล้วแบ่ง chunk
+    """
+    if point_store is not None:
+        yield from iter_points(point_store, points_grouped, chunk_size)
+        return
+
+    def batches():
+        for group_name, filepath in points_grouped.items():
+            if is_table_file(filepath):
+                parts = (df.to_dict('records') for df in iter_table_points(filepath, point_columns, chunk_size))
+            else:
+                parts = [parse_kml_points(filepath)]
+            n_points = 0
+            for pts in parts:
+                for p in pts:
+                    p['group'] = group_name
+                    p['key'] = group_name
+                n_points += len(pts)
+                yield pts
+            if not n_points:
+                logging.info("ไฟล์ %s - ไม่มีจุดหรือไม่พบ", filepath)
+            else:
+                logging.info("อ่าน %s -> %d จุด", group_name, n_points)
+
+    buffer = []
+    for pts in batches():
+        buffer.extend(pts)
+        while len(buffer) >= chunk_size:
+            yield buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+    if buffer:
+        yield buffer
+
+
+def _result_columns(points_results, schema):
+    columns = {column: [r.get(column) for r in points_results] for column in schema if column != 'cluster_id'}
+    if 'cluster_id' in schema:
+        columns['cluster_id'] = np.full(len(points_results), NOISE, dtype=np.int64)
+    return columns
+
+
+def load_results(results, start=0, stop=None):
+    """อ่านแถว [start, stop) ของผลต่อจุดจาก store เป็น DataFrame รูปเดียวกับ points_df"""
+    stop = results.n_rows if stop is None else min(stop, results.n_rows)
+    data = {}
+    for column, kind in results.schema.items():
+        values = results.column(column)[start:stop]
+        data[column] = results.decode(column, values) if kind == 'str' else np.array(values)
+    data['key'] = data['group']
+    columns = POINT_RESULT_COLUMNS + (['cluster_id'] if 'cluster_id' in results.schema else [])
+    return pd.DataFrame({column: data[column] for column in columns})
+
+
+def _as_stores(results):
+    """ColumnStore เดียวหรือ list (เช่น ผลของแต่ละ shard ตามลำดับ) → (list ของ store, แถวเริ่มของแต่ละ store)"""
+    stores = list(results) if isinstance(results, (list, tuple)) else [results]
+    offsets = np.cumsum([0] + [store.n_rows for store in stores])
+    return stores, offsets
+
+
+def _gather(stores, offsets, pos, columns):
+    """อ่านแถวตำแหน่ง pos (นับต่อกันทุก store) ของ columns คืน dict ชื่อคอลัมน์ → array ตามลำดับ pos"""
+    which = np.searchsorted(offsets, pos, side="right") - 1
+    data = {column: np.empty(len(pos), dtype=object if stores[0].schema[column] == 'str' else stores[0].schema[column])
+            for column in columns}
+    for i, store in enumerate(stores):
+        mask = which == i
+        if not mask.any():
+            continue
+        rows = pos[mask] - offsets[i]
+        for column in columns:
+            values = store.column(column)[rows]
+            data[column][mask] = store.decode(column, values) if store.schema[column] == 'str' else values
+    return data
+
+
+def duplicate_report_from_store(results, bucket_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    ตาราง duplicate_coords (เท่ากับ build_duplicate_coords_report ของทุกจุด) โดยไม่โหลดทุกจุดพร้อมกัน
+    results: ColumnStore หรือ list ของ ColumnStore (ถือเป็นแถวต่อกันตามลำดับ)
+    - รอบที่ 1: อ่าน lat/lon ทีละ chunk แล้วแยกลงไฟล์ bucket ตาม hash ของ coordinate (ที่ปัด 6 ตำแหน่ง)
+      coordinate เดียวกันอยู่ bucket เดียวกันเสมอ จำนวน bucket ≈ จำนวนจุด / chunk_size
+    - รอบที่ 2: หา coordinate ซ้ำทีละ bucket แล้วอ่านรายละเอียดเฉพาะแถวที่ซ้ำ
+    ลำดับแถวเหมือนเดิม: ตามจุดแรกที่พบ แล้วเรียงจำนวนจุดมากไปน้อย (stable)
+    """
+    stores, offsets = _as_stores(results)
+    n = int(offsets[-1])
+    n_buckets = max(1, math.ceil(n / chunk_size))
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+    os.makedirs(bucket_dir)
+    paths = [os.path.join(bucket_dir, f"bucket_{b:05d}.bin") for b in range(n_buckets)]
+
+    for store, offset in zip(stores, offsets.tolist()):
+        lat_col, lon_col = store.column('lat'), store.column('lon')
+        for start in range(0, store.n_rows, chunk_size):
+            stop = min(start + chunk_size, store.n_rows)
+            records = np.empty(stop - start, dtype=DUPLICATE_RECORD)
+            records['lat'] = np.round(np.asarray(lat_col[start:stop], dtype=float), 6) + 0.0  # -0.0 → 0.0
+            records['lon'] = np.round(np.asarray(lon_col[start:stop], dtype=float), 6) + 0.0
+            records['pos'] = np.arange(offset + start, offset + stop)
+            _spill_buckets(records, paths)
+
+    detail_columns = ['ticket', 'sign', 'site', 'group']
+    tables = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        records = np.fromfile(path, dtype=DUPLICATE_RECORD)
+        frame = pd.DataFrame({'lat': records['lat'], 'lon': records['lon'], 'pos': records['pos']})
+        frame = frame[frame.duplicated(['lat', 'lon'], keep=False)]
+        if frame.empty:
+            continue
+        subset = pd.DataFrame(_gather(stores, offsets, frame['pos'].to_numpy(), ['lat', 'lon'] + detail_columns))
+        table = build_duplicate_coords_report(subset)
+        if table.empty:
+            continue
+        first = frame.groupby(['lat', 'lon'], sort=False)['pos'].first().rename('first_pos').reset_index()
+        tables.append(table.merge(first, on=['lat', 'lon'], how='left'))
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+
+    if not tables:
+        return build_duplicate_coords_report(None)
+    report = pd.concat(tables, ignore_index=True).sort_values('first_pos', kind="stable")
+    report = report.sort_values("จำนวนจุด", ascending=False, kind="stable").drop(columns='first_pos')
+    return report.reset_index(drop=True)
+
+
+def _spill_buckets(records, paths):
+    """ต่อท้าย records ลงไฟล์ bucket ตาม hash ของ coordinate"""
+    n_buckets = len(paths)
+    hashed = records['lat'].view(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + records['lon'].view(np.uint64)
+    bucket = (hashed % np.uint64(n_buckets)).astype(np.int64)
+    order = np.argsort(bucket, kind="stable")
+    bounds = np.searchsorted(bucket[order], np.arange(n_buckets + 1))
+    for b in np.flatnonzero(np.diff(bounds)).tolist():
+        with open(paths[b], "ab") as f:
+            f.write(records[order[bounds[b]:bounds[b + 1]]].tobytes())
+
+
+def _hotspots_from_store(results, eps_m, min_samples, chunk_size, reports):
+    """hotspot จากจุดที่ match เท่านั้น (อ่านเฉพาะแถวที่ match) แล้วเขียน cluster_id กลับลงแต่ละ store"""
+    stores, offsets = _as_stores(results)
+    pos = [np.empty(0, dtype=np.int64)]
+    for store, offset in zip(stores, offsets.tolist()):
+        matched_col = store.column('matched')
+        pos.extend(np.flatnonzero(matched_col[s:s + chunk_size]) + s + offset
+                   for s in range(0, store.n_rows, chunk_size))
+    pos = np.concatenate(pos)
+    matched = pd.DataFrame(_gather(stores, offsets, pos, ['lat', 'lon', 'group', 'nearest_redline']), index=pos)
+    matched['matched'] = True
+    table = cluster_hotspots(matched, eps_m, min_samples, reports=reports)
+    cluster_ids = matched['cluster_id'].to_numpy()
+    for i, store in enumerate(stores):
+        mask = (pos >= offsets[i]) & (pos < offsets[i + 1])
+        store.update('cluster_id', pos[mask] - offsets[i], cluster_ids[mask])
+    return table
+
+
+def result_schema(hotspot_radius_m=None):
+    """schema ของ store ผลต่อจุด (มี cluster_id เมื่อหา hotspot)"""
+    return dict(RESULT_SCHEMA, **({'cluster_id': 'i8'} if hotspot_radius_m else {}))
+
+
+def process_point_chunks(chunks, redline_geoms, compute_redlines, results, threshold_m=100, engine="distance",
+                         simplify_tolerance_m=None, assignment="all", stages=None):
+    """
+    จับคู่ chunks (จาก iter_point_chunks) ทีละ chunk แล้ว spill ผลต่อจุดลง results (ColumnStore)
+    คืน (summary, shared)
+      - summary: SummaryAccumulator ของ match ทั้งหมด
+      - shared: จุดที่อยู่ในระยะหลายเส้น (สำหรับ shared_faults_table)
+    """
+    summary = SummaryAccumulator(redline_geoms, assignment)
+    shared = {}
+    while True:
+        with stage(stages, "parse_points"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with stage(stages, f"match_{engine}"):
+            points_results, redline_matches = match_points(chunk, compute_redlines, threshold_m, engine,
+                                                           simplify_tolerance_m)
+        with stage(stages, "summary"):
+            exclusive_matches = assign_exclusive(redline_geoms, redline_matches, shared)
+            summary.add(*split_by_assignment(assignment, redline_matches, exclusive_matches))
+        with stage(stages, "spill"):
+            results.append(_result_columns(points_results, results.schema))
+        logging.info("chunk: %d จุด (รวม %d)", len(chunk), results.n_rows)
+        del chunk, points_results, redline_matches, exclusive_matches
+    return summary, shared
+
+
+def finish_chunked(results, redline_geoms, summary, shared, spill_dir, reports=None, redline_reports=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, simplify_tolerance_m=None, simplify_rows=None,
+                   chainage_bin_km=None, hotspot_radius_m=None, hotspot_min_points=3, site_files=None,
+                   site_tolerance_m=100, stages=None):
+    """
+    report ที่ต้องใช้จุดทั้งหมด (duplicate_coords, shared_faults, เส้นทาง, hotspot) หลังจับคู่ครบแล้ว
+    results: ColumnStore หรือ list ของ ColumnStore (แถวต่อกันตามลำดับจุด)
+    simplify_rows: แถวของ redline_simplify ที่รวมมาแล้ว (None = อ่านจาก cache ของ redline_geoms)
+    คืน redline_summary (dict เหมือน analyze_points_vs_redlines)
+    """
+    with stage(stages, "duplicate_report"):
+        duplicate_report = duplicate_report_from_store(results, os.path.join(spill_dir, "duplicates"), chunk_size)
+    if len(duplicate_report) > 0:
+        logging.warning(
+            "พบ coordinate ที่ซ้ำกันทั้งหมด %d ตำแหน่ง (%d จุด) - ดูรายละเอียดใน sheet 'duplicate_coords'",
+            len(duplicate_report), int(duplicate_report["จำนวนจุด"].sum())
+        )
+    if reports is not None:
+        reports["duplicate_coords"] = duplicate_report
+        reports.update(redline_reports or {})
+    if simplify_tolerance_m:
+        report_simplification(redline_geoms, simplify_tolerance_m, reports, simplify_rows)
+
+    with stage(stages, "summary"):
+        shared_faults_table(shared, reports)
+        redline_summary_counts = summary.result()
+    add_route_reports(redline_geoms, redline_summary_counts, site_files, site_tolerance_m, chainage_bin_km,
+                      reports, stages)
+    if hotspot_radius_m:
+        with stage(stages, "hotspot"):
+            _hotspots_from_store(results, hotspot_radius_m, hotspot_min_points, chunk_size, reports)
+    return redline_summary_counts
+
+
+def analyze_points_chunked(points_grouped, redlines_files, spill_dir, threshold_m=100, reports=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, simplify_ratio=None, collapse_duplicate_redlines=True,
+                           engine="distance", chainage_bin_km=None, hotspot_radius_m=None, hotspot_min_points=3,
+                           site_files=None, site_tolerance_m=100, point_store=None, point_columns=None,
+                           assignment="all", stages=None):
+    """
+    analyze_points_vs_redlines แบบ out-of-core สำหรับจุดจำนวนมากเกิน memory
+    - อ่านและจับคู่ทีละ chunk_size จุด (engine เดิม) แล้ว spill ผลต่อจุดลง ColumnStore ที่ <spill_dir>/results
+    - summary ต่อ redline (dedupe coordinate/รายละเอียด, count_all/count_exclusive) สะสมทีละ chunk
+      ด้วย SummaryAccumulator ผลเท่ากับแบบ in-memory ทุกค่า
+    - duplicate_coords / shared_faults / hotspot คำนวณจากไฟล์ที่ spill แล้ว ผลเท่ากับแบบ in-memory
+    memory สูงสุด ≈ ขนาด chunk + จุดที่ match (ข้อมูลของ summary) + dictionary ของคอลัมน์ string
+    ไม่รองรับ repeat_radius_m (ต้องใช้ทุกจุดพร้อมกัน - ใช้ analyze_points_vs_redlines)
+    แบ่งรันหลายเครื่อง: shard_coordinator.py (ใช้ process_point_chunks / finish_chunked ชุดเดียวกัน)
+    คืน (results, redline_summary)
+      - results: ColumnStore ของผลต่อจุด (อ่านเป็น DataFrame ด้วย load_results ทีละช่วงแถว)
+      - redline_summary: dict เหมือน analyze_points_vs_redlines (None, None ถ้าไม่มีจุด/redline)
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"ไม่รู้จัก engine: {engine} (ใช้ได้: {', '.join(ENGINES)})")
+    if assignment not in ASSIGNMENTS:
+        raise ValueError(f"ไม่รู้จัก assignment: {assignment} (ใช้ได้: {', '.join(ASSIGNMENTS)})")
+
+    redline_reports = {}  # ใส่ลง reports หลัง duplicate_coords (ลำดับ sheet เหมือนแบบ in-memory)
+    redline_geoms, compute_redlines = prepare_redlines(redlines_files, collapse_duplicate_redlines,
+                                                       redline_reports, stages)
+    if not redline_geoms:
+        return None, None
+
+    results_dir = os.path.join(spill_dir, "results")
+    shutil.rmtree(results_dir, ignore_errors=True)
+    results = ColumnStore(results_dir, result_schema(hotspot_radius_m))
+
+    simplify_tolerance_m = simplify_tolerance(threshold_m, simplify_ratio, engine)
+    logging.info("เริ่มคำนวณระยะแบบ chunk (threshold %d m, engine=%s, chunk %d จุด)...",
+                 threshold_m, engine, chunk_size)
+    chunks = iter_point_chunks(points_grouped, chunk_size, point_columns, point_store)
+    summary, shared = process_point_chunks(chunks, redline_geoms, compute_redlines, results, threshold_m, engine,
+                                           simplify_tolerance_m, assignment, stages)
+    if results.n_rows == 0:
+        logging.error("ไม่พบ points ใด ๆ")
+        return None, None
+
+    redline_summary_counts = finish_chunked(
+        results, redline_geoms, summary, shared, spill_dir, reports, redline_reports, chunk_size,
+        simplify_tolerance_m, chainage_bin_km=chainage_bin_km, hotspot_radius_m=hotspot_radius_m,
+        hotspot_min_points=hotspot_min_points, site_files=site_files, site_tolerance_m=site_tolerance_m,
+        stages=stages)
+    return results, redline_summary_counts
@@ -0,0 +1,160 @@
+import logging
+from collections import defaultdict
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import utm_epsg_for_lon, get_transformer_to_utm, project_geom_with_transformer
+from .match_records import match_record, point_result, add_match
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+def _projected_geom(rl, epsg):
+    """
+    projected geometry ของ redline ใน EPSG ที่กำหนด (ใช้ cache เดียวกับ distance engine)
+    แปลงไม่สำเร็จคืน None - จำไว้ที่ key (epsg, 'failed') ไม่ใส่ None ที่ key epsg ซึ่ง point_to_geom_distance_m ใช้ร่วม
+    """
+    cache = rl['epsg_cache']
+    if epsg not in cache:
+        if (epsg, 'failed') in cache:
+            return None
+        try:
+            cache[epsg] = project_geom_with_transformer(rl['geom'], get_transformer_to_utm(epsg))
+        except Exception as e:
+            logging.error("การแปลง geometry ไป EPSG:%d ผิดพลาด: %s", epsg, e)
+            cache[(epsg, 'failed')] = True
+            return None
+    return cache[epsg]
+
+
+def corridor_buffer(rl, epsg, threshold_m, quad_segs=16):
+    """
+    buffer(threshold_m) ของ redline ใน EPSG ที่กำหนด สร้างครั้งเดียวต่อ redline/threshold แล้ว prepare ไว้
+    เก็บใน epsg_cache ของ redline (key (epsg, 'buffer', threshold_m, quad_segs)) หมดอายุพร้อม redline
+    """
+    cache = rl.setdefault('epsg_cache', {})
+    key = (epsg, 'buffer', float(threshold_m), quad_segs)
+    if key not in cache:
+        projected = _projected_geom(rl, epsg)
+        buffer_zone = None
+        if projected is not None:
+            buffer_zone = shapely.buffer(projected, threshold_m, quad_segs=quad_segs)
+            shapely.prepare(buffer_zone)
+        cache[key] = buffer_zone
+    return cache[key]
+
+
+def corridor_match_indices(lons, lats, compute_redlines, threshold_m, quad_segs=16):
+    """
+    แกนของ corridor engine: จุดที่อยู่ใน buffer(threshold_m) ของแต่ละ redline
+    - project จุดแบบ vectorized ทีละ UTM zone (zone ของจุด เหมือน distance engine)
+    - STRtree ของจุดกรอง candidate ด้วย bbox ของ buffer แล้วเช็ค contains_xy กับ buffer ที่ prepare แล้ว
+    - nearest redline ของทุกจุดจาก STRtree ของเส้น (เสมอกัน → เลือกเส้นที่มาก่อน เหมือน distance engine)
+    คืน (matches, best_idx, best_dist)
+      - matches: list (ตามลำดับ compute_redlines) ของ (index จุดเรียงจากน้อยไปมาก, ระยะ (m))
+      - best_idx: index ของ redline ที่ใกล้ที่สุด (-1 ถ้าไม่มี), best_dist: ระยะ (inf ถ้าไม่มี)
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    n = len(lons)
+    best_idx = np.full(n, -1, dtype=np.int64)
+    best_dist = np.full(n, np.inf)
+    found = [([], []) for _ in compute_redlines]
+
+    zone = np.floor((lons + 180) / 6).astype(np.int64) + 1
+    epsgs = np.where(lats >= 0, 32600 + zone, 32700 + zone)
+    for epsg in np.unique(epsgs):
+        epsg = int(epsg)
+        idx = np.flatnonzero(epsgs == epsg)
+        xs, ys = get_transformer_to_utm(epsg).transform(lons[idx], lats[idx])
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        points = shapely.points(xs, ys)
+        point_tree = shapely.STRtree(points)
+
+        line_ids, lines = [], []
+        for i, rl in enumerate(compute_redlines):
+            projected = _projected_geom(rl, epsg)
+            if projected is None:
+                continue
+            line_ids.append(i)
+            lines.append(projected)
+
+            buffer_zone = corridor_buffer(rl, epsg, threshold_m, quad_segs)
+            candidates = point_tree.query(buffer_zone)
+            if len(candidates) == 0:
+                continue
+            candidates = candidates[shapely.contains_xy(buffer_zone, xs[candidates], ys[candidates])]
+            if len(candidates) == 0:
+                continue
+            found[i][0].append(idx[candidates])
+            found[i][1].append(shapely.distance(projected, points[candidates]))
+
+        if not lines:
+            continue
+        (p_local, l_local), dists = shapely.STRtree(lines).query_nearest(
+            points, all_matches=True, return_distance=True
+        )
+        # เสมอกันหลายเส้น → เลือกเส้นที่ index ต่ำสุด
+        order = np.lexsort((l_local, p_local))
+        p_local, l_local, dists = p_local[order], l_local[order], dists[order]
+        first = np.r_[True, p_local[1:] != p_local[:-1]]
+        best_idx[idx[p_local[first]]] = np.asarray(line_ids)[l_local[first]]
+        best_dist[idx[p_local[first]]] = dists[first]
+
+    matches = []
+    for point_ids, dists in found:
+        if not point_ids:
+            matches.append((np.empty(0, dtype=np.int64), np.empty(0)))
+            continue
+        point_ids, dists = np.concatenate(point_ids), np.concatenate(dists)
+        order = np.argsort(point_ids, kind="stable")
+        matches.append((point_ids[order], dists[order]))
+    return matches, best_idx, best_dist
+
+
+def match_points_corridor(all_points, compute_redlines, threshold_m, quad_segs=16):
+    """
+    engine "corridor": นับจุดที่อยู่ใน buffer(threshold_m) ของ redline (แบบ test4 count_faults_per_redline)
+    ผลลัพธ์อยู่ในรูปเดียวกับ match_points_distance → ใช้ summarize_redline_matches ต่อได้เลย
+    ความต่างจาก distance engine: buffer เป็นรูปหลายเหลี่ยมประมาณวงกลม (quad_segs ต่อ 1/4 วง)
+    จุดที่อยู่ห่างเกือบเท่า threshold พอดีจึงอาจนับต่างกันได้
+    คืน (points_results, redline_matches)
+    """
+    lons = [float(p['lon']) for p in all_points]
+    lats = [float(p['lat']) for p in all_points]
+    matches, best_idx, best_dist = corridor_match_indices(lons, lats, compute_redlines, threshold_m, quad_segs)
+
+    redline_matches = defaultdict(list)
+    matched_any = np.zeros(len(all_points), dtype=bool)
+    for rl, (point_ids, dists) in zip(compute_redlines, matches):
+        matched_any[point_ids] = True
+        for k, dist in zip(point_ids.tolist(), dists.tolist()):
+            add_match(redline_matches, rl, match_record(all_points[k], lats[k], lons[k], dist))
+
+    points_results = []
+    for k, p in enumerate(all_points):
+        best = int(best_idx[k])
+        best_redline = compute_redlines[best]['name'] if best >= 0 else None
+        points_results.append(point_result(p, lats[k], lons[k], best_redline, float(best_dist[k]),
+                                           bool(matched_any[k])))
+    return points_results, redline_matches
+
+
+def compare_corridor_vs_distance(corridor_summary, distance_summary):
+    """
+    cross-check: เทียบจำนวนจุดต่อ redline ระหว่าง corridor engine กับ distance engine
+    คืน DataFrame: redline, count (distance), count (corridor), ต่างกัน - เฉพาะ redline ที่นับต่างกัน
+    """
+    rows = []
+    for name in distance_summary.keys() | corridor_summary.keys():
+        by_distance = distance_summary.get(name, {}).get('count', 0)
+        by_corridor = corridor_summary.get(name, {}).get('count', 0)
+        if by_distance != by_corridor:
+            rows.append({
+                'redline': name,
+                'count (distance)': by_distance,
+                'count (corridor)': by_corridor,
+                'ต่างกัน': by_corridor - by_distance,
+            })
+    table = pd.DataFrame(rows, columns=['redline', 'count (distance)', 'count (corridor)', 'ต่างกัน'])
+    return table.sort_values('redline', kind="stable").reset_index(drop=True)
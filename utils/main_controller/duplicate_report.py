@@ -0,0 +1,47 @@
+from ..lazy_controller.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+DETAIL_COLUMNS = ["ticket", "sign", "site", "group"]
+
+
+def _join_unique(values):
+    return ", ".join(str(v) for v in pd.unique(values))
+
+
+def build_duplicate_coords_report(points_table):
+    """
+    สร้างตารางจุดที่ coordinate เหมือนกันแต่รายละเอียดต่าง (1 แถวต่อ 1 coordinate)
+    points_table: DataFrame ที่มีคอลัมน์ lat, lon, ticket, sign, site, group
+    คืน DataFrame: lat, lon, จำนวนจุด, จำนวนรายละเอียดที่ต่างกัน, tickets, groups
+    """
+    columns = ["lat", "lon", "จำนวนจุด", "จำนวนรายละเอียดที่ต่างกัน", "tickets", "groups"]
+    if points_table is None or len(points_table) == 0:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame({
+        "lat": points_table["lat"].astype(float).round(6),  # ปัดเศษเพื่อจัดการ floating point precision
+        "lon": points_table["lon"].astype(float).round(6),
+    })
+    for col in DETAIL_COLUMNS:
+        df[col] = points_table[col].astype(str) if col in points_table else "None"
+
+    # กรองเฉพาะ coordinate ที่มีมากกว่า 1 จุดก่อน แล้วค่อย groupby เฉพาะส่วนนั้น
+    df = df[df.duplicated(["lat", "lon"], keep=False)]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    keys = ["lat", "lon"]
+    report = df.groupby(keys, sort=False).agg(
+        n_points=("ticket", "size"),
+        tickets=("ticket", _join_unique),
+        groups=("group", _join_unique),
+    ).reset_index()
+    # จำนวนชุดรายละเอียดที่ต่างกันต่อ coordinate (เทียบทุกคอลัมน์ตรง ๆ ไม่ต่อเป็น string)
+    n_details = df.drop_duplicates(subset=keys + DETAIL_COLUMNS).groupby(keys, sort=False).size()
+    report.insert(3, "n_details", n_details.reindex(pd.MultiIndex.from_frame(report[keys])).to_numpy())
+
+    report = report[report["n_details"] > 1]
+    report = report.sort_values("n_points", ascending=False, kind="stable")
+    report.columns = columns
+    return report.reset_index(drop=True)
@@ -0,0 +1,97 @@
+import logging
+
+from ..lazy_controller.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+ASSIGNMENTS = ("all", "exclusive")
+# ระยะที่ต่างกันไม่เกินนี้ (เมตร) ถือว่าเสมอกัน → ให้เส้นที่มาก่อนตามลำดับไฟล์ redline (ไม่ขึ้นกับ engine)
+DIST_TIE_M = 1e-6
+
+
+def assign_exclusive(redline_geoms, redline_matches, shared=None, tie_m=DIST_TIE_M):
+    """
+    แบ่ง fault ให้ redline ที่ใกล้ที่สุดเพียงเส้นเดียว (ไม่นับซ้ำในเส้นทางที่วิ่งขนานกัน)
+    ใช้ distance_m ที่ engine คำนวณไว้แล้วใน redline_matches (ไม่วัดระยะใหม่)
+      - จุดเดียวกัน = lat/lon เดียวกัน (ระยะถึงทุกเส้นเท่ากัน จึงได้เส้นเดียวกันเสมอ)
+      - เจ้าของ = เส้นที่ระยะน้อยสุด เสมอกัน (ภายใน tie_m) → เส้นที่มาก่อนใน redline_geoms
+    shared: dict (ถ้าส่งมา) สะสมจุดที่อยู่ในระยะหลายเส้น (เรียกซ้ำทีละ chunk ได้) ใช้กับ shared_faults_table
+    คืน exclusive_matches: dict ชื่อ redline → record เฉพาะจุดที่เส้นนี้เป็นเจ้าของ (รูปเดียวกับ redline_matches)
+    """
+    # redline_matches แยกตามชื่อ: ไฟล์ต่างโฟลเดอร์ที่ชื่อซ้ำกันรวมเป็นเส้นเดียว (ลำดับ = ชื่อที่พบครั้งแรก)
+    names = list(dict.fromkeys(rl['name'] for rl in redline_geoms))
+    owner = {}   # (lat, lon) → (ระยะที่ปัดตาม tie_m, ลำดับเส้น, ระยะจริง)
+    routes = {}  # (lat, lon) → ชื่อเส้นที่อยู่ในระยะ (ตามลำดับเส้น)
+    for order, name in enumerate(names):
+        for rec in redline_matches.get(name, []):
+            key = (rec['lat'], rec['lon'])
+            candidate = (round(rec['distance_m'] / tie_m), order, rec['distance_m'])
+            if key not in owner or candidate < owner[key]:
+                owner[key] = candidate
+            in_range = routes.setdefault(key, [])
+            if not in_range or in_range[-1] != name:
+                in_range.append(name)
+
+    exclusive_matches = {}
+    for order, name in enumerate(names):
+        kept = []
+        for rec in redline_matches.get(name, []):
+            key = (rec['lat'], rec['lon'])
+            if owner[key][1] != order:
+                continue
+            kept.append(rec)
+            if shared is not None and len(routes[key]) > 1:
+                entry = shared.get(key)
+                if entry is None:
+                    entry = shared[key] = {'redline': name, 'distance_m': owner[key][2],
+                                           'routes': routes[key], 'n_points': 0, 'tickets': {}}
+                entry['n_points'] += 1
+                entry['tickets'][str(rec.get('ticket'))] = None
+        exclusive_matches[name] = kept
+    return exclusive_matches
+
+
+def merge_shared(shared, other):
+    """รวม shared ของอีกส่วน (เช่น shard ถัดไปตามลำดับจุด) เข้า shared - ผลเท่ากับสะสมด้วย assign_exclusive ต่อกัน"""
+    for key, entry in other.items():
+        mine = shared.get(key)
+        if mine is None:
+            shared[key] = dict(entry, tickets=dict(entry['tickets']))
+            continue
+        mine['n_points'] += entry['n_points']
+        mine['tickets'].update(entry['tickets'])
+    return shared
+
+
+def shared_faults_table(shared, reports=None):
+    """
+    ตารางจุดที่อยู่ในระยะหลายเส้น (1 แถวต่อ coordinate) จาก shared ของ assign_exclusive
+    เรียงตามจำนวนเส้นในระยะ, จำนวนจุด (มากไปน้อย) แล้ว lat, lon เก็บที่ reports['shared_faults'] ด้วย
+    """
+    columns = ['lat', 'lon', 'จำนวนจุด', 'tickets', 'redline ที่นับ', 'distance_m', 'จำนวนเส้นในระยะ', 'เส้นในระยะ']
+    rows = [{
+        'lat': key[0],
+        'lon': key[1],
+        'จำนวนจุด': entry['n_points'],
+        'tickets': ", ".join(entry['tickets']),
+        'redline ที่นับ': entry['redline'],
+        'distance_m': entry['distance_m'],
+        'จำนวนเส้นในระยะ': len(entry['routes']),
+        'เส้นในระยะ': ", ".join(entry['routes']),
+    } for key, entry in shared.items()]
+    table = pd.DataFrame(rows, columns=columns)
+    if len(table):
+        table = table.sort_values(['จำนวนเส้นในระยะ', 'จำนวนจุด', 'lat', 'lon'], ascending=[False, False, True, True],
+                                  ignore_index=True)
+    logging.info("exclusive assignment: จุดที่อยู่ในระยะหลายเส้น %d ตำแหน่ง (%d จุด)",
+                 len(table), int(table['จำนวนจุด'].sum()) if len(table) else 0)
+    if reports is not None:
+        reports['shared_faults'] = table
+    return table
+
+
+def split_by_assignment(assignment, redline_matches, exclusive_matches):
+    """(match ที่ใช้สรุป, match ของอีกแบบที่ใช้นับอย่างเดียว) ตาม assignment"""
+    if assignment == "exclusive":
+        return exclusive_matches, redline_matches
+    return redline_matches, exclusive_matches
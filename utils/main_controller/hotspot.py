@@ -0,0 +1,173 @@
+import logging
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import utm_epsg_for_lon, get_transformer_to_utm
+from ..geom_controller.grid_index import (NEAR_CELLS, collapse_points, group_cells, near_cells, cell_pairs,
+                                         any_within, find_root, union)
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pyproj = lazy_import("pyproj")
+
+NOISE = -1
+# คู่ช่องที่มี core รวมกันไม่เกินจำนวนคู่นี้ วัดระยะพร้อมกันทีละ block แทนการตรวจทีละคู่ช่อง
+SMALL_CELL_PAIR = 256
+
+
+def dbscan_grid(xs, ys, eps_m, min_samples=3):
+    """
+    DBSCAN บนพิกัดเมตร โดยไม่สร้างรายการเพื่อนบ้านของแต่ละจุด (จุดหนาแน่นมากที่ตำแหน่งเดียวไม่ทำให้ช้า/กิน memory)
+      1) รวมจุดที่พิกัดตรงกันเป็นจุดเดียวที่มีน้ำหนัก
+      2) grid ขนาด eps_m/√2: จุดในช่องเดียวกันห่างกันไม่เกิน eps_m เสมอ
+         ช่องที่มีน้ำหนักรวม >= min_samples → ทุกจุดเป็น core โดยไม่ต้องวัดระยะ
+         จุดในช่องที่เบากว่านั้น → รวมน้ำหนักจากช่องรอบตัว (5x5 ตัดมุม) ทีละ block
+      3) core ในช่องเดียวกันอยู่ cluster เดียวกัน → union ระดับช่อง ช่องข้างเคียงรวมกันเมื่อมี core คู่ใดห่างไม่เกิน eps_m
+         (คู่ช่องเล็กวัดพร้อมกันทีละ block, คู่ช่องใหญ่ข้ามถ้าอยู่กลุ่มเดียวกันแล้ว และใช้ STRtree หา core ที่ใกล้สุด)
+      4) border point อยู่กับ core ที่ใกล้ที่สุดในรัศมี (เสมอกัน → core ที่มาก่อนตามลำดับจุด)
+    min_samples นับรวมตัวเอง เหมือน sklearn
+    คืน labels (int array): cluster id เริ่มที่ 0 ตามลำดับจุดแรกของแต่ละ cluster, NOISE = -1
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    labels = np.full(len(xs), NOISE, dtype=np.int64)
+    if len(xs) == 0:
+        return labels
+    r2 = eps_m * eps_m
+
+    ux, uy, weight, inverse = collapse_points(xs, ys)
+    cell_of, cell_xy, order, start = group_cells(ux, uy, eps_m / np.sqrt(2))
+    near = near_cells(cell_xy)
+    n_cells = len(cell_xy)
+    cell_weight = np.bincount(cell_of, weights=weight)
+
+    # 1) core point
+    core = cell_weight[cell_of] >= min_samples
+    hood_weight = np.where(near >= 0, cell_weight[near], 0).sum(axis=1)
+    sparse = np.flatnonzero(~core & (hood_weight[cell_of] >= min_samples))
+    counts = cell_weight[cell_of[sparse]]
+    for k, offset in enumerate(NEAR_CELLS):
+        if offset == (0, 0):
+            continue
+        for i, p in cell_pairs(near[cell_of[sparse], k], order, start):
+            within = (ux[sparse[i]] - ux[p]) ** 2 + (uy[sparse[i]] - uy[p]) ** 2 <= r2
+            counts += np.bincount(i[within], weights=weight[p[within]], minlength=len(sparse))
+    core[sparse] = counts >= min_samples
+    if not core.any():
+        return labels
+
+    core_count = np.bincount(cell_of[core], minlength=n_cells)
+    core_order = order[core[order]]
+    core_start = np.concatenate([[0], np.cumsum(core_count)])
+
+    # 2) รวมช่องที่มี core (union-find ระดับช่อง) ตรวจแต่ละคู่ช่องครั้งเดียว
+    edge_c, edge_o = [], []
+    core_cells = np.flatnonzero(core_count)
+    for k, offset in enumerate(NEAR_CELLS):
+        if offset <= (0, 0):
+            continue
+        o = near[core_cells, k]
+        keep = o >= 0
+        keep[keep] = core_count[o[keep]] > 0
+        edge_c.append(core_cells[keep])
+        edge_o.append(o[keep])
+    edge_c = np.concatenate(edge_c)
+    edge_o = np.concatenate(edge_o)
+    small = core_count[edge_c] * core_count[edge_o] <= SMALL_CELL_PAIR
+    hit = np.zeros(len(edge_c), dtype=bool)
+    small_idx = np.flatnonzero(small)
+    for e, a in cell_pairs(edge_c[small_idx], core_order, core_start):
+        for j, b in cell_pairs(edge_o[small_idx[e]], core_order, core_start):
+            within = (ux[a[j]] - ux[b]) ** 2 + (uy[a[j]] - uy[b]) ** 2 <= r2
+            hit[small_idx[e[j[within]]]] = True
+    parent = list(range(n_cells))
+    for c, o in zip(edge_c[hit].tolist(), edge_o[hit].tolist()):
+        union(parent, c, o)
+    for c, o in zip(edge_c[~small].tolist(), edge_o[~small].tolist()):
+        if find_root(parent, c) == find_root(parent, o):
+            continue
+        a = core_order[core_start[c]:core_start[c + 1]]
+        b = core_order[core_start[o]:core_start[o + 1]]
+        if any_within(ux[a], uy[a], ux[b], uy[b], eps_m):
+            union(parent, c, o)
+
+    # 3) เลข cluster ตามลำดับจุด (เดิม) แรกที่เป็น core ของแต่ละกลุ่ม
+    cell_root = np.array([find_root(parent, c) for c in range(n_cells)])
+    point_core = core[inverse]
+    core_idx = np.flatnonzero(point_core)
+    roots = cell_root[cell_of[inverse[core_idx]]]
+    found, first = np.unique(roots, return_index=True)
+    root_label = np.full(n_cells, NOISE, dtype=np.int64)
+    root_label[found[np.argsort(first)]] = np.arange(len(found))
+    unique_label = np.where(core, root_label[cell_root[cell_of]], NOISE)
+
+    # 4) border point: core ที่ใกล้สุดในรัศมี (index จุดไม่ซ้ำเรียงตามลำดับที่พบ จึงใช้ตัดสินระยะเสมอกันได้)
+    border = np.flatnonzero(~core)
+    found_b, found_c, found_d2 = [], [], []
+    for k in range(len(NEAR_CELLS)):
+        for i, p in cell_pairs(near[cell_of[border], k], core_order, core_start):
+            d2 = (ux[border[i]] - ux[p]) ** 2 + (uy[border[i]] - uy[p]) ** 2
+            within = d2 <= r2
+            found_b.append(border[i[within]])
+            found_c.append(p[within])
+            found_d2.append(d2[within])
+    found_b = np.concatenate(found_b or [np.empty(0, np.int64)])
+    if len(found_b):
+        found_c, found_d2 = np.concatenate(found_c), np.concatenate(found_d2)
+        pick = np.lexsort((found_c, found_d2, found_b))
+        first_of = pick[np.r_[True, found_b[pick][1:] != found_b[pick][:-1]]]
+        unique_label[found_b[first_of]] = unique_label[found_c[first_of]]
+    labels[:] = unique_label[inverse]
+    return labels
+
+
+def cluster_hotspots(points_df, eps_m=200, min_samples=3, reports=None):
+    """
+    จัดกลุ่มจุดที่ match (points_df['matched']) เป็น hotspot ด้วย DBSCAN รัศมี eps_m เมตร
+    - เพิ่มคอลัมน์ 'cluster_id' ใน points_df (-1 = ไม่อยู่ใน cluster / ไม่ match)
+    - คืนตาราง cluster: cluster_id, lat, lon (centroid), จำนวนจุด, จำนวนเดือน, เดือน, redline หลัก, รัศมี (m)
+      และเก็บไว้ที่ reports['hotspot_clusters'] (ถ้าส่ง reports มา)
+    """
+    columns = ['cluster_id', 'lat', 'lon', 'จำนวนจุด', 'จำนวนเดือน', 'เดือน', 'redline หลัก', 'รัศมี (m)']
+    points_df['cluster_id'] = NOISE
+    matched = points_df[points_df['matched']] if 'matched' in points_df else points_df.iloc[0:0]
+
+    rows = []
+    if len(matched):
+        lons = matched['lon'].to_numpy(dtype=float)
+        lats = matched['lat'].to_numpy(dtype=float)
+        # project ทั้งชุดด้วย UTM zone ของค่ากลาง (cluster ไม่ควรคร่อมหลาย zone ในระดับร้อยเมตร)
+        epsg = utm_epsg_for_lon(float(np.median(lons)), float(np.median(lats)))
+        xs, ys = get_transformer_to_utm(epsg).transform(lons, lats)
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+
+        labels = dbscan_grid(xs, ys, eps_m, min_samples)
+        points_df.loc[matched.index, 'cluster_id'] = labels
+
+        to_lonlat = pyproj.Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+        members = pd.DataFrame({
+            'cluster_id': labels, 'x': xs, 'y': ys,
+            'group': matched['group'].to_numpy(), 'redline': matched['nearest_redline'].to_numpy(),
+        })
+        members = members[members['cluster_id'] != NOISE]
+        for cid, g in members.groupby('cluster_id', sort=True):
+            mx, my = g['x'].mean(), g['y'].mean()
+            lon, lat = to_lonlat.transform(mx, my)
+            groups = pd.unique(g['group'])
+            rows.append({
+                'cluster_id': int(cid),
+                'lat': round(lat, 6),
+                'lon': round(lon, 6),
+                'จำนวนจุด': len(g),
+                'จำนวนเดือน': len(groups),
+                'เดือน': ", ".join(str(v) for v in groups),
+                'redline หลัก': g['redline'].mode().iloc[0],
+                'รัศมี (m)': round(float(np.hypot(g['x'] - mx, g['y'] - my).max()), 1),
+            })
+
+    table = pd.DataFrame(rows, columns=columns)
+    if len(table):
+        table = table.sort_values('จำนวนจุด', ascending=False, kind="stable").reset_index(drop=True)
+        logging.info("พบ hotspot %d กลุ่ม (รัศมี %g m, อย่างน้อย %d จุด)", len(table), eps_m, min_samples)
+    if reports is not None:
+        reports['hotspot_clusters'] = table
+    return table
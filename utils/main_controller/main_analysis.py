@@ -1,87 +1,272 @@
 import os
 import logging
 from collections import defaultdict
-from tqdm import tqdm
 
-import pandas as pd
-import xml.etree.ElementTree as ET
-
-from shapely.geometry import LineString, Point, MultiLineString, GeometryCollection
-from shapely.ops import unary_union, transform
-
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-from pyproj import CRS, Transformer
-from datetime import datetime
+from ..lazy_controller.lazy_import import lazy_import
 
 from ..parse_controller.parse_points import parse_kml_points
 from ..parse_controller.parse_lines import parse_kml_lines
-from ..geom_controller.geom import point_to_geom_distance_m
+from ..parse_controller.parse_table import is_table_file, parse_table_points
+from ..geom_controller.geom import point_to_geom_distance_m, simplification_stats
+from ..geom_controller.redline_registry import build_redline_registry
+from .duplicate_report import build_duplicate_coords_report
+from .match_records import match_record, point_result, add_match
+from .corridor_engine import match_points_corridor
+from .parallel_engine import match_points_parallel
+from .chainage import add_chainage
+from .hotspot import cluster_hotspots
+from .repeat_faults import detect_repeat_faults
+from .site_snapping import load_sites, snap_sites_to_redlines
+from ..store_controller.columnar_store import META_FILE, read_points
+from ..cache_controller.run_cache import RUN_CACHE_DIR, RunCache, run_key
+from ..bench_controller.stage_timer import stage
+from ..bench_controller.stage_profiler import StageProfiler
+from .exclusive_assignment import ASSIGNMENTS, assign_exclusive, shared_faults_table, split_by_assignment
+from .summary_accumulator import SummaryAccumulator
+
+pd = lazy_import("pandas")
+tqdm = lazy_import("tqdm")
 
-def analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=100):
+ENGINES = ("distance", "corridor", "parallel")
+# เปลี่ยนเมื่อผลของการวิเคราะห์เปลี่ยน (ผลเก่าใน run cache จะไม่ถูกใช้อีก)
+ENGINE_VERSION = 10
+# argument ที่ไม่มีผลต่อผลลัพธ์ (ไม่ใส่ใน key ของ run cache)
+_UNCACHED_OPTIONS = ("points_grouped", "redlines_files", "site_files", "point_store", "reports", "stages",
+                     "profile_dir", "use_cache", "cache_dir")
+
+def analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=100, reports=None,
+                               simplify_ratio=None, collapse_duplicate_redlines=True, engine="distance",
+                               chainage_bin_km=None, hotspot_radius_m=None, hotspot_min_points=3,
+                               repeat_radius_m=None, site_files=None, site_tolerance_m=100, point_store=None,
+                               point_columns=None, stages=None, profile_dir=None, assignment="all",
+                               use_cache=False, cache_dir=RUN_CACHE_DIR):
     """
-    points_grouped: dict mapping group_name -> filepath (kml)
+    points_grouped: dict mapping group_name -> filepath (kml หรือ csv / xlsx / parquet)
+             หรือถ้ากำหนด point_store: list ของชื่อกลุ่มที่จะอ่านจาก store (None = ทุกกลุ่ม)
     redlines_files: list of redline kml file paths
+    reports: dict (optional) สำหรับรับตารางรายงานเพิ่มเติม เช่น 'duplicate_coords'
+             ส่งต่อให้ write_results_to_excel(extra_sheets=reports) ได้เลย
+    simplify_ratio: ถ้ากำหนด (เช่น 0.01) จะ simplify redline ที่ project แล้วด้วย tolerance = threshold_m * ratio
+             ก่อนคำนวณระยะ จุดที่ระยะ <= threshold_m + tolerance จะถูกคำนวณซ้ำกับเส้นเต็ม
+             ผล match และ distance_m ของจุดที่ match จึงเหมือนเดิมทุกจุด
+    collapse_duplicate_redlines: ถ้า True ไฟล์ redline ที่ geometry เหมือนกันจะถูกคำนวณครั้งเดียว
+             แล้วกระจายผลให้ทุกชื่อ (ผลลัพธ์เหมือนเดิม) รายชื่อ alias/overlap อยู่ใน reports['redline_aliases']
+    engine: "distance" (ค่าเริ่มต้น - วัดระยะจุดกับทุกเส้น) หรือ
+             "corridor" (buffer(threshold_m) + prepared geometry + STRtree ใช้ cross-check)
+             "parallel" (ระยะแบบ numpy หลาย process, redline อยู่ใน shared memory)
+    chainage_bin_km: ถ้ากำหนด จะคำนวณ chainage (ระยะตามเส้นจาก A-end) ของจุดที่ match
+             เพิ่ม route_length_m / faults_per_km (count_by_coords ต่อ km) ใน summary และ reports['chainage_histogram']
+    hotspot_radius_m: ถ้ากำหนด จะจัดกลุ่มจุดที่ match เป็น hotspot (DBSCAN รัศมีนี้, อย่างน้อย hotspot_min_points จุด)
+             เพิ่มคอลัมน์ cluster_id ใน points_df และ reports['hotspot_clusters']
+    repeat_radius_m: ถ้ากำหนด จะหาตำแหน่งที่เกิด fault ซ้ำข้ามกลุ่ม (ห่าง anchor ของตำแหน่งไม่เกินรัศมีนี้ หรือ ticket เดียวกัน)
+             เพิ่มคอลัมน์ repeat_id ใน points_df และ reports['repeat_faults']
+    site_files: list ของไฟล์ KML ของ site ถ้ากำหนด จะจับคู่ site กับปลายเส้น/ระหว่างทางของทุก redline
+             (ระยะไม่เกิน site_tolerance_m) รายงานใน reports['site_snapping']
+             และใช้พิกัด site กำหนดทิศของ chainage (เริ่มที่ A-end)
+    point_store: ColumnStore (utils/store_controller/columnar_store.py) ถ้ากำหนด จะอ่าน points จาก store
+             แทนการ parse KML
+    point_columns: column map ของไฟล์ตาราง (field → ชื่อคอลัมน์) เช่น {'lat': 'Latitude', 'ticket': 'Incident'}
+             field ที่ไม่ได้กำหนดจะหาจากชื่อคอลัมน์ทั่วไป (ดู parse_table.DEFAULT_COLUMNS)
+    stages: StageRecorder (utils/bench_controller/stage_timer.py) ถ้ากำหนด จะบันทึกเวลาของแต่ละ stage
+    assignment: "all" (ค่าเริ่มต้น - จุดนับให้ทุกเส้นที่อยู่ในระยะ threshold_m) หรือ
+             "exclusive" (นับให้เส้นที่ใกล้ที่สุดเส้นเดียว เสมอกัน → เส้นที่มาก่อน ดู exclusive_assignment.py)
+             summary ทุกเส้นมี count_all / count_exclusive ทั้งสองแบบเสมอ จุดที่อยู่ในระยะหลายเส้นอยู่ใน
+             reports['shared_faults']
+    use_cache: ถ้า True เก็บผลทั้งก้อน (points_df, summary, reports) ไว้ใน cache_dir (ค่าเริ่มต้น .cache/runs ใต้ root
+             ของ repo, สูงสุด 1 GB) key = fingerprint เนื้อหาไฟล์ input ทุกไฟล์ + option ทุกตัว + ENGINE_VERSION
+             รันซ้ำด้วย input เดิมจะข้ามการ parse/คำนวณทั้งหมด (ดู cache_controller/run_cache.py)
+             False (ค่าเริ่มต้น) = คำนวณใหม่และไม่เขียน cache
+    profile_dir: ถ้ากำหนด จะ profile ทุก stage (cProfile + folded stack) เขียนไฟล์ analysis_* ลงโฟลเดอร์นี้
+             (ดู utils/bench_controller/stage_profiler.py) - ไม่ใช้ cache ในรอบนั้นเพื่อให้ได้ profile เสมอ
+    จุดจำนวนมากเกิน memory: ใช้ analyze_points_chunked (chunked_analysis.py) ผลเท่ากันแต่ทำทีละ chunk
     Returns:
       - points_df: pandas.DataFrame with nearest redline and distance
       - redline_summary: dict mapping redline_name -> list of matched point dicts
     """
+    options = dict(locals())
+    if use_cache and profile_dir:
+        logging.info("กำหนด profile_dir - ข้าม run cache รอบนี้เพื่อ profile การคำนวณจริง")
+    elif use_cache:
+        return _analyze_cached(options)
+    if assignment not in ASSIGNMENTS:
+        raise ValueError(f"ไม่รู้จัก assignment: {assignment} (ใช้ได้: {', '.join(ASSIGNMENTS)})")
+    if profile_dir:
+        stages = StageProfiler(profile_dir, "analysis", recorder=stages)
+
     # 1) Load points (with group label)
+    with stage(stages, "parse_points"):
+        if point_store is not None:
+            all_points = read_points(point_store, points_grouped)
+            logging.info("อ่าน points จาก store %s -> %d จุด", point_store.root, len(all_points))
+        else:
+            all_points = load_points(points_grouped, point_columns)
+    if not all_points:
+        logging.error("ไม่พบ points ใด ๆ")
+        return None, None
+
+    # ตรวจสอบจุดที่ซ้ำกัน (same lat/lon but different details) → ตารางสรุป 1 แถวต่อ coordinate
+    with stage(stages, "duplicate_report"):
+        duplicate_report = build_duplicate_coords_report(pd.DataFrame(all_points))
+    if len(duplicate_report) > 0:
+        logging.warning(
+            "พบ coordinate ที่ซ้ำกันทั้งหมด %d ตำแหน่ง (%d จุด) - ดูรายละเอียดใน sheet 'duplicate_coords'",
+            len(duplicate_report), int(duplicate_report["จำนวนจุด"].sum())
+        )
+    if reports is not None:
+        reports["duplicate_coords"] = duplicate_report
+
+    # 2) Load redlines
+    redline_geoms, compute_redlines = prepare_redlines(redlines_files, collapse_duplicate_redlines, reports, stages)
+    if not redline_geoms:
+        return None, None
+
+    # 3) จับคู่ point กับ redline ตาม engine ที่เลือก
+    logging.info("เริ่มคำนวณระยะ (threshold %d m, engine=%s)...", threshold_m, engine)
+    if engine not in ENGINES:
+        raise ValueError(f"ไม่รู้จัก engine: {engine} (ใช้ได้: {', '.join(ENGINES)})")
+    simplify_tolerance_m = simplify_tolerance(threshold_m, simplify_ratio, engine)
+    with stage(stages, f"match_{engine}"):
+        points_results, redline_matches = match_points(all_points, compute_redlines, threshold_m, engine,
+                                                       simplify_tolerance_m)
+        if simplify_tolerance_m:
+            report_simplification(redline_geoms, simplify_tolerance_m, reports)
+
+    # 4) ทำ DataFrame และ summary
+    with stage(stages, "summary"):
+        points_df = pd.DataFrame(points_results)
+        shared = {}
+        exclusive_matches = assign_exclusive(redline_geoms, redline_matches, shared)
+        shared_faults_table(shared, reports)
+        summary = SummaryAccumulator(redline_geoms, assignment)
+        summary.add(*split_by_assignment(assignment, redline_matches, exclusive_matches))
+        redline_summary_counts = summary.result()
+    add_route_reports(redline_geoms, redline_summary_counts, site_files, site_tolerance_m, chainage_bin_km,
+                      reports, stages)
+    if hotspot_radius_m:
+        with stage(stages, "hotspot"):
+            cluster_hotspots(points_df, hotspot_radius_m, hotspot_min_points, reports=reports)
+    if repeat_radius_m:
+        with stage(stages, "repeat_faults"):
+            detect_repeat_faults(points_df, repeat_radius_m, reports=reports)
+    return points_df, redline_summary_counts
+
+
+def _analyze_cached(options):
+    """analyze_points_vs_redlines ผ่าน run cache (options = argument ทั้งหมดของการเรียก)"""
+    points_grouped, point_store = options['points_grouped'], options['point_store']
+    if point_store is not None:
+        # store เป็นแบบ append-only: meta.json เปลี่ยนทุกครั้งที่ข้อมูลเปลี่ยน
+        points = [("store", os.path.join(point_store.root, META_FILE))]
+    else:
+        points = list(points_grouped.items())
+    inputs = {
+        'points': points,
+        'redlines': [(os.path.basename(f), f) for f in options['redlines_files']],
+        'sites': [(os.path.basename(f), f) for f in options['site_files'] or []],
+    }
+    params = {k: v for k, v in options.items() if k not in _UNCACHED_OPTIONS}
+    params['engine_version'] = ENGINE_VERSION
+    if point_store is not None:
+        params['store_groups'] = points_grouped
+
+    cache = RunCache(options['cache_dir'])
+    key = run_key(inputs, params)
+    reports, stages = options['reports'], options['stages']
+    with stage(stages, "run_cache"):
+        hit = cache.get(key)
+    if hit is not None:
+        points_df, redline_summary, cached_reports = hit
+        if reports is not None:
+            reports.update(cached_reports)
+        logging.info("ใช้ผลจาก run cache (%s) - ข้ามการ parse และคำนวณ", key[:12])
+        return points_df, redline_summary
+
+    run_reports = {}
+    points_df, redline_summary = analyze_points_vs_redlines(
+        **{**options, 'reports': run_reports, 'use_cache': False}
+    )
+    if reports is not None:
+        reports.update(run_reports)
+    if points_df is not None:
+        with stage(stages, "run_cache"):
+            cache.put(key, (points_df, redline_summary, run_reports))
+    return points_df, redline_summary
+
+
+def prepare_redlines(redlines_files, collapse_duplicate_redlines=True, reports=None, stages=None):
+    """
+    อ่าน redline ทุกไฟล์ + รวมเส้นที่ geometry ซ้ำกัน (คำนวณครั้งเดียว)
+    คืน (redline_geoms, compute_redlines) - redline_geoms ว่างถ้าไม่มีเส้นที่ใช้ได้
+    """
+    with stage(stages, "parse_redlines"):
+        redline_geoms = load_redlines(redlines_files)
+    if not redline_geoms:
+        logging.error("ไม่พบ redlines ที่ใช้งานได้")
+        return redline_geoms, redline_geoms
+
+    compute_redlines = redline_geoms
+    if collapse_duplicate_redlines:
+        with stage(stages, "redline_registry"):
+            compute_redlines, alias_report = build_redline_registry(redline_geoms)
+        if len(compute_redlines) < len(redline_geoms):
+            logging.info("พบ redline ที่ geometry ซ้ำกัน: %d ไฟล์ → คำนวณจริง %d เส้น",
+                         len(redline_geoms), len(compute_redlines))
+        if reports is not None:
+            reports["redline_aliases"] = alias_report
+    return redline_geoms, compute_redlines
+
+
+def match_points(all_points, compute_redlines, threshold_m, engine="distance", simplify_tolerance_m=None):
+    """จับคู่ point กับ redline ด้วย engine ที่เลือก คืน (points_results, redline_matches)"""
+    if engine == "distance":
+        return match_points_distance(all_points, compute_redlines, threshold_m, simplify_tolerance_m)
+    if engine == "corridor":
+        return match_points_corridor(all_points, compute_redlines, threshold_m)
+    return match_points_parallel(all_points, compute_redlines, threshold_m)
+
+
+def add_route_reports(redline_geoms, redline_summary_counts, site_files=None, site_tolerance_m=100,
+                      chainage_bin_km=None, reports=None, stages=None):
+    """site snapping และ chainage (ใช้แค่ redline + summary ไม่ต้องใช้จุดทั้งหมด)"""
+    site_locations = None
+    if site_files:
+        with stage(stages, "site_snapping"):
+            _, site_locations = snap_sites_to_redlines(redline_geoms, load_sites(site_files), site_tolerance_m,
+                                                       reports=reports)
+    if chainage_bin_km:
+        with stage(stages, "chainage"):
+            add_chainage(redline_geoms, redline_summary_counts, chainage_bin_km, site_locations, reports=reports)
+
+
+def load_points(points_grouped, point_columns=None):
+    """
+    อ่าน points ทุกกลุ่ม (ใส่ 'group'/'key' = ชื่อกลุ่ม) คืน list ของ dict
+    ไฟล์ .csv / .xlsx / .parquet อ่านด้วย parse_table_points (point_columns = column map) นอกนั้นเป็น KML
+    ตารางถูกแปลงเป็น dict ทีละแถวที่นี่ครั้งเดียว เพราะทุก engine และผลลัพธ์ (match_record / point_result,
+    sheet ของ redline, points_df) เป็น record ต่อจุด - วัดแล้วประมาณ 6 µs ต่อแถว
+    (207,500 แถว: to_dict 1.2 s เทียบกับ match ด้วย corridor 58.6 s ≈ 2%)
+    ไฟล์ที่ใหญ่เกิน memory ใช้ analyze_points_chunked (แปลงทีละ chunk ของ iter_table_points)
+    """
     all_points = []
     logging.info("เริ่มอ่านไฟล์ points...")
     for group_name, filepath in points_grouped.items():
-        pts = parse_kml_points(filepath)
+        if is_table_file(filepath):
+            pts = parse_table_points(filepath, point_columns).assign(group=group_name, key=group_name).to_dict('records')
+        else:
+            pts = parse_kml_points(filepath)
+            for p in pts:
+                p['group'] = group_name
+                p['key'] = group_name
         if not pts:
             logging.info("ไฟล์ %s - ไม่มีจุดหรือไม่พบ", filepath)
             continue
-        for p in pts:
-            p['group'] = group_name
-            p['key'] = group_name
-            all_points.append(p)
+        all_points.extend(pts)
         logging.info("อ่าน %s -> %d จุด", group_name, len(pts))
+    return all_points
 
-    if not all_points:
-        logging.error("ไม่พบ points ใด ๆ")
-        return None, None
-
-    # ตรวจสอบและแจ้งเตือนจุดที่ซ้ำกัน (same lat/lon but different details)
-    coord_groups = defaultdict(list)
-    for p in all_points:
-        coord_key = (round(float(p['lat']), 6), round(float(p['lon']), 6))  # ปัดเศษเพื่อจัดการ floating point precision
-        coord_groups[coord_key].append(p)
-    
-    # รายงานจุดที่มี coordinate เหมือนกันแต่รายละเอียดต่าง
-    duplicate_coords = 0
-    for coord, points in coord_groups.items():
-        if len(points) > 1:
-            # ตรวจสอบว่ามีรายละเอียดที่แตกต่างกันหรือไม่
-            unique_details = set()
-            for p in points:
-                detail_key = (
-                    p.get('ticket'), 
-                    p.get('sign'), 
-                    p.get('site'), 
-                    p.get('group')
-                )
-                unique_details.add(detail_key)
-            
-            if len(unique_details) > 1:
-                duplicate_coords += 1
-                logging.warning(
-                    "พบจุดที่มี coordinate เหมือนกัน (%s) แต่รายละเอียดต่าง: %d จุด",
-                    coord, len(points)
-                )
-                for i, p in enumerate(points):
-                    logging.warning(
-                        "  - จุดที่ %d: ticket=%s, sign=%s, site=%s, group=%s",
-                        i+1, p.get('ticket'), p.get('sign'), p.get('site'), p.get('group')
-                    )
-    
-    if duplicate_coords > 0:
-        logging.warning("พบ coordinate ที่ซ้ำกันทั้งหมด %d ตำแหน่ง", duplicate_coords)
 
-    # 2) Load redlines
+def load_redlines(redlines_files):
+    """อ่าน redline ทุกไฟล์ คืน list ของ dict {'name', 'geom', 'epsg_cache'}"""
     redline_geoms = []
     for fname in redlines_files:
         geom = parse_kml_lines(fname)
@@ -94,25 +279,30 @@ def analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=100):
             'epsg_cache': {}  # จะเก็บ projected geometry per EPSG (per-zone caching)
         })
         logging.info("โหลด redline: %s", fname)
+    return redline_geoms
 
-    if not redline_geoms:
-        logging.error("ไม่พบ redlines ที่ใช้งานได้")
-        return None, None
 
-    # 3) สำหรับแต่ละ point หา nearest distance กับแต่ละ redline (ใช้ cache per redline per EPSG)
+def match_points_distance(all_points, compute_redlines, threshold_m, simplify_tolerance_m=None):
+    """
+    engine หลัก (reference): สำหรับแต่ละ point หา nearest distance กับแต่ละ redline
+    (ใช้ cache per redline per EPSG)
+    คืน (points_results, redline_matches)
+    """
     points_results = []
     redline_matches = defaultdict(list)  # redline_name -> list of point dicts (matched within threshold)
-    logging.info("เริ่มคำนวณระยะ (threshold %d m)...", threshold_m)
 
-    for p in tqdm(all_points, desc="processing points"):
+    for p in tqdm.tqdm(all_points, desc="processing points"):
         lon = float(p['lon'])
         lat = float(p['lat'])
         best_dist = float('inf')
         best_redline = None
         matched_any = False
 
-        for rl in redline_geoms:
-            dist, epsg_used = point_to_geom_distance_m(lon, lat, rl['geom'], rl['epsg_cache'])
+        for rl in compute_redlines:
+            # จุดที่อาจอยู่ใน threshold (<= threshold + tolerance) วัดกับเส้นเต็มซ้ำเพื่อไม่ให้ผล match เปลี่ยน
+            dist, epsg_used = point_to_geom_distance_m(
+                lon, lat, rl['geom'], rl['epsg_cache'], simplify_tolerance_m,
+                threshold_m + simplify_tolerance_m if simplify_tolerance_m else None)
             # เก็บ nearest
             if dist < best_dist:
                 best_dist = dist
@@ -121,89 +311,56 @@ def analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=100):
             if dist <= threshold_m:
                 # matched within threshold -> เก็บลง summary
                 matched_any = True
-                # store a shallow copy with distance + group
-                rec = {
-                    'group': p.get('group'),
-                    'lat': lat,
-                    'lon': lon,
-                    'ticket': p.get('ticket'),
-                    'sign': p.get('sign'),
-                    'sla': p.get('sla'),
-                    'region': p.get('region'),
-                    'site': p.get('site'),
-                    'online/mobile': p.get('online/mobile'),
-                    'distance_m': dist
-                }
-                redline_matches[rl['name']].append(rec)
+                add_match(redline_matches, rl, match_record(p, lat, lon, dist))
 
         # append overall point result
-        points_results.append({
-            'group': p.get('group'),
-            'lat': lat,
-            'lon': lon,
-            'ticket': p.get('ticket'),
-            'sign': p.get('sign'),
-            'sla': p.get('sla'),
-            'region': p.get('region'),
-            'site': p.get('site'),
-            'online/mobile': p.get('online/mobile'),
-            'nearest_redline': best_redline,
-            'distance_m': best_dist,
-            'matched': matched_any,
-            'key': p.get('key')
-        })
+        points_results.append(point_result(p, lat, lon, best_redline, best_dist, matched_any))
 
-    # 4) ทำ DataFrame และ summary
-    points_df = pd.DataFrame(points_results)
-
-    # Enhanced summary per redline with better deduplication
-    redline_summary_counts = {}
-
-    for rl in redline_geoms:   # ✅ วนทุก redline ที่โหลด ไม่ใช่แค่ redline_matches
-        name = rl['name']
-        matches = redline_matches.get(name, [])  # ถ้าไม่มี match → [] ว่าง
-        
-        # Option 1: Dedupe by lat/lon only
-        seen_coords = set()
-        unique_by_coords = []
-        for r in matches:
-            coord_key = (round(r.get('lat', 0), 6), round(r.get('lon', 0), 6))
-            if coord_key not in seen_coords:
-                seen_coords.add(coord_key)
-                unique_by_coords.append(r)
-
-        # Option 2: Dedupe by full details
-        seen_full = set()
-        unique_by_full = []
-        for r in matches:
-            full_key = (
-                r.get('ticket'), 
-                round(r.get('lat', 0), 6), 
-                round(r.get('lon', 0), 6),
-                r.get('site'),
-                r.get('sign')
-            )
-            if full_key not in seen_full:
-                seen_full.add(full_key)
-                unique_by_full.append(r)
-
-        redline_summary_counts[name] = {
-            'count': len(unique_by_full),
-            'count_by_coords': len(unique_by_coords),
-            'count_by_details': len(unique_by_full),
-            'total_matches': len(matches),
-            'points': unique_by_coords,
-            'points_by_coords': unique_by_coords,
-            'points_by_details': unique_by_full,
-            'raw_matches': matches
-        }
-
-        # แจ้งเตือนความต่างระหว่าง dedupe (ถ้ามี)
-        if len(unique_by_coords) != len(unique_by_full):
-            logging.info(
-                "Redline %s: coordinate-based count (%d) != detail-based count (%d)",
-                name, len(unique_by_coords), len(unique_by_full)
-            )
-
-
-    return points_df, redline_summary_counts
\ No newline at end of file
+    return points_results, redline_matches
+
+
+def summarize_redline_matches(redline_geoms, redline_matches):
+    """สรุปต่อ redline พร้อม dedupe ทั้งแบบ coordinate และแบบรายละเอียด (ดู SummaryAccumulator)"""
+    summary = SummaryAccumulator(redline_geoms)
+    summary.add(redline_matches)
+    return summary.result()
+
+
+def simplify_tolerance(threshold_m, simplify_ratio, engine):
+    """tolerance (เมตร) ของการ simplify redline - ใช้ได้กับ engine "distance" เท่านั้น (engine อื่นเตือนแล้วไม่ simplify)"""
+    if not simplify_ratio:
+        return None
+    if engine != "distance":
+        logging.warning("simplify_ratio ใช้ได้กับ engine distance เท่านั้น - engine %s ไม่ simplify redline", engine)
+        return None
+    return threshold_m * simplify_ratio
+
+
+def simplification_rows(redline_geoms, tolerance_m=None):
+    """แถวของ redline_simplify (1 แถวต่อ redline ต่อ UTM zone ที่ใช้) จาก cache ของ redline_geoms"""
+    rows = []
+    for rl in redline_geoms:
+        for st in simplification_stats(rl['epsg_cache'], tolerance_m):
+            rows.append({'redline': rl['name'], **st})
+    return rows
+
+
+def report_simplification(redline_geoms, tolerance_m, reports, rows=None):
+    """
+    log สรุปการลด vertex + Hausdorff สูงสุด และเก็บตารางต่อ redline ลง reports['redline_simplify']
+    rows: แถวที่มีอยู่แล้ว (เช่น รวมจากหลาย shard) None = อ่านจาก cache ของ redline_geoms
+    """
+    if rows is None:
+        rows = simplification_rows(redline_geoms, tolerance_m)
+    if not rows:
+        return
+
+    table = pd.DataFrame(rows)
+    before = int(table['vertices_before'].sum())
+    after = int(table['vertices_after'].sum())
+    logging.info(
+        "simplify redlines (tolerance %.2f m): vertex %d -> %d (ลดลง %.1f%%), Hausdorff สูงสุด %.3f m",
+        tolerance_m, before, after, (1 - after / before) * 100 if before else 0, table['hausdorff_m'].max()
+    )
+    if reports is not None:
+        reports['redline_simplify'] = table
@@ -0,0 +1,41 @@
+def match_record(p, lat, lon, dist):
+    """record ของจุดที่ match กับ redline (เก็บลง redline_matches)"""
+    return {
+        'group': p.get('group'),
+        'lat': lat,
+        'lon': lon,
+        'ticket': p.get('ticket'),
+        'sign': p.get('sign'),
+        'sla': p.get('sla'),
+        'region': p.get('region'),
+        'site': p.get('site'),
+        'online/mobile': p.get('online/mobile'),
+        'distance_m': dist
+    }
+
+
+def point_result(p, lat, lon, best_redline, best_dist, matched_any):
+    """ผลรวมของจุด 1 จุด (1 แถวใน points_df)"""
+    return {
+        'group': p.get('group'),
+        'lat': lat,
+        'lon': lon,
+        'ticket': p.get('ticket'),
+        'sign': p.get('sign'),
+        'sla': p.get('sla'),
+        'region': p.get('region'),
+        'site': p.get('site'),
+        'online/mobile': p.get('online/mobile'),
+        'nearest_redline': best_redline,
+        'distance_m': best_dist,
+        'matched': matched_any,
+        'key': p.get('key')
+    }
+
+
+def add_match(redline_matches, rl, rec):
+    """เพิ่ม record ให้ redline และทุก alias ที่ geometry เดียวกัน (แต่ละชื่อได้ dict ของตัวเอง)"""
+    aliases = rl.get('aliases', [rl['name']])
+    redline_matches[aliases[0]].append(rec)
+    for alias in aliases[1:]:
+        redline_matches[alias].append(dict(rec))
@@ -0,0 +1,160 @@
+import logging
+import os
+from collections import defaultdict
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import get_transformer_to_utm
+from .match_records import match_record, point_result, add_match
+from .shared_redlines import SharedRedlines, build_redline_arrays
+
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+
+# จำนวนคู่ (จุด x segment) สูงสุดต่อการคำนวณหนึ่งครั้ง (คุมขนาด array ชั่วคราวใน worker ~ 32 MB)
+MAX_PAIRS_PER_BLOCK = 1 << 22
+
+# shared memory ที่ worker attach ไว้ (ตั้งใน _init_worker)
+_worker_redlines = None
+
+
+def point_segment_distance(px, py, seg):
+    """
+    ระยะน้อยที่สุดจากแต่ละจุด (px, py) ไปยังกลุ่ม segment (k, 4) - numpy ล้วน
+    ทำทีละ block ของ segment เพื่อไม่ให้ array (จุด x segment) ใหญ่เกิน MAX_PAIRS_PER_BLOCK
+    """
+    best = np.full(len(px), np.inf)
+    if len(px) == 0 or len(seg) == 0:
+        return best
+    step = max(MAX_PAIRS_PER_BLOCK // len(px), 1)
+    qx, qy = px[:, None], py[:, None]
+    for start in range(0, len(seg), step):
+        x0, y0, x1, y1 = seg[start:start + step].T
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        t = ((qx - x0) * dx + (qy - y0) * dy) / np.where(length2 > 0, length2, 1.0)
+        np.clip(t, 0.0, 1.0, out=t)
+        d = np.hypot(qx - (x0 + t * dx), qy - (y0 + t * dy)).min(axis=1)
+        np.minimum(best, d, out=best)
+    return best
+
+
+def nearest_and_matches(arrays, epsg, xs, ys, threshold_m):
+    """
+    หา nearest redline และ redline ที่อยู่ในระยะ threshold_m ของจุด (พิกัด UTM ของ epsg)
+    - bbox ของ redline เป็นขอบล่างของระยะ → ข้ามเส้นที่ไกลกว่าทั้ง nearest ปัจจุบันและ threshold
+    - ไล่เส้นจาก bbox ใกล้ไปไกล ให้ nearest ลดเร็ว ๆ; เสมอกัน → เส้นที่ index ต่ำกว่า (เหมือน distance engine)
+    คืน (best_idx, best_dist, matches) โดย matches = list ของ (redline_idx, local point idx array, dist array)
+    """
+    seg = arrays[f'seg_{epsg}']
+    offsets = arrays[f'offset_{epsg}']
+    bbox = arrays[f'bbox_{epsg}']
+    n = len(xs)
+    best_idx = np.full(n, -1, dtype=np.int64)
+    best_dist = np.full(n, np.inf)
+    matches = []
+
+    # ระยะจากจุดถึง bbox ของทุกเส้น (n, R)
+    gap_x = np.maximum(np.maximum(bbox[:, 0] - xs[:, None], xs[:, None] - bbox[:, 2]), 0.0)
+    gap_y = np.maximum(np.maximum(bbox[:, 1] - ys[:, None], ys[:, None] - bbox[:, 3]), 0.0)
+    bbox_dist = np.hypot(gap_x, gap_y)
+
+    for r in np.argsort(bbox_dist.min(axis=0), kind="stable").tolist():
+        if offsets[r] == offsets[r + 1]:
+            continue
+        need = np.flatnonzero(bbox_dist[:, r] <= np.maximum(best_dist, threshold_m))
+        if len(need) == 0:
+            continue
+        d = point_segment_distance(xs[need], ys[need], seg[offsets[r]:offsets[r + 1]])
+
+        better = (d < best_dist[need]) | ((d == best_dist[need]) & (r < best_idx[need]))
+        best_dist[need[better]] = d[better]
+        best_idx[need[better]] = r
+
+        hit = d <= threshold_m
+        if hit.any():
+            matches.append((r, need[hit], d[hit]))
+    return best_idx, best_dist, matches
+
+
+def _init_worker(spec):
+    global _worker_redlines
+    _worker_redlines = SharedRedlines.attach(spec)
+
+
+def _worker_chunk(epsg, point_ids, lons, lats, threshold_m):
+    """งานของ worker: project จุดชุดหนึ่งแล้วคำนวณกับ redline ใน shared memory"""
+    xs, ys = get_transformer_to_utm(epsg).transform(lons, lats)
+    best_idx, best_dist, matches = nearest_and_matches(
+        _worker_redlines.arrays, epsg, np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), threshold_m
+    )
+    return point_ids, best_idx, best_dist, [(r, point_ids[local], d) for r, local, d in matches]
+
+
+def match_points_parallel(all_points, compute_redlines, threshold_m, workers=None, chunk_size=2048):
+    """
+    engine "parallel": คำนวณระยะด้วย numpy ในหลาย process
+    - segment ของ redline (ต่อ UTM zone ที่มีจุด) ถูกเขียนลง shared memory ครั้งเดียว
+      worker attach แบบ zero-copy ไม่ต้อง pickle geometry หรืออ่าน KML ใหม่
+    - งานแบ่งเป็น chunk ละ chunk_size จุด (จุดใน chunk อยู่ zone เดียวกัน)
+    - workers=1 คำนวณใน process หลัก (ใช้ array ชุดเดียวกัน)
+    ผลลัพธ์อยู่ในรูปเดียวกับ match_points_distance
+    คืน (points_results, redline_matches)
+    """
+    n = len(all_points)
+    lons = np.array([float(p['lon']) for p in all_points])
+    lats = np.array([float(p['lat']) for p in all_points])
+    zone = np.floor((lons + 180) / 6).astype(np.int64) + 1
+    epsgs = np.where(lats >= 0, 32600 + zone, 32700 + zone)
+
+    tasks = []
+    for epsg in np.unique(epsgs).tolist():
+        ids = np.flatnonzero(epsgs == epsg)
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            tasks.append((epsg, chunk, lons[chunk], lats[chunk], threshold_m))
+
+    best_idx = np.full(n, -1, dtype=np.int64)
+    best_dist = np.full(n, np.inf)
+    found = defaultdict(list)  # redline idx -> [(point ids, dists)]
+    workers = workers or os.cpu_count() or 1
+
+    shared = SharedRedlines.publish(build_redline_arrays(compute_redlines, np.unique(epsgs).tolist()))
+    try:
+        logging.info("parallel engine: redline %d เส้น ใน shared memory %.1f MB, %d งาน, %d worker",
+                     len(compute_redlines), shared.nbytes / 1e6, len(tasks), workers)
+        if workers == 1 or len(tasks) <= 1:
+            _init_worker(shared.spec)
+            results = [_worker_chunk(*task) for task in tasks]
+        else:
+            with futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(shared.spec,)) as pool:
+                results = list(pool.map(_worker_chunk, *zip(*tasks)))
+        for point_ids, chunk_idx, chunk_dist, matches in results:
+            best_idx[point_ids] = chunk_idx
+            best_dist[point_ids] = chunk_dist
+            for r, ids, d in matches:
+                found[r].append((ids, d))
+    finally:
+        if _worker_redlines is not None and _worker_redlines.spec is shared.spec:
+            _worker_redlines.close()
+        shared.unlink()
+
+    redline_matches = defaultdict(list)
+    matched_any = np.zeros(n, dtype=bool)
+    for r, rl in enumerate(compute_redlines):
+        if r not in found:
+            continue
+        ids = np.concatenate([ids for ids, _ in found[r]])
+        dists = np.concatenate([d for _, d in found[r]])
+        order = np.argsort(ids, kind="stable")
+        matched_any[ids] = True
+        for k, dist in zip(ids[order].tolist(), dists[order].tolist()):
+            add_match(redline_matches, rl, match_record(all_points[k], float(lats[k]), float(lons[k]), dist))
+
+    points_results = []
+    for k, p in enumerate(all_points):
+        best = int(best_idx[k])
+        best_redline = compute_redlines[best]['name'] if best >= 0 else None
+        points_results.append(point_result(p, float(lats[k]), float(lons[k]), best_redline,
+                                           float(best_dist[k]), bool(matched_any[k])))
+    return points_results, redline_matches
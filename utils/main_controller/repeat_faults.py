@@ -0,0 +1,162 @@
+import logging
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import utm_epsg_for_lon, get_transformer_to_utm
+from ..geom_controller.grid_index import collapse_points, group_cells, near_cells, find_root, union
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pyproj = lazy_import("pyproj")
+
+NO_REPEAT = -1
+# ช่องรอบตัว (3x3) ที่อาจมี anchor ห่างไม่เกินรัศมีเมื่อช่องกว้างเท่ารัศมี
+AROUND_CELLS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+COLUMNS = ['repeat_id', 'lat', 'lon', 'รัศมี (m)', 'จำนวนครั้ง', 'จำนวนเดือน', 'เดือน', 'tickets',
+           'nearest_redline', 'เชื่อมด้วย']
+
+
+def _valid_ticket(ticket):
+    return ticket is not None and str(ticket).strip() not in ("", "None", "nan", "N/A", "-")
+
+
+def _anchor_locations(xs, ys, radius_m):
+    """
+    จัดจุด (พิกัดเมตร ไม่ซ้ำ) เป็นตำแหน่งตามลำดับที่พบ: จุดเข้าตำแหน่งของ anchor ที่ใกล้สุดในระยะ radius_m
+    (หาเฉพาะ anchor ในช่อง grid 3x3 รอบตัว เสมอกันเลือก anchor ที่มาก่อน) ถ้าไม่มี จุดนั้นเป็น anchor ของตำแหน่งใหม่
+    ทุกจุดห่าง anchor ของตัวเองไม่เกิน radius_m จึงไม่ต่อกันเป็นทอด ๆ ตามแนวเส้นทาง
+    (anchor ในช่องเดียวกันห่างกันเกิน radius_m จึงมีไม่กี่ตัวต่อช่อง - งานต่อจุดคงที่)
+    คืน index ตำแหน่งของแต่ละจุด (0..n_locations-1 ตามลำดับ anchor)
+    """
+    cell_of, cell_xy, _, _ = group_cells(xs, ys, radius_m)
+    around = near_cells(cell_xy, AROUND_CELLS).tolist()
+    r2 = radius_m * radius_m
+    anchors = [[] for _ in range(len(cell_xy))]  # ช่อง → [(x, y, ตำแหน่ง)] ของ anchor ในช่อง
+    location = np.empty(len(xs), dtype=np.int64)
+    n_locations = 0
+    for i, (x, y, c) in enumerate(zip(xs.tolist(), ys.tolist(), cell_of.tolist())):
+        best = None
+        for d in around[c]:
+            if d < 0:
+                continue
+            for ax, ay, loc in anchors[d]:
+                d2 = (ax - x) ** 2 + (ay - y) ** 2
+                if d2 <= r2 and (best is None or (d2, loc) < best):
+                    best = (d2, loc)
+        if best is None:
+            anchors[c].append((x, y, n_locations))
+            location[i] = n_locations
+            n_locations += 1
+        else:
+            location[i] = best[1]
+    return location
+
+
+def _location_table(members, epsg):
+    """ตารางสรุปต่อตำแหน่ง (root) ของ members ที่เรียงตาม root แล้ว (aggregate ทั้งตาราง ไม่วนทีละตำแหน่ง)"""
+    by_root = members.groupby('root', sort=True)
+    summary = by_root.agg(cx=('x', 'mean'), cy=('y', 'mean'), n=('group', 'size'),
+                          by_coord=('by_coord', 'any'), by_ticket=('by_ticket', 'any'))
+    center = by_root[['x', 'y']].transform('mean')
+    spread_m = np.sqrt((members['x'] - center['x']) ** 2 + (members['y'] - center['y']) ** 2)
+    months = members.drop_duplicates(['root', 'group']).groupby('root')['group'].agg(list)
+    valid = members[[_valid_ticket(t) for t in members['ticket'].tolist()]]
+    ticket_lists = valid.drop_duplicates(['root', 'ticket']).groupby('root')['ticket'].agg(list)
+    # nearest_redline ที่พบบ่อยสุด (เสมอกันเลือกชื่อที่น้อยกว่า เหมือน Series.mode)
+    redline_counts = members.dropna(subset=['redline']).groupby(['root', 'redline']).size().reset_index(name='n')
+    nearest = (redline_counts.sort_values(['root', 'n', 'redline'], ascending=[True, False, True])
+               .drop_duplicates('root').set_index('root')['redline'])
+
+    to_lonlat = pyproj.Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+    lons_c, lats_c = to_lonlat.transform(summary['cx'].to_numpy(), summary['cy'].to_numpy())
+    months = months.reindex(summary.index)
+    return pd.DataFrame({
+        'repeat_id': np.arange(len(summary)),
+        'lat': np.round(np.asarray(lats_c, dtype=float), 6),
+        'lon': np.round(np.asarray(lons_c, dtype=float), 6),
+        'รัศมี (m)': spread_m.groupby(members['root']).max().reindex(summary.index).round(1).to_numpy(),
+        'จำนวนครั้ง': summary['n'].to_numpy(),
+        'จำนวนเดือน': [len(m) for m in months],
+        'เดือน': [", ".join(str(m) for m in ms) for ms in months],
+        'tickets': [", ".join(str(t) for t in ts) if isinstance(ts, list) else ""
+                    for ts in ticket_lists.reindex(summary.index)],
+        'nearest_redline': nearest.reindex(summary.index).to_numpy(),
+        'เชื่อมด้วย': [" + ".join(name for name, flag in (('coordinate', c), ('ticket', t)) if flag)
+                       for c, t in zip(summary['by_coord'], summary['by_ticket'])],
+    }, columns=COLUMNS)
+
+
+def detect_repeat_faults(points_df, radius_m=50, reports=None):
+    """
+    หาตำแหน่งที่เกิด fault ซ้ำข้ามกลุ่ม (เดือน) ด้วย hash join ของช่อง grid (linear ไม่มีการเทียบระยะทุกคู่)
+      - coordinate: รวมจุดที่พิกัดซ้ำกัน แล้วจัดเข้าตำแหน่งของ anchor ที่ห่างไม่เกิน radius_m
+        (หาใน 3x3 ช่องรอบตัว จุดใกล้กันคนละฝั่งขอบช่องจึงเป็นตำแหน่งเดียวกัน และเชื่อมกับ anchor เท่านั้น
+         ไม่ต่อกันเป็นทอด ๆ จึงไม่รวมทั้งเส้นทางเป็นตำแหน่งเดียว)
+      - ticket: ticket เดียวกัน = เหตุการณ์เดียวกัน → รวมตำแหน่งของจุดเหล่านั้น
+    ตำแหน่งที่มีมากกว่า 1 กลุ่มถือเป็นตำแหน่งที่เกิดซ้ำ
+    - เพิ่มคอลัมน์ 'repeat_id' ใน points_df (-1 = ไม่ซ้ำ)
+    - คืนตาราง: repeat_id, lat, lon, รัศมี (m), จำนวนครั้ง, จำนวนเดือน, เดือน, tickets, nearest_redline, เชื่อมด้วย
+      (รัศมี = ระยะไกลสุดของจุดจากจุดกึ่งกลาง - ไม่เกิน 2 x radius_m ยกเว้นเมื่อ ticket เชื่อมหลายตำแหน่งเข้าด้วยกัน)
+      และเก็บไว้ที่ reports['repeat_faults'] (ถ้าส่ง reports มา)
+    """
+    points_df['repeat_id'] = NO_REPEAT
+    n = len(points_df)
+    if n == 0:
+        table = pd.DataFrame(columns=COLUMNS)
+        if reports is not None:
+            reports['repeat_faults'] = table
+        return table
+
+    lons = points_df['lon'].to_numpy(dtype=float)
+    lats = points_df['lat'].to_numpy(dtype=float)
+    groups = points_df['group'].to_numpy()
+    tickets = points_df['ticket'].to_numpy() if 'ticket' in points_df else np.full(n, None)
+
+    epsg = utm_epsg_for_lon(float(np.median(lons)), float(np.median(lats)))
+    xs, ys = get_transformer_to_utm(epsg).transform(lons, lats)
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+
+    # 1) ตำแหน่ง = anchor ในระยะ radius_m (พิกัดซ้ำจัดครั้งเดียว)
+    ux, uy, _, inverse = collapse_points(xs, ys)
+    location_of = _anchor_locations(ux, uy, radius_m)[inverse]
+    n_locations = int(location_of.max()) + 1
+
+    # 2) join ด้วย ticket (union-find ระดับตำแหน่ง)
+    keys = pd.Series([str(t).strip() if _valid_ticket(t) else None for t in tickets.tolist()], dtype=object)
+    ticket_code, _ = pd.factorize(keys)
+    by_ticket = np.zeros(n, dtype=bool)
+    parent = list(range(n_locations))
+    has_ticket = ticket_code >= 0
+    if has_ticket.any():
+        linked = pd.DataFrame({'ticket': ticket_code[has_ticket], 'location': location_of[has_ticket]})
+        by_ticket[has_ticket] = linked.groupby('ticket')['ticket'].transform('size').to_numpy() > 1
+        linked['first'] = linked.groupby('ticket')['location'].transform('first')
+        edges = linked.loc[linked['location'] != linked['first'], ['location', 'first']].drop_duplicates()
+        for c, f in zip(edges['location'].tolist(), edges['first'].tolist()):
+            union(parent, c, f)
+    roots = np.array([find_root(parent, c) for c in range(n_locations)])[location_of]
+
+    location_groups = pd.DataFrame({'location': location_of, 'group': groups}).groupby('location')['group'].nunique()
+    members = pd.DataFrame({
+        'root': roots, 'x': xs, 'y': ys, 'group': groups, 'ticket': tickets,
+        'redline': points_df['nearest_redline'].to_numpy() if 'nearest_redline' in points_df else None,
+        'by_coord': location_groups.reindex(location_of).to_numpy() > 1, 'by_ticket': by_ticket,
+    })
+    n_groups = members.groupby('root', sort=False)['group'].nunique()
+    repeat_roots = n_groups.index[n_groups > 1]
+    members = members[members['root'].isin(repeat_roots)].sort_values('root', kind="stable")
+
+    # 3) ตารางสรุปต่อตำแหน่ง
+    table = _location_table(members, epsg) if len(members) else pd.DataFrame(columns=COLUMNS)
+    if len(table):
+        repeat_id = np.full(n_locations, NO_REPEAT, dtype=np.int64)
+        repeat_id[np.sort(pd.unique(members['root']))] = table['repeat_id'].to_numpy()
+        points_df['repeat_id'] = repeat_id[roots]
+        table = table.sort_values(['จำนวนเดือน', 'จำนวนครั้ง'], ascending=False, kind="stable").reset_index(drop=True)
+        spread = table['รัศมี (m)'] > 2 * radius_m
+        logging.info("พบตำแหน่งที่เกิด fault ซ้ำข้ามเดือน %d ตำแหน่ง (รัศมี %g m)", len(table), radius_m)
+        if spread.any():
+            logging.warning("%d ตำแหน่งกระจายเกิน 2 x รัศมี %g m เพราะ ticket เดียวกันเชื่อมหลายตำแหน่ง (ดูคอลัมน์ รัศมี (m))",
+                            int(spread.sum()), radius_m)
+    if reports is not None:
+        reports['repeat_faults'] = table
+    return table
@@ -0,0 +1,480 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+from ..store_controller.columnar_store import ColumnStore
+from ..bench_controller.stage_timer import stage
+from .main_analysis import ENGINE_VERSION, ENGINES, prepare_redlines, simplification_rows, simplify_tolerance
+from .chunked_analysis import (DEFAULT_CHUNK_SIZE, iter_point_chunks, result_schema, process_point_chunks,
+                               finish_chunked)
+from .exclusive_assignment import ASSIGNMENTS, merge_shared
+from .summary_accumulator import SummaryAccumulator
+
+JOB_FILE = "job.json"
+SHARDS_DIR = "shards"
+PARTIAL_FILE = "partial.json"
+CLAIM_FILE = "claim.json"
+# ระยะห่าง (วินาที) ของการตรวจว่า shard เสร็จหรือยังตอนรอ worker เครื่องอื่น
+POLL_S = 2.0
+# option ของ analyze_points_chunked ที่เก็บใน job (ค่าเริ่มต้นเหมือนกัน)
+JOB_OPTIONS = {
+    'threshold_m': 100,
+    'chunk_size': DEFAULT_CHUNK_SIZE,
+    'simplify_ratio': None,
+    'collapse_duplicate_redlines': True,
+    'engine': "distance",
+    'assignment': "all",
+    'point_columns': None,
+    'chainage_bin_km': None,
+    'hotspot_radius_m': None,
+    'hotspot_min_points': 3,
+    'site_files': None,
+    'site_tolerance_m': 100,
+}
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _shard_dir(shared_dir, shard_id):
+    return os.path.join(shared_dir, SHARDS_DIR, f"{shard_id:04d}")
+
+
+def plan_shards(points_grouped, n_shards, point_store=None):
+    """
+    แบ่งกลุ่มจุด (ไฟล์ / group ใน store) เป็น n_shards ชุดที่ต่อกันตามลำดับเดิม ขนาดใกล้เคียงกัน
+    ขนาด = จำนวนแถวใน store หรือขนาดไฟล์ คืน list ของ list ชื่อกลุ่ม (ไม่มีชุดว่าง)
+    """
+    groups = list(points_grouped)
+    if point_store is not None:
+        sizes = [sum(stop - start for start, stop in point_store.group_ranges(g)) for g in groups]
+    else:
+        sizes = [os.path.getsize(points_grouped[g]) if os.path.exists(points_grouped[g]) else 0 for g in groups]
+    total = sum(sizes) or 1
+    n_shards = max(1, min(n_shards, len(groups)))
+    shards, current, done = [], [], 0
+    for i, (group, size) in enumerate(zip(groups, sizes)):
+        current.append(group)
+        done += size
+        left_groups, left_shards = len(groups) - i - 1, n_shards - len(shards) - 1
+        # ปิดชุดเมื่อถึงสัดส่วนของชุดนี้ หรือกลุ่มที่เหลือพอดีกับจำนวนชุดที่เหลือ
+        if left_shards > 0 and (done >= total * (len(shards) + 1) / n_shards or left_groups == left_shards):
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+
+def plan_job(shared_dir, points_grouped, redlines_files, n_shards, point_store=None, **options):
+    """
+    เขียน job ลง <shared_dir>/job.json (ลบผลของ job เดิมในโฟลเดอร์นี้)
+    - points_grouped: dict กลุ่ม → ไฟล์ (หรือ list ชื่อ group เมื่อใช้ point_store = path ของ ColumnStore)
+    - options: ตาม JOB_OPTIONS
+    path ของ input เก็บเป็น absolute path: ทุกเครื่องต้องเห็นไฟล์ที่ path เดียวกัน (เช่น mount shared drive เดียวกัน)
+    """
+    unknown = set(options) - set(JOB_OPTIONS)
+    if unknown:
+        raise TypeError(f"ไม่รู้จัก option: {', '.join(sorted(unknown))}")
+    options = dict(JOB_OPTIONS, **options)
+    if options['engine'] not in ENGINES:
+        raise ValueError(f"ไม่รู้จัก engine: {options['engine']} (ใช้ได้: {', '.join(ENGINES)})")
+    if options['assignment'] not in ASSIGNMENTS:
+        raise ValueError(f"ไม่รู้จัก assignment: {options['assignment']} (ใช้ได้: {', '.join(ASSIGNMENTS)})")
+    if options['site_files']:
+        options['site_files'] = [os.path.abspath(p) for p in options['site_files']]
+
+    if point_store is not None:
+        store = ColumnStore(point_store)
+        groups = store.groups if points_grouped is None else list(points_grouped)
+        shards = plan_shards({g: None for g in groups}, n_shards, store)
+        point_store = os.path.abspath(point_store)
+    else:
+        points_grouped = {g: os.path.abspath(p) for g, p in points_grouped.items()}
+        shards = [{g: points_grouped[g] for g in groups} for groups in plan_shards(points_grouped, n_shards)]
+
+    job = {
+        'engine_version': ENGINE_VERSION,
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'redlines_files': [os.path.abspath(p) for p in redlines_files],
+        'point_store': point_store,
+        'options': options,
+        'shards': [{'id': i, 'points': points} for i, points in enumerate(shards)],
+    }
+    shutil.rmtree(os.path.join(shared_dir, SHARDS_DIR), ignore_errors=True)
+    for shard in job['shards']:
+        os.makedirs(_shard_dir(shared_dir, shard['id']))
+    _write_json(os.path.join(shared_dir, JOB_FILE), job)
+    logging.info("shard job: %d shard ที่ %s", len(shards), shared_dir)
+    return job
+
+
+def load_job(shared_dir):
+    job = _read_json(os.path.join(shared_dir, JOB_FILE))
+    if job['engine_version'] != ENGINE_VERSION:
+        raise RuntimeError(f"job สร้างด้วย engine version {job['engine_version']} "
+                           f"แต่เครื่องนี้เป็น {ENGINE_VERSION} - ใช้โค้ด version เดียวกันทุกเครื่อง")
+    return job
+
+
+def _is_done(shared_dir, shard_id):
+    return os.path.exists(os.path.join(_shard_dir(shared_dir, shard_id), PARTIAL_FILE))
+
+
+def pending_shards(shared_dir, job):
+    """id ของ shard ที่ยังไม่มี partial.json"""
+    return [s['id'] for s in job['shards'] if not _is_done(shared_dir, s['id'])]
+
+
+def _claim_path(shared_dir, shard_id):
+    return os.path.join(_shard_dir(shared_dir, shard_id), CLAIM_FILE)
+
+
+def _take_claim_file(path, expect=None):
+    """
+    ย้าย claim ออกแบบ atomic (rename เป็นชื่อเฉพาะของผู้ย้าย) แล้วตรวจว่าเป็น claim ที่ตั้งใจจะลบ
+    expect(content, stat) คืน True = ลบทิ้ง, False = คืนที่เดิม (ด้วย link - ไม่ทับ claim ใหม่ที่อาจถูกสร้างระหว่างนั้น)
+    คืน True ถ้าลบ claim ไปแล้ว
+    """
+    tombstone = f"{path}.{uuid.uuid4().hex}.drop"
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return False
+    try:
+        with open(tombstone, encoding="utf-8") as f:
+            content = f.read()
+        if expect is None or expect(content, os.stat(tombstone)):
+            return True
+        try:
+            os.link(tombstone, path)
+        except FileExistsError:
+            logging.warning("%s: มี claim ใหม่แล้ว - claim ที่ย้ายออกไม่ได้คืน", path)
+        return False
+    finally:
+        os.remove(tombstone)
+
+
+def claim_shard(shared_dir, shard_id, reclaim_after_s=None):
+    """
+    จอง shard (สร้าง claim.json แบบ O_EXCL ได้ worker เดียว) คืน claim (dict: path, token) หรือ None ถ้าจองไม่ได้
+    reclaim_after_s: claim ที่ไม่ได้ heartbeat (mtime) นานกว่านี้และยังไม่เสร็จ ถือว่า worker ตายไปแล้ว → จองใหม่ได้
+             (ต้องนานกว่าเวลาทำ 1 chunk) ก่อนลบจะตรวจว่ายังเป็น claim เดิมที่เห็นว่าเก่า
+             worker ที่แย่งจองพร้อมกันจึงไม่ลบ claim ใหม่ของกันและกัน
+    """
+    path = _claim_path(shared_dir, shard_id)
+    for _ in range(2):
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    seen = f.read()
+                age = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if reclaim_after_s is None or age < reclaim_after_s:
+                return None
+            logging.warning("shard %d: claim ไม่ได้ heartbeat %.0f s - จองใหม่", shard_id, age)
+            _take_claim_file(path, lambda content, st: content == seen and
+                             time.time() - st.st_mtime >= reclaim_after_s)
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time(), 'token': token}, f)
+        return {'path': path, 'token': token}
+    return None
+
+
+def _owns(content, claim):
+    try:
+        return json.loads(content).get('token') == claim['token']
+    except ValueError:
+        return False
+
+
+def heartbeat(claim):
+    """แจ้งว่า worker ยังทำ shard อยู่ (touch claim) - raise RuntimeError ถ้า claim ถูกจองใหม่ไปแล้ว"""
+    try:
+        with open(claim['path'], encoding="utf-8") as f:
+            # touch ผ่าน fd ที่อ่าน token แล้ว: ถ้าไฟล์ถูกสลับระหว่างนั้นจะไม่ไป touch claim ของ worker อื่น
+            owned = _owns(f.read(), claim)
+            if owned:
+                os.utime(f.fileno())
+    except FileNotFoundError:
+        owned = False
+    if not owned:
+        raise RuntimeError(f"claim {claim['path']} ถูกจองใหม่โดย worker อื่น - หยุดทำ shard นี้")
+
+
+def release_claim(claim):
+    """ลบ claim ของตัวเอง (ไม่ลบถ้าถูกจองใหม่ไปแล้ว)"""
+    return _take_claim_file(claim['path'], lambda content, st: _owns(content, claim))
+
+
+def _shared_to_json(shared):
+    return [[key[0], key[1], dict(entry, tickets=list(entry['tickets']))] for key, entry in shared.items()]
+
+
+def _shared_from_json(rows):
+    return {(lat, lon): dict(entry, tickets=dict.fromkeys(entry['tickets'])) for lat, lon, entry in rows}
+
+
+def _heartbeat_chunks(chunks, claim):
+    for chunk in chunks:
+        heartbeat(claim)
+        yield chunk
+
+
+def run_shard(shared_dir, job, shard_id, stages=None, claim=None):
+    """
+    วิเคราะห์ shard เดียว: ผลต่อจุดลง <shard>/results (ColumnStore) และผลบางส่วนลง <shard>/partial.json
+    partial.json (เขียนทีหลังสุดแบบ atomic = shard เสร็จ): สถานะ SummaryAccumulator, shared faults, แถว redline_simplify
+    claim: ผลของ claim_shard - heartbeat ทุก chunk และเขียนผลลง results.<token>.tmp ก่อน
+           แล้ว os.replace เป็น results เมื่อยังเป็นเจ้าของ claim อยู่ (worker ที่ถูกจองแทนไม่ทับผลของอีกฝั่ง)
+    """
+    options = job['options']
+    shard = job['shards'][shard_id]
+    shard_dir = _shard_dir(shared_dir, shard_id)
+    started = time.time()
+    redline_geoms, compute_redlines = prepare_redlines(job['redlines_files'], options['collapse_duplicate_redlines'],
+                                                       None, stages)
+    if not redline_geoms:
+        raise RuntimeError("ไม่พบ redlines ที่ใช้งานได้")
+
+    results_dir = os.path.join(shard_dir, "results")
+    work_dir = f"{results_dir}.{claim['token'] if claim else os.getpid()}.tmp"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    results = ColumnStore(work_dir, result_schema(options['hotspot_radius_m']))
+    point_store = ColumnStore(job['point_store']) if job['point_store'] else None
+    engine, threshold_m = options['engine'], options['threshold_m']
+    simplify_tolerance_m = simplify_tolerance(threshold_m, options['simplify_ratio'], engine)
+    chunks = iter_point_chunks(shard['points'], options['chunk_size'], options['point_columns'], point_store)
+    if claim:
+        chunks = _heartbeat_chunks(chunks, claim)
+    try:
+        summary, shared = process_point_chunks(chunks, redline_geoms, compute_redlines, results, threshold_m,
+                                               engine, simplify_tolerance_m, options['assignment'], stages)
+        if claim:
+            heartbeat(claim)
+        shutil.rmtree(results_dir, ignore_errors=True)
+        os.replace(work_dir, results_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    partial = {
+        'shard': shard_id,
+        'host': socket.gethostname(),
+        'seconds': round(time.time() - started, 3),
+        'n_points': results.n_rows,
+        'summary': summary.to_state(),
+        'shared': _shared_to_json(shared),
+        'simplify_rows': simplification_rows(redline_geoms, simplify_tolerance_m) if simplify_tolerance_m else [],
+    }
+    _write_json(os.path.join(shard_dir, PARTIAL_FILE), partial)
+    logging.info("shard %d: %d จุด %.1f s", shard_id, results.n_rows, partial['seconds'])
+    return partial
+
+
+def run_worker(shared_dir, reclaim_after_s=None, stages=None):
+    """
+    worker: วนจอง shard ที่ยังไม่เสร็จตามลำดับแล้ว run_shard จนไม่เหลือ (รันพร้อมกันหลาย process / หลายเครื่องได้)
+    shard ที่ error (รวมถึง claim ถูกจองใหม่ระหว่างทำ): ลบ claim ของตัวเองให้ worker อื่นลองใหม่ได้ แล้วทำ shard ถัดไปต่อ
+    คืน (list ของ shard ที่ทำเสร็จ, list ของ shard ที่ error)
+    """
+    job = load_job(shared_dir)
+    done, failed = [], []
+    for shard_id in pending_shards(shared_dir, job):
+        claim = claim_shard(shared_dir, shard_id, reclaim_after_s)
+        if claim is None:
+            continue
+        if _is_done(shared_dir, shard_id):
+            continue  # worker อื่นทำเสร็จก่อนที่ claim เก่าจะถูกจองใหม่
+        try:
+            run_shard(shared_dir, job, shard_id, stages, claim)
+            done.append(shard_id)
+        except Exception:
+            logging.exception("shard %d ล้มเหลว", shard_id)
+            release_claim(claim)
+            failed.append(shard_id)
+    return done, failed
+
+
+def _merge_simplify_rows(rows, redline_geoms):
+    """แถว redline_simplify จากทุก shard: 1 แถวต่อ (redline, zone) ตามลำดับที่พบครั้งแรก เรียงตามลำดับ redline"""
+    order = {rl['name']: i for i, rl in enumerate(redline_geoms)}
+    unique = {(row['redline'], row['epsg']): row for row in reversed(rows)}
+    return sorted(reversed(list(unique.values())), key=lambda row: order[row['redline']])
+
+
+def merge_job(shared_dir, reports=None, wait_s=0, stages=None):
+    """
+    รวมผลทุก shard ตามลำดับ shard (= ลำดับจุด) ได้ผลเท่ากับ analyze_points_chunked บนทุกจุดในเครื่องเดียว
+    - summary: SummaryAccumulator.merge (dedupe coordinate/รายละเอียดข้าม shard)
+    - shared_faults: รวมจำนวนจุด/ticket ต่อ coordinate
+    - duplicate_coords / hotspot / เส้นทาง: คำนวณจากผลต่อจุดของทุก shard (ข้าม shard ได้)
+    wait_s: รอ shard ที่ยังไม่เสร็จ (worker เครื่องอื่น) นานสุดกี่วินาที (None = รอจนเสร็จ)
+    คืน (list ของ ColumnStore ผลต่อจุดตามลำดับ shard, redline_summary) - (None, None) ถ้าไม่มีจุด/redline
+    """
+    job = load_job(shared_dir)
+    deadline = None if wait_s is None else time.time() + wait_s
+    pending = pending_shards(shared_dir, job)
+    while pending and (deadline is None or time.time() < deadline):
+        time.sleep(POLL_S)
+        pending = pending_shards(shared_dir, job)
+    if pending:
+        raise RuntimeError(f"shard ที่ยังไม่เสร็จ: {', '.join(map(str, pending))}")
+
+    options = job['options']
+    redline_reports = {}
+    redline_geoms, _ = prepare_redlines(job['redlines_files'], options['collapse_duplicate_redlines'],
+                                        redline_reports, stages)
+    if not redline_geoms:
+        return None, None
+
+    summary, shared, simplify_rows, stores = None, {}, [], []
+    with stage(stages, "merge_shards"):
+        for shard in job['shards']:
+            shard_dir = _shard_dir(shared_dir, shard['id'])
+            partial = _read_json(os.path.join(shard_dir, PARTIAL_FILE))
+            if set(partial['summary']['redlines']) != {rl['name'] for rl in redline_geoms}:
+                raise RuntimeError(f"shard {shard['id']}: ชุด redline ไม่ตรงกับ job")
+            part = SummaryAccumulator.from_state(redline_geoms, partial['summary'])
+            summary = part if summary is None else summary.merge(part)
+            merge_shared(shared, _shared_from_json(partial['shared']))
+            simplify_rows.extend(partial['simplify_rows'])
+            stores.append(ColumnStore(os.path.join(shard_dir, "results")))
+
+    n_points = sum(store.n_rows for store in stores)
+    logging.info("รวม %d shard: %d จุด", len(stores), n_points)
+    if n_points == 0:
+        logging.error("ไม่พบ points ใด ๆ")
+        return None, None
+
+    engine, threshold_m = options['engine'], options['threshold_m']
+    simplify_tolerance_m = simplify_tolerance(threshold_m, options['simplify_ratio'], engine)
+    redline_summary_counts = finish_chunked(
+        stores, redline_geoms, summary, shared, shared_dir, reports, redline_reports, options['chunk_size'],
+        simplify_tolerance_m, _merge_simplify_rows(simplify_rows, redline_geoms),
+        chainage_bin_km=options['chainage_bin_km'], hotspot_radius_m=options['hotspot_radius_m'],
+        hotspot_min_points=options['hotspot_min_points'], site_files=options['site_files'],
+        site_tolerance_m=options['site_tolerance_m'], stages=stages)
+    return stores, redline_summary_counts
+
+
+def start_local_workers(shared_dir, n_workers, reclaim_after_s=None):
+    """เปิด worker n_workers process ในเครื่องนี้ (คำสั่งเดียวกับที่ใช้บนเครื่องอื่น) คืน list ของ Popen"""
+    command = [sys.executable, "-m", "utils.main_controller.shard_coordinator", "worker",
+               os.path.abspath(shared_dir)]
+    if reclaim_after_s is not None:
+        command += ["--reclaim-after", str(reclaim_after_s)]
+    return [subprocess.Popen(command, cwd=REPO_ROOT) for _ in range(n_workers)]
+
+
+def run_job(shared_dir, points_grouped, redlines_files, n_shards, n_workers=None, reports=None, wait_s=0,
+            point_store=None, stages=None, **options):
+    """
+    plan_job → worker ในเครื่องนี้ n_workers process (ค่าเริ่มต้น = จำนวน shard ไม่เกินจำนวน CPU) → merge_job
+    worker บนเครื่องอื่นช่วยได้ระหว่างรัน: python -m utils.main_controller.shard_coordinator worker <shared_dir>
+    n_workers=0 + wait_s: ให้เครื่องอื่นทำทั้งหมดแล้วรอรวมผล
+    """
+    job = plan_job(shared_dir, points_grouped, redlines_files, n_shards, point_store, **options)
+    if n_workers is None:
+        n_workers = min(len(job['shards']), os.cpu_count() or 1)
+    procs = start_local_workers(shared_dir, n_workers)
+    failed = [proc.wait() for proc in procs]
+    if any(failed):
+        logging.warning("worker ในเครื่องนี้จบด้วย error %d process", sum(1 for code in failed if code))
+    return merge_job(shared_dir, reports, wait_s, stages)
+
+
+def _add_job_arguments(parser):
+    parser.add_argument("--shards", type=int, default=4, help="จำนวน shard (แบ่งตามไฟล์ points ตามลำดับ)")
+    parser.add_argument("--engine", default=JOB_OPTIONS['engine'], choices=ENGINES)
+    parser.add_argument("--threshold", type=float, default=JOB_OPTIONS['threshold_m'], help="ระยะ (เมตร)")
+    parser.add_argument("--assignment", default=JOB_OPTIONS['assignment'], choices=ASSIGNMENTS)
+    parser.add_argument("--chunk-size", type=int, default=JOB_OPTIONS['chunk_size'])
+    parser.add_argument("--chainage-bin-km", type=float, default=None)
+    parser.add_argument("--hotspot-radius", type=float, default=None, help="รัศมี hotspot (เมตร)")
+    parser.add_argument("--point-store", default=None, help="ColumnStore ของจุด (แทนไฟล์ใน config.py)")
+
+
+def _plan_from_args(args):
+    from config import points_files, redlines_files, site_files
+
+    return dict(
+        points_grouped=None if args.point_store else points_files, redlines_files=redlines_files,
+        n_shards=args.shards, point_store=args.point_store, threshold_m=args.threshold, engine=args.engine,
+        assignment=args.assignment, chunk_size=args.chunk_size, chainage_bin_km=args.chainage_bin_km,
+        hotspot_radius_m=args.hotspot_radius, site_files=site_files)
+
+
+def _write_output(summary, reports, threshold_m, output):
+    from ..excel_controller.write_results_to_excel import write_results_to_excel
+
+    write_results_to_excel(None, summary, threshold_m, output_path=output, extra_sheets=reports)
+    print(f"เขียนผล: {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="วิเคราะห์แบบแบ่ง shard ผ่านโฟลเดอร์ร่วม (ไฟล์ points / redlines จาก config.py)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan = commands.add_parser("plan", help="สร้าง job (แบ่ง shard)")
+    plan.add_argument("shared_dir")
+    _add_job_arguments(plan)
+    worker = commands.add_parser("worker", help="ทำ shard ที่ยังไม่เสร็จ (รันได้หลายเครื่องพร้อมกัน)")
+    worker.add_argument("shared_dir")
+    worker.add_argument("--reclaim-after", type=float, default=None,
+                        help="จอง shard ที่ claim ไม่ได้ heartbeat นานกว่านี้ (วินาที, มากกว่าเวลาทำ 1 chunk) ใหม่ได้ (worker เดิมตาย)")
+    merge = commands.add_parser("merge", help="รวมผลทุก shard")
+    merge.add_argument("shared_dir")
+    merge.add_argument("--wait", type=float, default=0, help="รอ shard ที่ยังไม่เสร็จนานสุด (วินาที)")
+    merge.add_argument("--output", default=None, help="ไฟล์ Excel ของผลรวม")
+    run = commands.add_parser("run", help="plan + worker ในเครื่องนี้ + merge")
+    run.add_argument("shared_dir")
+    _add_job_arguments(run)
+    run.add_argument("--workers", type=int, default=None, help="จำนวน worker ในเครื่องนี้")
+    run.add_argument("--wait", type=float, default=0, help="รอ shard ของเครื่องอื่นหลัง worker ในเครื่องนี้จบ")
+    run.add_argument("--output", default=None, help="ไฟล์ Excel ของผลรวม")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    if args.command == "plan":
+        job = plan_job(args.shared_dir, **_plan_from_args(args))
+        for shard in job['shards']:
+            print(f"shard {shard['id']}: {', '.join(shard['points'])}")
+    elif args.command == "worker":
+        done, failed = run_worker(args.shared_dir, args.reclaim_after)
+        print(f"ทำเสร็จ {len(done)} shard, ล้มเหลว {len(failed)} shard")
+        raise SystemExit(1 if failed else 0)
+    else:
+        reports = {}
+        if args.command == "run":
+            stores, summary = run_job(args.shared_dir, n_workers=args.workers, reports=reports, wait_s=args.wait,
+                                      **_plan_from_args(args))
+        else:
+            stores, summary = merge_job(args.shared_dir, reports, args.wait)
+        if summary is None:
+            raise SystemExit(1)
+        print(f"{sum(store.n_rows for store in stores)} จุด, {len(summary)} redline")
+        if args.output:
+            _write_output(summary, reports, load_job(args.shared_dir)['options']['threshold_m'], args.output)
@@ -0,0 +1,112 @@
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import get_transformer_to_utm, project_geom_with_transformer
+
+np = lazy_import("numpy")
+shapely = lazy_import("shapely")
+shared_memory = lazy_import("multiprocessing.shared_memory")
+
+# ขนาดที่จัดให้แต่ละ array ใน block ตรงกับ 64 byte (cache line)
+_ALIGN = 64
+
+
+def _segments(projected):
+    """segment ของเส้น (ทุก part) เป็น array (k, 4): x0, y0, x1, y1 (ไม่ต่อข้าม part)"""
+    coords, part_idx = shapely.get_coordinates(shapely.get_parts(projected), return_index=True)
+    keep = part_idx[:-1] == part_idx[1:]
+    return np.column_stack([coords[:-1][keep], coords[1:][keep]])
+
+
+def build_redline_arrays(compute_redlines, epsgs):
+    """
+    แปลง redline ทุกเส้นเป็น array ล้วน (ต่อ EPSG):
+      'seg_<epsg>'    (S, 4) float64  segment ทั้งหมดต่อกัน
+      'offset_<epsg>' (R+1,) int64    segment ของ redline i อยู่ที่ [offset[i], offset[i+1])
+      'bbox_<epsg>'   (R, 4) float64  bbox ของแต่ละ redline (minx, miny, maxx, maxy) ใช้เป็น index กรองเบื้องต้น
+    เส้นที่ project ไม่ได้จะไม่มี segment (bbox = inf → ไม่ถูกเลือกเป็น nearest)
+    """
+    arrays = {}
+    for epsg in epsgs:
+        transformer = get_transformer_to_utm(epsg)
+        segs, offsets, bboxes = [], [0], []
+        for rl in compute_redlines:
+            cache = rl.setdefault('epsg_cache', {})
+            # แปลงไม่สำเร็จจำไว้ที่ (epsg, 'failed') - key epsg ใช้ร่วมกับ point_to_geom_distance_m ซึ่งไม่รับ None
+            if epsg not in cache and (epsg, 'failed') not in cache:
+                try:
+                    cache[epsg] = project_geom_with_transformer(rl['geom'], transformer)
+                except Exception:
+                    cache[(epsg, 'failed')] = True
+            projected = cache.get(epsg)
+            seg = _segments(projected) if projected is not None else np.empty((0, 4))
+            segs.append(seg)
+            offsets.append(offsets[-1] + len(seg))
+            if len(seg):
+                xs, ys = seg[:, [0, 2]], seg[:, [1, 3]]
+                bboxes.append((xs.min(), ys.min(), xs.max(), ys.max()))
+            else:
+                bboxes.append((np.inf, np.inf, np.inf, np.inf))
+        arrays[f'seg_{epsg}'] = np.concatenate(segs) if segs else np.empty((0, 4))
+        arrays[f'offset_{epsg}'] = np.array(offsets, dtype=np.int64)
+        arrays[f'bbox_{epsg}'] = np.array(bboxes, dtype=float).reshape(-1, 4)
+    return arrays
+
+
+class SharedRedlines:
+    """
+    เก็บ array ของ redline ไว้ใน shared memory block เดียว
+    - process หลัก: SharedRedlines.publish(arrays) แล้วส่ง .spec (dict เล็ก ๆ pickle ได้) ให้ worker
+    - worker: SharedRedlines.attach(spec) → ได้ numpy view ที่ชี้ไปยัง memory เดียวกัน (ไม่ copy)
+    ใช้ with หรือเรียก close() (worker) / unlink() (process หลัก) เมื่อเลิกใช้
+    """
+
+    def __init__(self, shm, spec, owner):
+        self._shm = shm
+        self.spec = spec
+        self._owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, (offset, shape, dtype) in spec['arrays'].items()
+        }
+
+    @classmethod
+    def publish(cls, arrays):
+        layout, size = {}, 0
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            layout[name] = (size, arr.shape, arr.dtype.str)
+            size += -(-arr.nbytes // _ALIGN) * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        spec = {'name': shm.name, 'arrays': layout}
+        shared = cls(shm, spec, owner=True)
+        for name, arr in arrays.items():
+            shared.arrays[name][...] = arr
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        try:
+            shm = shared_memory.SharedMemory(name=spec['name'], track=False)  # python >= 3.13
+        except TypeError:
+            # python < 3.13: worker ที่เป็น child ใช้ resource_tracker ตัวเดียวกับ process หลัก
+            # การลงทะเบียนซ้ำไม่มีผล block ถูกลบโดย process หลัก (unlink) เท่านั้น
+            shm = shared_memory.SharedMemory(name=spec['name'])
+        return cls(shm, spec, owner=False)
+
+    @property
+    def nbytes(self):
+        return self._shm.size
+
+    def close(self):
+        self.arrays = {}
+        self._shm.close()
+
+    def unlink(self):
+        self.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink() if self._owner else self.close()
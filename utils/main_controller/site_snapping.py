@@ -0,0 +1,159 @@
+import logging
+import os
+import re
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import utm_epsg_for_lon, get_transformer_to_utm, project_geom_with_transformer
+from ..parse_controller.parse_sites import parse_kml_sites
+from .chainage import SITE_CODE_RE
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+shapely = lazy_import("shapely")
+
+# รหัส site ทุกตัวในชื่อไฟล์ redline เช่น "CMI1000_DN-LPN3052_DN (New)" → CMI1000, LPN3052
+SITE_CODES_IN_NAME_RE = re.compile(r"[A-Z]{3}[A-Z0-9]{4}")
+# ปลายของ part ที่ห่างจาก part อื่นไม่เกินนี้ (เมตร) ถือว่าต่อกัน ไม่ใช่ปลายเส้นทาง
+JOIN_TOLERANCE_M = 1.0
+
+
+def site_code(site_name):
+    """รหัส site จากชื่อ placemark เช่น 'NAN1288_PN' → 'NAN1288'"""
+    match = SITE_CODE_RE.match(site_name or "")
+    return match.group(1) if match else None
+
+
+def load_sites(site_files):
+    """อ่าน site จากหลายไฟล์ ตัดชื่อที่ซ้ำ (ใช้ตัวแรกที่เจอ)"""
+    sites, seen = [], set()
+    for filename in site_files:
+        for site in parse_kml_sites(filename):
+            key = site['name'] or (round(site['lon'], 6), round(site['lat'], 6))
+            if key in seen:
+                continue
+            seen.add(key)
+            sites.append(site)
+    return sites
+
+
+def _route_ends(route):
+    """ปลายเส้นทางจริง: ปลายของแต่ละ part ที่ไม่ได้ต่อกับ part อื่น"""
+    parts = shapely.get_parts(route)
+    if len(parts) == 1:
+        coords = shapely.get_coordinates(parts[0])
+        return [coords[0], coords[-1]]
+    # ปลายทั้งสองของทุก part เรียง (ต้น, ปลาย) ทีละ part แล้วหา part อื่นในระยะด้วย STRtree ครั้งเดียว
+    endpoints = np.column_stack([shapely.get_point(parts, 0), shapely.get_point(parts, -1)]).ravel()
+    owner = np.repeat(np.arange(len(parts)), 2)
+    ep_idx, part_idx = shapely.STRtree(parts).query(endpoints, predicate="dwithin", distance=JOIN_TOLERANCE_M)
+    joined = np.zeros(len(endpoints), dtype=bool)
+    joined[ep_idx[part_idx != owner[ep_idx]]] = True
+    return list(shapely.get_coordinates(endpoints[~joined]))
+
+
+def snap_sites_to_redlines(redline_geoms, sites, tolerance_m=100, reports=None):
+    """
+    จับคู่ site กับ redline:
+      - ปลายเส้นทาง (ต้น/ปลาย) → site ที่ใกล้ที่สุดในระยะ tolerance_m
+      - vertex ระหว่างทาง → ทุก site ในระยะ tolerance_m (ที่ไม่ได้อยู่ใกล้ปลายเส้น)
+    index ของ site เป็น STRtree (query ทุก vertex ของเส้นในครั้งเดียว)
+    ใส่ผลไว้ที่ rl['sites'] = {'ends': [...], 'interior': [...]}
+    คืน (report, site_locations)
+      - report: DataFrame ต่อ redline พร้อมคอลัมน์ 'ปัญหา' (ไม่มี site หัว/ท้าย, มี site ระหว่างทาง, ไม่ตรงชื่อไฟล์)
+        เก็บที่ reports['site_snapping'] ด้วย (ถ้าส่ง reports มา)
+      - site_locations: dict รหัส site → (lon, lat) ใช้กับ add_chainage ได้
+    """
+    columns = ['redline', 'site ตามชื่อไฟล์', 'site ต้นเส้น', 'site ปลายเส้น', 'site ระหว่างทาง',
+               'site ตามชื่อที่ไม่พบ', 'ปัญหา']
+    site_locations = {}
+    for site in sites:
+        site_locations.setdefault(site_code(site['name']), (site['lon'], site['lat']))
+    site_locations.pop(None, None)
+
+    if not sites or not redline_geoms:
+        table = pd.DataFrame(columns=columns)
+        if reports is not None:
+            reports['site_snapping'] = table
+        return table, site_locations
+
+    lons = np.array([s['lon'] for s in sites], dtype=float)
+    lats = np.array([s['lat'] for s in sites], dtype=float)
+    epsg = utm_epsg_for_lon(float(np.median(lons)), float(np.median(lats)))
+    transformer = get_transformer_to_utm(epsg)
+    xs, ys = transformer.transform(lons, lats)
+    site_points = shapely.points(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+    tree = shapely.STRtree(site_points)
+    names = [s['name'] for s in sites]
+
+    rows = []
+    for rl in redline_geoms:
+        cache = rl.setdefault('epsg_cache', {})
+        if epsg not in cache:
+            cache[epsg] = project_geom_with_transformer(rl['geom'], transformer)
+        route = cache[epsg]
+        if route.geom_type == "MultiLineString":
+            route = shapely.line_merge(route)
+
+        # ปลายเส้น → site ที่ใกล้ที่สุด
+        ends = _route_ends(route)
+        end_sites = []
+        if ends:
+            end_points = shapely.points(np.array(ends))
+            (e_idx, s_idx), dists = tree.query_nearest(end_points, max_distance=tolerance_m,
+                                                       return_distance=True)
+            nearest = {}
+            for e, s, d in zip(e_idx.tolist(), s_idx.tolist(), dists.tolist()):
+                if e not in nearest:  # เสมอกัน → ใช้ site ที่มาก่อน
+                    nearest[e] = (s, d)
+            end_sites = [nearest.get(e) for e in range(len(ends))]
+
+        # vertex ระหว่างทาง → site ในระยะ (ไม่นับ site ที่อยู่ใกล้ปลายเส้น เช่น PN/DN ในอาคารเดียวกัน)
+        vertices = shapely.points(shapely.get_coordinates(route))
+        _, s_idx = tree.query(vertices, predicate="dwithin", distance=tolerance_m)
+        interior = sorted(set(s_idx.tolist()))
+        if ends and interior:
+            near_end = shapely.dwithin(site_points[interior][:, None], end_points[None, :], tolerance_m).any(axis=1)
+            interior = [s for s, at_end in zip(interior, near_end.tolist()) if not at_end]
+
+        rl['sites'] = {
+            'ends': [(names[hit[0]], hit[1]) if hit else None for hit in end_sites],
+            'interior': [names[s] for s in interior],
+        }
+
+        expected = SITE_CODES_IN_NAME_RE.findall(os.path.splitext(rl['name'])[0])
+        expected = [expected[0], expected[-1]] if len(expected) >= 2 else expected
+        found_codes = {site_code(names[hit[0]]) for hit in end_sites if hit is not None}
+        missing = [code for code in dict.fromkeys(expected) if code not in found_codes]
+
+        problems = []
+        if len(ends) < 2 or end_sites[0] is None:
+            problems.append("ไม่มี site ที่ต้นเส้น")
+        if len(ends) < 2 or end_sites[-1] is None:
+            problems.append("ไม่มี site ที่ปลายเส้น")
+        if len(ends) > 2:
+            problems.append(f"เส้นขาดเป็น {len(ends)} ปลาย")
+        if interior:
+            problems.append("มี site ระหว่างทาง")
+        if missing and found_codes:
+            problems.append("site ปลายเส้นไม่ตรงกับชื่อไฟล์")
+
+        def describe(hit):
+            return f"{names[hit[0]]} ({hit[1]:.1f} m)" if hit else "-"
+
+        rows.append({
+            'redline': rl['name'],
+            'site ตามชื่อไฟล์': ", ".join(expected),
+            'site ต้นเส้น': describe(end_sites[0]) if end_sites else "-",
+            'site ปลายเส้น': " | ".join(describe(hit) for hit in end_sites[1:]) if len(end_sites) > 1 else "-",
+            'site ระหว่างทาง': ", ".join(names[s] for s in interior),
+            'site ตามชื่อที่ไม่พบ': ", ".join(missing),
+            'ปัญหา': ", ".join(problems),
+        })
+
+    table = pd.DataFrame(rows, columns=columns)
+    n_problem = int((table['ปัญหา'] != "").sum())
+    logging.info("site snapping: %d site, %d redline, มีปัญหา %d เส้น (tolerance %g m)",
+                 len(sites), len(table), n_problem, tolerance_m)
+    if reports is not None:
+        reports['site_snapping'] = table
+    return table, site_locations
@@ -0,0 +1,132 @@
+import logging
+
+
+def coord_key(r):
+    """key ของการ dedupe แบบ coordinate"""
+    return (round(r.get('lat', 0), 6), round(r.get('lon', 0), 6))
+
+
+def detail_key(r):
+    """key ของการ dedupe แบบรายละเอียด (ticket + coordinate + site + sign)"""
+    return (
+        r.get('ticket'),
+        round(r.get('lat', 0), 6),
+        round(r.get('lon', 0), 6),
+        r.get('site'),
+        r.get('sign')
+    )
+
+
+class SummaryAccumulator:
+    """
+    สรุปต่อ redline (dedupe แบบ coordinate และแบบรายละเอียด) ที่เพิ่ม match ได้ทีละส่วน
+    add ตามลำดับจุดเดิม (เช่น ทีละ chunk) ได้ผลเท่ากับสรุปจาก match ทั้งหมดในครั้งเดียว
+    แยกเป็นหลายส่วน (shard) ได้: to_state → JSON → from_state แล้ว merge ตามลำดับ shard ผลเท่ากับรันที่เดียว
+    assignment: ถ้ากำหนด ("all" / "exclusive") ผลมี count_all / count_exclusive
+      (add(matches, other_matches) - other_matches = match ของอีกแบบที่ใช้นับอย่างเดียว)
+    """
+
+    def __init__(self, redline_geoms, assignment=None):
+        self.redline_geoms = redline_geoms
+        self.assignment = assignment
+        self._state = {rl['name']: {'matches': [], 'coords': set(), 'by_coords': [], 'details': set(),
+                                    'by_details': []}
+                       for rl in redline_geoms}
+        self._other_details = {rl['name']: set() for rl in redline_geoms}
+
+    def add(self, redline_matches, other_matches=None):
+        for name, state in self._state.items():
+            for r in redline_matches.get(name, []):
+                state['matches'].append(r)
+                key = coord_key(r)
+                if key not in state['coords']:
+                    state['coords'].add(key)
+                    state['by_coords'].append(r)
+                key = detail_key(r)
+                if key not in state['details']:
+                    state['details'].add(key)
+                    state['by_details'].append(r)
+            if other_matches is not None:
+                self._other_details[name].update(detail_key(r) for r in other_matches.get(name, []))
+
+    def merge(self, other):
+        """รวมผลของ shard ถัดไป (ลำดับ merge = ลำดับจุด) dedupe ข้าม shard แบบเดียวกับ add"""
+        for name, state in self._state.items():
+            theirs = other._state.get(name)
+            if theirs is None:
+                continue
+            state['matches'].extend(theirs['matches'])
+            # record แรกของแต่ละ key ใน shard ถัดไป = ตัวแทนของ key นั้นใน shard (ถ้ายังไม่เคยเจอ)
+            for r in theirs['by_coords']:
+                key = coord_key(r)
+                if key not in state['coords']:
+                    state['coords'].add(key)
+                    state['by_coords'].append(r)
+            for r in theirs['by_details']:
+                key = detail_key(r)
+                if key not in state['details']:
+                    state['details'].add(key)
+                    state['by_details'].append(r)
+            self._other_details[name] |= other._other_details.get(name, set())
+        return self
+
+    def to_state(self):
+        """สถานะที่แปลงเป็น JSON ได้ (record ของ by_coords / by_details เก็บเป็น index ใน matches)"""
+        redlines = {}
+        for name, state in self._state.items():
+            index = {id(r): i for i, r in enumerate(state['matches'])}
+            redlines[name] = {
+                'matches': state['matches'],
+                'by_coords': [index[id(r)] for r in state['by_coords']],
+                'by_details': [index[id(r)] for r in state['by_details']],
+                'other_details': [list(key) for key in self._other_details[name]],
+            }
+        return {'assignment': self.assignment, 'redlines': redlines}
+
+    @classmethod
+    def from_state(cls, redline_geoms, state):
+        """สร้างจาก to_state (redline_geoms ต้องเป็นชุดเดียวกับตอนสร้าง)"""
+        summary = cls(redline_geoms, state['assignment'])
+        for name, saved in state['redlines'].items():
+            matches = saved['matches']
+            target = summary._state[name]
+            target['matches'] = matches
+            target['by_coords'] = [matches[i] for i in saved['by_coords']]
+            target['by_details'] = [matches[i] for i in saved['by_details']]
+            target['coords'] = {coord_key(r) for r in target['by_coords']}
+            target['details'] = {detail_key(r) for r in target['by_details']}
+            summary._other_details[name] = {tuple(key) for key in saved['other_details']}
+        return summary
+
+    def result(self):
+        """dict ชื่อ redline → summary (รูปเดียวกับ summarize_redline_matches)"""
+        redline_summary_counts = {}
+        for rl in self.redline_geoms:
+            name = rl['name']
+            state = self._state[name]
+            unique_by_coords, unique_by_full = state['by_coords'], state['by_details']
+            redline_summary_counts[name] = {
+                'count': len(unique_by_full),
+                'count_by_coords': len(unique_by_coords),
+                'count_by_details': len(unique_by_full),
+                'total_matches': len(state['matches']),
+                'points': unique_by_coords,
+                'points_by_coords': unique_by_coords,
+                'points_by_details': unique_by_full,
+                'raw_matches': state['matches'],
+                'geom': rl['geom'],
+            }
+            if self.assignment is not None:
+                info = redline_summary_counts[name]
+                other_count = len(self._other_details[name])
+                info['assignment'] = self.assignment
+                info['count_all'] = other_count if self.assignment == "exclusive" else info['count']
+                info['count_exclusive'] = info['count'] if self.assignment == "exclusive" else other_count
+
+            # แจ้งเตือนความต่างระหว่าง dedupe (ถ้ามี)
+            if len(unique_by_coords) != len(unique_by_full):
+                logging.info(
+                    "Redline %s: coordinate-based count (%d) != detail-based count (%d)",
+                    name, len(unique_by_coords), len(unique_by_full)
+                )
+        return redline_summary_counts
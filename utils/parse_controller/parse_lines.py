@@ -1,19 +1,7 @@
-import os
-import logging
-from collections import defaultdict
-from tqdm import tqdm
+from ..lazy_controller.lazy_import import lazy_import
 
-import pandas as pd
-import xml.etree.ElementTree as ET
-
-from shapely.geometry import LineString, Point, MultiLineString, GeometryCollection
-from shapely.ops import unary_union, transform
-
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-from pyproj import CRS, Transformer
-from datetime import datetime
+ET = lazy_import("xml.etree.ElementTree")
+geometry = lazy_import("shapely.geometry")
 
 ns = {'kml': 'http://www.opengis.net/kml/2.2'}
 
@@ -44,14 +32,14 @@ def parse_kml_lines(filepath):
                 points.append((lon, lat))
 
             if len(points) >= 2:
-                lines.append(LineString(points))
+                lines.append(geometry.LineString(points))
 
         if not lines:
             return None
         elif len(lines) == 1:
             return lines[0]
         else:
-            return MultiLineString(lines)
+            return geometry.MultiLineString(lines)
 
     except Exception as e:
         print(f"Error parsing {filepath}: {e}")
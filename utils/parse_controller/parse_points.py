@@ -1,7 +1,10 @@
 import os
-import xml.etree.ElementTree as ET
 import logging
 
+from ..lazy_controller.lazy_import import lazy_import
+
+ET = lazy_import("xml.etree.ElementTree")
+
 ns = {'kml': 'http://www.opengis.net/kml/2.2'}
 
 def parse_kml_points(filename):
@@ -0,0 +1,31 @@
+import os
+import logging
+
+from ..lazy_controller.lazy_import import lazy_import
+
+ET = lazy_import("xml.etree.ElementTree")
+
+ns = {'kml': 'http://www.opengis.net/kml/2.2'}
+
+def parse_kml_sites(filename):
+    """อ่าน site จาก KML (Placemark ที่เป็น Point) → คืนค่า list ของ dict {'name','lat','lon'}"""
+    if not os.path.exists(filename):
+        logging.warning("ไม่พบไฟล์ sites: %s", filename)
+        return []
+    tree = ET.parse(filename)
+    root = tree.getroot()
+    sites = []
+
+    for placemark in root.findall('.//kml:Placemark', ns):
+        coord_elem = placemark.find('.//kml:Point/kml:coordinates', ns)
+        if coord_elem is None or not coord_elem.text:
+            continue
+        try:
+            lon, lat, *_ = map(float, coord_elem.text.strip().split(','))
+        except Exception:
+            logging.warning("ไม่สามารถอ่านพิกัดจาก placemark ใน %s", filename)
+            continue
+        name_elem = placemark.find('kml:name', ns)
+        name = name_elem.text.strip() if name_elem is not None and name_elem.text else None
+        sites.append({'name': name, 'lat': lat, 'lon': lon, 'source': os.path.basename(filename)})
+    return sites
@@ -0,0 +1,121 @@
+import logging
+import os
+
+from ..lazy_controller.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pq = lazy_import("pyarrow.parquet")
+
+TABLE_EXTENSIONS = (".csv", ".xlsx", ".xls", ".parquet")
+
+# field ของ point → ชื่อคอลัมน์ที่ลองหาในไฟล์ (ไม่สนตัวพิมพ์เล็ก/ใหญ่) ตามลำดับ
+# ครอบคลุมชื่อจาก save_points_to_excel (ALL POINTS/) และชื่อ ExtendedData ใน KML
+DEFAULT_COLUMNS = {
+    'lat': ['lat', 'latitude', 'y'],
+    'lon': ['lon', 'lng', 'long', 'longitude', 'x'],
+    'ticket': ['ticket', 'ticket_id', 'incident'],
+    'sign': ['sign', 'status'],
+    'sla': ['sla'],
+    'region': ['region'],
+    'site': ['site', 'site_id'],
+    'online/mobile': ['online/mobile', 'online___mobile', 'online_mobile'],
+}
+TEXT_FIELDS = ('ticket', 'sign', 'sla', 'region', 'site', 'online/mobile')
+
+
+def is_table_file(filepath):
+    return os.path.splitext(filepath)[1].lower() in TABLE_EXTENSIONS
+
+
+def _header(filepath):
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".csv":
+        return list(pd.read_csv(filepath, nrows=0, encoding="utf-8-sig").columns)
+    if ext == ".parquet":
+        return list(pq.ParquetFile(filepath).schema_arrow.names)
+    return list(pd.read_excel(filepath, nrows=0).columns)
+
+
+def resolve_columns(header, column_map=None):
+    """
+    หาคอลัมน์ต้นทางของแต่ละ field: column_map (field → ชื่อคอลัมน์) ก่อน แล้วจึงชื่อใน DEFAULT_COLUMNS
+    คืน dict field → ชื่อคอลัมน์ในไฟล์ (field ที่หาไม่เจอจะไม่อยู่ใน dict)
+    ต้องมี lat และ lon ไม่งั้น ValueError
+    """
+    column_map = column_map or {}
+    by_lower = {str(c).strip().lower(): c for c in header}
+    resolved = {}
+    for field, candidates in DEFAULT_COLUMNS.items():
+        if field in column_map:
+            if column_map[field] not in header:
+                raise ValueError(f"ไม่พบคอลัมน์ '{column_map[field]}' (สำหรับ {field}) ในไฟล์")
+            resolved[field] = column_map[field]
+            continue
+        for name in candidates:
+            if name in by_lower:
+                resolved[field] = by_lower[name]
+                break
+    missing = [f for f in ('lat', 'lon') if f not in resolved]
+    if missing:
+        raise ValueError(f"ไม่พบคอลัมน์พิกัด {missing} - กำหนดผ่าน column_map ได้ เช่น {{'lat': 'Latitude'}}")
+    return resolved
+
+
+def _iter_chunks(filepath, usecols, text_columns, chunk_size):
+    """อ่านไฟล์ทีละ chunk (DataFrame) เฉพาะคอลัมน์ที่ใช้ คอลัมน์ข้อความอ่านเป็น str"""
+    ext = os.path.splitext(filepath)[1].lower()
+    dtype = {c: str for c in text_columns}
+    if ext == ".csv":
+        yield from pd.read_csv(filepath, usecols=usecols, dtype=dtype, chunksize=chunk_size,
+                               encoding="utf-8-sig", keep_default_na=False, na_values=[""])
+    elif ext == ".parquet":
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_size, columns=usecols):
+            yield batch.to_pandas()
+    else:
+        # openpyxl อ่านทีละส่วนไม่ได้ → อ่านครั้งเดียวแล้วแบ่ง chunk
+        df = pd.read_excel(filepath, usecols=usecols, dtype=dtype)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+
+def _text(series):
+    """ค่าว่าง/None → 'N/A' แบบเดียวกับ parse_kml_points"""
+    values = series.astype("string").str.strip().fillna("")
+    return values.mask(values == "", "N/A").astype(object)
+
+
+def iter_table_points(filepath, column_map=None, chunk_size=100_000):
+    """
+    อ่าน fault points จาก CSV / XLSX / Parquet ทีละ chunk → DataFrame คอลัมน์เดียวกับ parse_kml_points
+    (lat, lon, ticket, sign, sla, region, site, online/mobile) ใช้กับไฟล์ที่ใหญ่เกิน memory ได้ (ยกเว้น XLSX)
+    - column_map: dict field → ชื่อคอลัมน์ในไฟล์ เช่น {'lat': 'Latitude', 'ticket': 'Incident ID'}
+      field ที่ไม่ได้กำหนดจะหาจากชื่อทั่วไป (DEFAULT_COLUMNS) ถ้าไม่มีเลยจะเป็น 'N/A'
+    - แปลงและตรวจพิกัดทั้ง chunk ด้วย numpy (ไม่สร้าง dict ทีละแถว)
+    - แถวที่พิกัดไม่ใช่ตัวเลข หรือนอกช่วง lat [-90, 90] / lon [-180, 180] ถูกตัดทิ้งพร้อม log
+    """
+    resolved = resolve_columns(_header(filepath), column_map)
+    usecols = list(dict.fromkeys(resolved.values()))
+    text_columns = [resolved[f] for f in TEXT_FIELDS if f in resolved]
+
+    n_rows, n_invalid = 0, 0
+    for chunk in _iter_chunks(filepath, usecols, text_columns, chunk_size):
+        lat = pd.to_numeric(chunk[resolved['lat']], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(chunk[resolved['lon']], errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        n_rows += len(chunk)
+        n_invalid += int((~valid).sum())
+
+        out = pd.DataFrame({'lat': lat[valid], 'lon': lon[valid]})
+        for field in TEXT_FIELDS:
+            out[field] = _text(chunk[resolved[field]][valid]).to_numpy() if field in resolved else "N/A"
+        yield out
+
+    if n_invalid:
+        logging.warning("ไฟล์ %s: ข้าม %d จาก %d แถวที่พิกัดไม่ถูกต้อง", filepath, n_invalid, n_rows)
+
+
+def parse_table_points(filepath, column_map=None, chunk_size=100_000):
+    """อ่าน fault points จากไฟล์ตารางทั้งไฟล์เป็น DataFrame เดียว (ดู iter_table_points)"""
+    chunks = list(iter_table_points(filepath, column_map, chunk_size))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(DEFAULT_COLUMNS))
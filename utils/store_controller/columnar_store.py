@@ -0,0 +1,314 @@
+import argparse
+import json
+import logging
+import os
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..parse_controller.parse_points import parse_kml_points
+from ..parse_controller.parse_table import is_table_file, parse_table_points
+
+np = lazy_import("numpy")
+
+META_FILE = "meta.json"
+STORE_VERSION = 1
+MISSING = -1  # code ของค่า None ในคอลัมน์ string
+
+# คอลัมน์ของ fault point (ตรงกับ dict จาก parse_kml_points + group)
+# numeric: เก็บเป็น array ความกว้างคงที่ (memory-map ได้), string: เก็บเป็น code int32 + dictionary
+POINT_SCHEMA = {
+    'lat': 'f8',
+    'lon': 'f8',
+    'ticket': 'str',
+    'sign': 'str',
+    'sla': 'str',
+    'region': 'str',
+    'site': 'str',
+    'online/mobile': 'str',
+}
+
+
+def _file_name(column):
+    return column.replace("/", "_").replace("\\", "_")
+
+
+class ColumnStore:
+    """
+    ที่เก็บข้อมูลแบบ columnar บน disk (append-only)
+      <root>/meta.json            schema, จำนวนแถว, ช่วงแถวของแต่ละ group
+      <root>/<column>.bin         ข้อมูลดิบ little-endian (string = code int32)
+      <root>/<column>.dict.json   dictionary ของคอลัมน์ string (code → ค่า)
+    meta.json ถูกเขียนทีหลังสุดแบบ atomic (os.replace) ถ้า append ค้างกลางทาง
+    ข้อมูลที่เกิน n_rows จะถูกตัดทิ้งตอน append ครั้งถัดไป
+    """
+
+    def __init__(self, root, schema=None):
+        self.root = root
+        meta_path = os.path.join(root, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if schema is not None and dict(schema) != self.meta['schema']:
+                raise ValueError(f"schema ไม่ตรงกับ store ที่มีอยู่: {root}")
+        else:
+            os.makedirs(root, exist_ok=True)
+            self.meta = {'version': STORE_VERSION, 'schema': dict(schema or POINT_SCHEMA),
+                         'n_rows': 0, 'groups': []}
+            self._write_meta()
+
+        self._dictionaries = {}
+        self._lookups = {}  # คอลัมน์ string → {ค่า: code} (สร้างครั้งเดียว เพิ่มค่าใหม่ตอน append)
+        self._decoders = {}  # คอลัมน์ string → array ของ dictionary + [None] (สร้างใหม่เมื่อ dictionary โต)
+        for column, kind in self.schema.items():
+            if kind == 'str':
+                path = self._path(column, ".dict.json")
+                values = []
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        values = json.load(f)
+                self._dictionaries[column] = values
+
+    # ---------- metadata ----------
+    @property
+    def schema(self):
+        return self.meta['schema']
+
+    @property
+    def n_rows(self):
+        return self.meta['n_rows']
+
+    @property
+    def groups(self):
+        """รายชื่อ group ตามลำดับที่ append (ไม่ซ้ำ)"""
+        return list(dict.fromkeys(g['group'] for g in self.meta['groups']))
+
+    def group_ranges(self, group):
+        """ช่วงแถว [(start, stop), ...] ของ group (append ได้หลายครั้ง)"""
+        return [(g['start'], g['stop']) for g in self.meta['groups'] if g['group'] == group]
+
+    def _path(self, column, suffix=".bin"):
+        return os.path.join(self.root, _file_name(column) + suffix)
+
+    def _dtype(self, column):
+        kind = self.schema[column]
+        return np.dtype('<i4') if kind == 'str' else np.dtype(kind).newbyteorder('<')
+
+    def _write_json(self, path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _write_meta(self):
+        self._write_json(os.path.join(self.root, META_FILE), self.meta)
+
+    # ---------- append ----------
+    def _encode(self, column, values):
+        """แปลงค่า string เป็น code (ค่าใหม่ต่อท้าย dictionary)"""
+        dictionary = self._dictionaries[column]
+        if column not in self._lookups:
+            self._lookups[column] = {v: i for i, v in enumerate(dictionary)}
+        lookup = self._lookups[column]
+        codes = np.empty(len(values), dtype='<i4')
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = MISSING
+                continue
+            value = str(value)
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            codes[i] = code
+        return codes
+
+    def append(self, columns, group=None, source=None):
+        """
+        ต่อท้ายข้อมูล columns: dict ชื่อคอลัมน์ → list/array (ทุกคอลัมน์ใน schema ยาวเท่ากัน)
+        group: ชื่อกลุ่ม (เช่น เดือน) ของแถวที่ append เก็บเป็นช่วงแถวใน meta.json
+        คืน (start, stop) ของแถวที่เพิ่ม
+        """
+        lengths = {len(columns[c]) for c in self.schema}
+        if len(lengths) != 1:
+            raise ValueError("ทุกคอลัมน์ต้องยาวเท่ากัน")
+        n_new = lengths.pop()
+        start = self.n_rows
+
+        for column, kind in self.schema.items():
+            if kind == 'str':
+                data = self._encode(column, columns[column])
+            else:
+                data = np.asarray(columns[column], dtype=self._dtype(column))
+            path = self._path(column)
+            with open(path, "ab") as f:
+                f.truncate(start * self._dtype(column).itemsize)  # ตัดส่วนที่ค้างจาก append ที่ไม่สำเร็จ
+                f.write(data.tobytes())
+
+        for column, dictionary in self._dictionaries.items():
+            self._write_json(self._path(column, ".dict.json"), dictionary)
+        self.meta['n_rows'] = start + n_new
+        if group is not None:
+            self.meta['groups'].append({'group': group, 'start': start, 'stop': start + n_new, 'source': source})
+        self._write_meta()
+        return start, start + n_new
+
+    # ---------- read ----------
+    def column(self, column):
+        """คอลัมน์ทั้งคอลัมน์แบบ memory-map (อ่านอย่างเดียว, ไม่ copy)"""
+        if self.n_rows == 0:
+            return np.empty(0, dtype=self._dtype(column))
+        return np.memmap(self._path(column), dtype=self._dtype(column), mode="r", shape=(self.n_rows,))
+
+    def dictionary(self, column):
+        return self._dictionaries[column]
+
+    def decode(self, column, codes):
+        """แปลง code กลับเป็นค่า string (object array, MISSING → None)"""
+        dictionary = self._dictionaries[column]
+        decoder = self._decoders.get(column)
+        if decoder is None or len(decoder) != len(dictionary) + 1:
+            decoder = self._decoders[column] = np.array(dictionary + [None], dtype=object)
+        return decoder[np.asarray(codes)]  # MISSING = -1 → ตัวสุดท้าย (None)
+
+    def update(self, column, rows, values):
+        """แก้ค่าคอลัมน์ตัวเลขของแถวที่มีอยู่แล้ว (เขียนทับใน .bin ตรง ๆ ผ่าน memmap)"""
+        if self.schema[column] == 'str':
+            raise ValueError(f"update ใช้ได้เฉพาะคอลัมน์ตัวเลข: {column}")
+        if self.n_rows == 0 or len(rows) == 0:
+            return
+        data = np.memmap(self._path(column), dtype=self._dtype(column), mode="r+", shape=(self.n_rows,))
+        data[np.asarray(rows)] = values
+        data.flush()
+        del data
+
+    def read(self, groups=None, columns=None):
+        """
+        อ่านแถวของ groups (None = ทุกแถว) คืน dict คอลัมน์ → array
+        ถ้าแถวที่ต้องการเป็นช่วงต่อเนื่องช่วงเดียว ผลคือ view ของ memmap (ไม่ copy)
+        คอลัมน์ string คืนเป็น code (ใช้ decode แปลงเอง) และมีคอลัมน์ 'group' เพิ่ม
+        """
+        columns = list(columns or self.schema)
+        if groups is None:
+            ranges = [(0, self.n_rows)]
+            labels = None
+        else:
+            ranges, labels = [], []
+            for group in groups:
+                for start, stop in self.group_ranges(group):
+                    ranges.append((start, stop))
+                    labels.append((group, stop - start))
+            ranges = _merge_ranges(ranges)
+
+        result = {}
+        for column in columns:
+            data = self.column(column)
+            parts = [data[start:stop] for start, stop in ranges]
+            result[column] = parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else data[0:0]
+        if labels is not None:
+            result['group'] = np.repeat(np.array([g for g, _ in labels], dtype=object),
+                                        [n for _, n in labels])
+        return result
+
+
+def _merge_ranges(ranges):
+    """รวมช่วงแถวที่ต่อกันพอดีเป็นช่วงเดียว (เพื่อให้อ่านเป็น view ได้)"""
+    merged = []
+    for start, stop in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def append_points(store, group, points, source=None):
+    """ต่อท้าย list ของ point dict (จาก parse_kml_points) เป็น group หนึ่ง"""
+    columns = {column: [p.get(column) for p in points] for column in store.schema}
+    return store.append(columns, group=group, source=source)
+
+
+def ingest_kml(store, group, filepath):
+    """อ่าน KML ด้วย parse_kml_points แล้วต่อท้ายลง store"""
+    points = parse_kml_points(filepath)
+    start, stop = append_points(store, group, points, source=os.path.basename(filepath))
+    logging.info("เพิ่ม %s (%s) ลง store: %d จุด (แถว %d-%d)", group, filepath, len(points), start, stop)
+    return start, stop
+
+
+def ingest_table(store, group, filepath, column_map=None):
+    """อ่าน CSV / XLSX / Parquet ด้วย parse_table_points แล้วต่อท้ายลง store ทั้งคอลัมน์ (ไม่ผ่าน dict)"""
+    table = parse_table_points(filepath, column_map)
+    columns = {column: table[column].to_numpy() for column in store.schema}
+    start, stop = store.append(columns, group=group, source=os.path.basename(filepath))
+    logging.info("เพิ่ม %s (%s) ลง store: %d จุด (แถว %d-%d)", group, filepath, len(table), start, stop)
+    return start, stop
+
+
+def read_points(store, groups=None):
+    """
+    อ่าน point จาก store เป็น list ของ dict แบบเดียวกับ parse_kml_points (+ 'group', 'key')
+    ใช้แทนการอ่าน KML ใน analyze_points_vs_redlines
+    """
+    data = store.read(groups)
+    decoded = {}
+    for column, kind in store.schema.items():
+        decoded[column] = store.decode(column, data[column]) if kind == 'str' else data[column].tolist()
+    group_labels = data['group'] if 'group' in data else _group_labels(store)
+    names = list(store.schema)
+    points = []
+    for i in range(len(group_labels)):
+        p = {name: decoded[name][i] for name in names}
+        p['group'] = p['key'] = group_labels[i]
+        points.append(p)
+    return points
+
+
+def iter_points(store, groups=None, chunk_size=100_000):
+    """
+    อ่าน point จาก store ทีละไม่เกิน chunk_size แถว (list ของ dict แบบ read_points ลำดับเดียวกัน)
+    อ่านจาก memmap เฉพาะช่วงแถวของ chunk - memory ไม่ขึ้นกับขนาด store
+    """
+    if groups is None:
+        segments, covered = [], 0
+        for g in sorted(store.meta['groups'], key=lambda g: g['start']):
+            if g['start'] > covered:
+                segments.append((None, covered, g['start']))
+            segments.append((g['group'], g['start'], g['stop']))
+            covered = g['stop']
+        if covered < store.n_rows:
+            segments.append((None, covered, store.n_rows))
+    else:
+        segments = [(group, start, stop) for group in groups for start, stop in store.group_ranges(group)]
+
+    names = list(store.schema)
+    columns = {name: store.column(name) for name in names}
+    for group, seg_start, seg_stop in segments:
+        for start in range(seg_start, seg_stop, chunk_size):
+            stop = min(start + chunk_size, seg_stop)
+            decoded = {name: store.decode(name, columns[name][start:stop]) if kind == 'str'
+                       else columns[name][start:stop].tolist()
+                       for name, kind in store.schema.items()}
+            points = []
+            for i in range(stop - start):
+                p = {name: decoded[name][i] for name in names}
+                p['group'] = p['key'] = group
+                points.append(p)
+            yield points
+
+
+def _group_labels(store):
+    labels = np.full(store.n_rows, None, dtype=object)
+    for g in store.meta['groups']:
+        labels[g['start']:g['stop']] = g['group']
+    return labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="เพิ่ม fault points จาก KML / CSV / XLSX / Parquet ลง columnar store")
+    parser.add_argument("store", help="โฟลเดอร์ของ store")
+    parser.add_argument("group", help="ชื่อกลุ่ม เช่น มกราคม")
+    parser.add_argument("points", help="ไฟล์ points (KML หรือไฟล์ตาราง)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    ingest = ingest_table if is_table_file(args.points) else ingest_kml
+    ingest(ColumnStore(args.store), args.group, args.points)
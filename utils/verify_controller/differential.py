@@ -0,0 +1,418 @@
+import argparse
+import glob
+import logging
+import math
+import os
+import tempfile
+from collections import defaultdict
+
+from ..lazy_controller.lazy_import import lazy_import
+from ..geom_controller.geom import get_transformer_to_utm
+from ..main_controller.main_analysis import ENGINES, analyze_points_vs_redlines
+from ..main_controller.chunked_analysis import analyze_points_chunked, load_results
+from ..main_controller.exclusive_assignment import ASSIGNMENTS, DIST_TIE_M
+from ..main_controller.shard_coordinator import plan_job, run_worker, merge_job
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pyproj = lazy_import("pyproj")
+
+REFERENCE_ENGINE = "distance"
+# สิ่งที่เทียบได้:
+#   engines   - ทุก engine เทียบกับ REFERENCE_ENGINE
+#   exclusive - assignment="exclusive" เทียบกับจุดที่ match ของ assignment="all" (เจ้าของ = เส้นที่ใกล้สุด)
+#   chunked   - analyze_points_chunked เทียบกับแบบ in-memory (ทั้งสอง assignment)
+#   sharded   - plan_job + run_worker + merge_job เทียบกับแบบ in-memory (ทั้งสอง assignment)
+MODES = ("engines", "exclusive", "chunked", "sharded")
+# chunk / shard เล็กเพื่อให้จุดของ synthetic case คร่อมหลาย chunk และหลาย shard
+DIFF_CHUNK_SIZE = 97
+DIFF_SHARDS = 3
+# ระยะ (m) ที่ถือว่าเท่ากัน (parallel engine คำนวณคนละสูตร ต่างกันระดับ 1e-10 m)
+DIST_TOL_M = 1e-6
+# quad_segs ของ corridor engine → ความคลาดของ buffer ที่มุม/ปลายเส้น = r * (1 - cos(pi / (4 * quad_segs)))
+CORRIDOR_QUAD_SEGS = 16
+MISMATCH_COLUMNS = ['case', 'engine', 'kind', 'redline', 'point_index', 'group', 'ticket', 'lat', 'lon',
+                    'reference', 'engine_value', 'distance_m', 'boundary']
+
+
+def boundary_band_m(threshold_m):
+    """ช่วงรอบ threshold ที่ engine อาจตัดสินต่างกันได้โดยชอบธรรม (ความคลาดของ buffer ใน corridor engine)"""
+    return threshold_m * (1 - math.cos(math.pi / (4 * CORRIDOR_QUAD_SEGS))) + DIST_TOL_M
+
+
+def _point_key(rec):
+    return (rec.get('group'), round(rec['lat'], 9), round(rec['lon'], 9), rec.get('ticket'),
+            rec.get('sign'), rec.get('site'))
+
+
+def _mismatch(kind, redline, index, row, reference, value, distance, boundary):
+    return {
+        'kind': kind, 'redline': redline, 'point_index': index,
+        'group': row.get('group'), 'ticket': row.get('ticket'), 'lat': row.get('lat'), 'lon': row.get('lon'),
+        'reference': reference, 'engine_value': value, 'distance_m': distance, 'boundary': boundary,
+    }
+
+
+def compare_results(reference, result, threshold_m, dist_tol_m=DIST_TOL_M):
+    """
+    เทียบผลของ engine หนึ่ง (points_df, redline_summary) กับผลอ้างอิง คืน list ของ mismatch (dict)
+    - points_df: nearest_redline, matched, distance_m ทีละจุด (แถวเรียงตามลำดับการอ่าน points เหมือนกันทุก engine)
+    - redline_summary: count_by_coords / count_by_details ต่อ redline
+    - match set: จุดที่ match ต่อ redline (เกิน/ขาด) และ distance_m ของจุดที่ match ทั้งคู่
+    ทุก mismatch ระบุจุด (index, group, ticket, lat, lon) และ redline
+    boundary = True ถ้าระยะอ้างอิงห่างจาก threshold ไม่เกิน boundary_band_m (หรือ nearest เสมอกันภายใน tolerance)
+    """
+    ref_df, ref_summary = reference
+    df, summary = result
+    band = boundary_band_m(threshold_m)
+    mismatches = []
+
+    if len(ref_df) != len(df):
+        mismatches.append(_mismatch('point_count', None, None, {}, len(ref_df), len(df), None, False))
+        return mismatches
+
+    ref_rows = ref_df.to_dict('records')
+    rows = df.to_dict('records')
+    for i, (a, b) in enumerate(zip(ref_rows, rows)):
+        near_threshold = abs(a['distance_m'] - threshold_m) <= band
+        if a['nearest_redline'] != b['nearest_redline']:
+            tie = abs(a['distance_m'] - b['distance_m']) <= dist_tol_m
+            mismatches.append(_mismatch('nearest_redline', a['nearest_redline'], i, a, a['nearest_redline'],
+                                        b['nearest_redline'], a['distance_m'], tie))
+        elif not abs(a['distance_m'] - b['distance_m']) <= dist_tol_m and not (
+                math.isinf(a['distance_m']) and math.isinf(b['distance_m'])):
+            mismatches.append(_mismatch('distance_m', a['nearest_redline'], i, a, a['distance_m'],
+                                        b['distance_m'], a['distance_m'], False))
+        if a['matched'] != b['matched']:
+            mismatches.append(_mismatch('matched', a['nearest_redline'], i, a, a['matched'], b['matched'],
+                                        a['distance_m'], near_threshold))
+
+    index_of = {}
+    for i, row in enumerate(ref_rows):
+        index_of.setdefault(_point_key(row), i)
+
+    for rl_name in sorted(set(ref_summary) | set(summary)):
+        ref_info, info = ref_summary.get(rl_name), summary.get(rl_name)
+        if ref_info is None or info is None:
+            mismatches.append(_mismatch('redline_missing', rl_name, None, {}, ref_info is not None,
+                                        info is not None, None, False))
+            continue
+        ref_matches, matches = defaultdict(list), defaultdict(list)
+        for rec in ref_info['raw_matches']:
+            ref_matches[_point_key(rec)].append(rec)
+        for rec in info['raw_matches']:
+            matches[_point_key(rec)].append(rec)
+        point_mismatches = []
+        for key in ref_matches.keys() | matches.keys():
+            a, b = ref_matches.get(key, []), matches.get(key, [])
+            rec = (a or b)[0]
+            dist = rec['distance_m']
+            if len(a) != len(b):
+                point_mismatches.append(_mismatch('match_set', rl_name, index_of.get(key), rec, len(a), len(b),
+                                                  dist, abs(dist - threshold_m) <= band))
+            elif not abs(a[0]['distance_m'] - b[0]['distance_m']) <= dist_tol_m:
+                point_mismatches.append(_mismatch('match_distance', rl_name, index_of.get(key), rec,
+                                                  a[0]['distance_m'], b[0]['distance_m'], dist, False))
+
+        # จำนวนต่อ redline ที่ต่างกันเพราะจุดที่ขอบ threshold เท่านั้น → boundary เช่นกัน
+        only_boundary = bool(point_mismatches) and all(m['boundary'] for m in point_mismatches)
+        for field in ('count_by_coords', 'count_by_details', 'count_all', 'count_exclusive'):
+            if field in ref_info and field in info and ref_info[field] != info[field]:
+                mismatches.append(_mismatch(field, rl_name, None, {}, ref_info[field], info[field], None,
+                                            only_boundary))
+        mismatches.extend(sorted(point_mismatches, key=lambda m: (m['point_index'] is None, m['point_index'])))
+    return mismatches
+
+
+def compare_exclusive(all_result, exclusive_result, tie_m=DIST_TIE_M):
+    """
+    ตรวจผลของ assignment="exclusive" กับผลของ assignment="all" (engine เดียวกัน) คืน list ของ mismatch
+    - จุดที่ match ใน "all" ต้องถูกนับให้เส้นเดียวพอดี ด้วย record เท่ากับที่เส้นนั้นมีใน "all" (exclusive_count)
+    - เส้นนั้นต้องใกล้สุด (exclusive_owner) เสมอกันภายใน tie_m → เส้นที่มาก่อน (exclusive_tie)
+    - count_all / count_exclusive ของทั้งสองแบบต้องตรงกัน
+    """
+    all_summary, exclusive_summary = all_result[1], exclusive_result[1]
+    order = {name: i for i, name in enumerate(all_summary)}
+    candidates, owners = defaultdict(dict), defaultdict(lambda: defaultdict(list))
+    for name, info in all_summary.items():
+        for rec in info['raw_matches']:
+            candidates[_point_key(rec)].setdefault(name, []).append(rec)
+    for name, info in exclusive_summary.items():
+        for rec in info['raw_matches']:
+            owners[_point_key(rec)][name].append(rec)
+
+    mismatches = []
+    for key in list(candidates) + [k for k in owners if k not in candidates]:
+        routes, owned = candidates.get(key, {}), owners.get(key, {})
+        rec = next(iter((routes or owned).values()))[0]
+        owner = next(iter(owned), None)
+        n_records = len(routes.get(owner, []))
+        if len(owned) != 1 or len(owned[owner]) != n_records:
+            mismatches.append(_mismatch('exclusive_count', ", ".join(owned), None, rec, n_records,
+                                        sum(len(recs) for recs in owned.values()), rec['distance_m'], False))
+            continue
+        best = min(recs[0]['distance_m'] for recs in routes.values())
+        nearest = sorted((name for name, recs in routes.items() if recs[0]['distance_m'] - best <= tie_m),
+                         key=order.get)
+        if owner not in nearest:
+            mismatches.append(_mismatch('exclusive_owner', owner, None, rec, nearest[0], owner,
+                                        routes[owner][0]['distance_m'] if owner in routes else None, False))
+        elif owner != nearest[0]:
+            mismatches.append(_mismatch('exclusive_tie', owner, None, rec, nearest[0], owner, best, False))
+
+    for name in all_summary:
+        a, b = all_summary[name], exclusive_summary.get(name, {})
+        for field, expected, value in (('count_all', a['count'], b.get('count_all')),
+                                       ('count_exclusive', a.get('count_exclusive'), b.get('count'))):
+            if expected != value:
+                mismatches.append(_mismatch(field, name, None, {}, expected, value, None, False))
+    return mismatches
+
+
+def compare_pipeline(reference, ref_reports, result, reports, threshold_m):
+    """
+    เทียบผลของ pipeline อื่น (chunked / sharded) กับแบบ in-memory ที่ option เดียวกัน - ต้องเท่ากันทุกค่า
+    compare_results + points_df ทุกคอลัมน์ (points_df) + report ทุกตัวตามลำดับ (report: redline = ชื่อ report)
+    """
+    if result[0] is None:
+        return [_mismatch('point_count', None, None, {}, len(reference[0]), None, None, False)]
+    mismatches = compare_results(reference, result, threshold_m, dist_tol_m=0)
+    try:
+        pd.testing.assert_frame_equal(reference[0].reset_index(drop=True), result[0].reset_index(drop=True))
+    except AssertionError as e:
+        mismatches.append(_mismatch('points_df', None, None, {}, None, str(e).splitlines()[0], None, False))
+    if list(ref_reports) != list(reports):
+        mismatches.append(_mismatch('report', None, None, {}, ", ".join(ref_reports), ", ".join(reports), None, False))
+    for name in ref_reports.keys() & reports.keys():
+        try:
+            pd.testing.assert_frame_equal(ref_reports[name].reset_index(drop=True),
+                                          reports[name].reset_index(drop=True))
+        except AssertionError as e:
+            mismatches.append(_mismatch('report', name, None, {}, None, str(e).splitlines()[0], None, False))
+    return mismatches
+
+
+def _run_chunked(points_grouped, redlines_files, workdir, threshold_m, assignment, reports, options):
+    results, summary = analyze_points_chunked(points_grouped, redlines_files, workdir, threshold_m=threshold_m,
+                                              reports=reports, chunk_size=DIFF_CHUNK_SIZE,
+                                              engine=REFERENCE_ENGINE, assignment=assignment, **options)
+    return (None if results is None else load_results(results)), summary
+
+
+def _run_sharded(points_grouped, redlines_files, workdir, threshold_m, assignment, reports, options):
+    plan_job(workdir, points_grouped, redlines_files, DIFF_SHARDS, threshold_m=threshold_m,
+             chunk_size=DIFF_CHUNK_SIZE, engine=REFERENCE_ENGINE, assignment=assignment, **options)
+    _, failed = run_worker(workdir)
+    if failed:
+        raise RuntimeError(f"shard ที่ล้มเหลว: {failed}")
+    stores, summary = merge_job(workdir, reports)
+    if stores is None:
+        return None, None
+    return pd.concat([load_results(store) for store in stores], ignore_index=True), summary
+
+
+def run_differential(points_grouped, redlines_files, threshold_m=100, engines=ENGINES, case="", modes=MODES,
+                     **options):
+    """
+    รัน analyze_points_vs_redlines ด้วย REFERENCE_ENGINE เป็นผลอ้างอิง แล้วเทียบตาม modes (ดู MODES)
+    options ส่งต่อให้ทุก pipeline ที่เปิด (เช่น simplify_ratio, hotspot_radius_m - chunked/sharded ต้องรองรับด้วย)
+    คืน DataFrame ของ mismatch (ว่าง = ผลเดียวกันทุกแบบ) คอลัมน์ engine = engine หรือ "<mode>/<assignment>"
+    """
+    runs = {}
+
+    def in_memory(assignment):
+        if assignment not in runs:
+            reports = {}
+            result = analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=threshold_m,
+                                                engine=REFERENCE_ENGINE, reports=reports, use_cache=False,
+                                                **dict(options, assignment=assignment))
+            runs[assignment] = result, reports
+        return runs[assignment]
+
+    reference, _ = in_memory("all")
+    if reference[0] is None:
+        logging.warning("case %s: ไม่มี points - ข้าม", case)
+        return pd.DataFrame(columns=MISMATCH_COLUMNS)
+
+    ref_df = reference[0]
+    n_boundary = int((abs(ref_df['distance_m'] - threshold_m) <= boundary_band_m(threshold_m)).sum())
+    rows = []
+
+    def collect(label, found):
+        for m in found:
+            m.update(case=case, engine=label)
+        rows.extend(found)
+        n_hard = sum(1 for m in found if not m['boundary'])
+        logging.info("case %s: %s vs %s - %d จุด (ใกล้ threshold %d จุด), mismatch %d (นอก boundary %d)",
+                     case, label, REFERENCE_ENGINE, len(ref_df), n_boundary, len(found), n_hard)
+
+    if "engines" in modes:
+        for engine in engines:
+            if engine == REFERENCE_ENGINE:
+                continue
+            result = analyze_points_vs_redlines(points_grouped, redlines_files, threshold_m=threshold_m,
+                                                engine=engine, use_cache=False, **options)
+            collect(engine, compare_results(reference, result, threshold_m))
+    if "exclusive" in modes:
+        collect("exclusive", compare_exclusive(reference, in_memory("exclusive")[0]))
+    for mode, run in (("chunked", _run_chunked), ("sharded", _run_sharded)):
+        if mode not in modes:
+            continue
+        for assignment in ASSIGNMENTS:
+            expected, expected_reports = in_memory(assignment)
+            reports = {}
+            with tempfile.TemporaryDirectory() as workdir:
+                result = run(points_grouped, redlines_files, workdir, threshold_m, assignment, reports, options)
+            collect(f"{mode}/{assignment}", compare_pipeline(expected, expected_reports, result, reports, threshold_m))
+    return pd.DataFrame(rows, columns=MISMATCH_COLUMNS)
+
+
+# ---------- synthetic cases ----------
+def _write_points_kml(path, lons, lats, tickets):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n')
+        for lon, lat, ticket in zip(lons, lats, tickets):
+            f.write(f'<Placemark><ExtendedData><SchemaData><SimpleData name="TICKET">{ticket}</SimpleData>'
+                    f'<SimpleData name="Sign">Confirm</SimpleData><SimpleData name="Site">SYN{ticket[-4:]}</SimpleData>'
+                    f'</SchemaData></ExtendedData><Point><coordinates>{lon:.10f},{lat:.10f},0</coordinates></Point>'
+                    f'</Placemark>\n')
+        f.write('</Document></kml>\n')
+
+
+def _write_line_kml(path, parts):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n')
+        for part in parts:
+            coords = " ".join(f"{lon:.10f},{lat:.10f},0" for lon, lat in part)
+            f.write(f'<Placemark><LineString><coordinates>{coords}</coordinates></LineString></Placemark>\n')
+        f.write('</Document></kml>\n')
+
+
+def synthetic_case(workdir, seed=0, threshold_m=100, n_redlines=6, n_random=200, n_boundary=200,
+                   center=(99.5, 18.5), n_groups=3, n_repeated=10):
+    """
+    สร้างกรณีทดสอบสุ่มเป็นไฟล์ KML ใน workdir คืน (points_grouped, redlines_files)
+    - จุดแบ่งเป็น n_groups ไฟล์ (กลุ่ม) ตามลำดับ กลุ่มสุดท้ายมี n_repeated จุดแรกซ้ำอีกครั้ง
+      (ทดสอบ dedupe ข้ามกลุ่ม / ข้าม chunk / ข้าม shard)
+    - redline: เส้นสุ่มหลาย vertex (บางเส้นหลาย part) + เส้นซ้ำ 1 เส้น (ทดสอบ alias)
+    - จุดสุ่มรอบเส้น + จุดที่วางห่างจากเส้นเท่ากับ threshold ± (0, 1e-6 … 1 m)
+      ทั้งกลาง segment และรอบ vertex/ปลายเส้น (ตำแหน่งที่ buffer ประมาณวงกลม)
+    - จุดที่ห่างจาก 2 เส้นขนานเท่ากันพอดี (ทดสอบการเลือก nearest เมื่อเสมอกัน)
+    center ใกล้ขอบ UTM zone (เช่น (102.0, 17.0)) ใช้ทดสอบจุด/เส้นที่คร่อม zone
+    """
+    rng = np.random.default_rng(seed)
+    lon0, lat0 = center
+    epsg = 32600 + int((lon0 + 180) // 6) + 1
+    to_utm = get_transformer_to_utm(epsg)
+    to_lonlat = pyproj.Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+    x0, y0 = to_utm.transform(lon0, lat0)
+
+    lines = []  # list ของ parts (UTM)
+    for _ in range(n_redlines):
+        parts = []
+        for _ in range(rng.integers(1, 3)):
+            n_vertex = int(rng.integers(2, 12))
+            start = np.array([x0, y0]) + rng.uniform(-5000, 5000, 2)
+            steps = rng.normal(0, 800, (n_vertex - 1, 2))
+            parts.append(np.vstack([start, start + np.cumsum(steps, axis=0)]))
+        lines.append(parts)
+    # เส้นขนาน 2 เส้นห่างกัน 2 * threshold (จุดตรงกลาง = เสมอกัน)
+    base = np.array([x0, y0]) + rng.uniform(-3000, 3000, 2)
+    lines.append([np.array([base, base + [3000, 0]])])
+    lines.append([np.array([base + [0, 2 * threshold_m], base + [3000, 2 * threshold_m]])])
+
+    pts = [np.array([x0, y0]) + rng.uniform(-6000, 6000, (n_random, 2))]
+    offsets = threshold_m + rng.choice([0, 1e-6, -1e-6, 1e-3, -1e-3, 0.05, -0.05, 0.1, -0.1, 1, -1], n_boundary)
+    for k in range(n_boundary):
+        part = lines[rng.integers(len(lines) - 2)][0]
+        if rng.random() < 0.5:
+            # กลาง segment: ตั้งฉากกับ segment
+            j = rng.integers(len(part) - 1)
+            a, b = part[j], part[j + 1]
+            t = rng.uniform(0.2, 0.8)
+            direction = (b - a) / np.hypot(*(b - a))
+            normal = np.array([-direction[1], direction[0]]) * rng.choice([-1, 1])
+            pts.append((a + t * (b - a) + normal * offsets[k])[None])
+        else:
+            # รอบ vertex / ปลายเส้น: ทิศสุ่ม
+            angle = rng.uniform(0, 2 * np.pi)
+            vertex = part[rng.integers(len(part))]
+            pts.append((vertex + offsets[k] * np.array([np.cos(angle), np.sin(angle)]))[None])
+    pts.append((base + [rng.uniform(100, 2900), threshold_m])[None])
+    xy = np.vstack(pts)
+
+    lons, lats = to_lonlat.transform(xy[:, 0], xy[:, 1])
+    tickets = np.array([f"SYN{seed}_{i:04d}" for i in range(len(xy))])
+    parts = np.array_split(np.arange(len(xy)), n_groups)
+    parts[-1] = np.concatenate([parts[-1], parts[0][:n_repeated]])
+    points_grouped = {}
+    for g, ids in enumerate(parts):
+        points_file = os.path.join(workdir, f"points_{seed}_{g}.kml")
+        _write_points_kml(points_file, lons[ids], lats[ids], tickets[ids])
+        points_grouped[f"synthetic_{seed}_{g}"] = points_file
+
+    redlines_files = []
+    for r, parts in enumerate(lines):
+        parts_ll = [np.column_stack(to_lonlat.transform(p[:, 0], p[:, 1])) for p in parts]
+        path = os.path.join(workdir, f"redline_{seed}_{r}.kml")
+        _write_line_kml(path, parts_ll)
+        redlines_files.append(path)
+    # ไฟล์ซ้ำ (geometry เดียวกันคนละชื่อ) → ทดสอบการรวม alias
+    dup = os.path.join(workdir, f"redline_{seed}_dup.kml")
+    _write_line_kml(dup, [np.column_stack(to_lonlat.transform(p[:, 0], p[:, 1])) for p in lines[0]])
+    redlines_files.append(dup)
+    return points_grouped, redlines_files
+
+
+def synthetic_center(seed):
+    """seed คี่ใช้ข้อมูลคร่อมขอบ UTM zone 47/48 (ลองจิจูด 102)"""
+    return (102.0, 17.0) if seed % 2 else (99.5, 18.5)
+
+
+def real_cases(root="."):
+    """ข้อมูลจริง: ไฟล์ points ใน Test/ (ที่มี <Point>) กับ redline ใน Root/ และ Test/ (ที่มี <LineString>)"""
+    points_grouped, redlines_files = {}, sorted(glob.glob(os.path.join(root, "Root", "*.kml")))
+    for path in sorted(glob.glob(os.path.join(root, "Test", "**", "*.kml"), recursive=True)):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        if "<Point>" in text:
+            points_grouped[os.path.relpath(path, root)] = path
+        elif "<LineString>" in text:
+            redlines_files.append(path)
+    return points_grouped, redlines_files
+
+
+def run_all(threshold_m=100, n_synthetic=5, real=True, engines=ENGINES, root=".", modes=MODES):
+    """รันทุกกรณี (ข้อมูลจริง + synthetic) คืน DataFrame ของ mismatch ทั้งหมด"""
+    frames = []
+    if real:
+        points_grouped, redlines_files = real_cases(root)
+        frames.append(run_differential(points_grouped, redlines_files, threshold_m, engines, case="real",
+                                       modes=modes))
+    with tempfile.TemporaryDirectory() as workdir:
+        for seed in range(n_synthetic):
+            points_grouped, redlines_files = synthetic_case(workdir, seed, threshold_m, center=synthetic_center(seed))
+            frames.append(run_differential(points_grouped, redlines_files, threshold_m, engines,
+                                           case=f"synthetic_{seed}", modes=modes))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=MISMATCH_COLUMNS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="เทียบผลทุก engine / assignment / chunked / sharded กับ distance engine "
+                                                 "แบบ in-memory (ข้อมูลจริง + synthetic)")
+    parser.add_argument("--threshold", type=float, default=100, help="threshold (เมตร)")
+    parser.add_argument("--synthetic", type=int, default=5, help="จำนวนกรณีสุ่ม")
+    parser.add_argument("--no-real", action="store_true", help="ไม่รันข้อมูลจริงใน Test/ และ Root/")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="สิ่งที่เทียบ (ค่าเริ่มต้น: ทั้งหมด)")
+    parser.add_argument("--output", help="บันทึก mismatch เป็น CSV")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    mismatches = run_all(args.threshold, args.synthetic, real=not args.no_real, modes=args.modes)
+    hard = mismatches[~mismatches['boundary'].astype(bool)]
+    if args.output:
+        mismatches.to_csv(args.output, index=False, encoding="utf-8-sig")
+    if len(mismatches):
+        print(mismatches.to_string(max_rows=50))
+    print(f"mismatch ทั้งหมด {len(mismatches)} (ที่ขอบ threshold {len(mismatches) - len(hard)}, นอกขอบ {len(hard)})")
+    raise SystemExit(1 if len(hard) else 0)
@@ -1,6 +1,46 @@
-import plotly.graph_objects as go
+import json
+import math
+
+from utils.lazy_controller.lazy_import import lazy_import
+
+go = lazy_import("plotly.graph_objects")
+np = lazy_import("numpy")
+shapely = lazy_import("shapely")
+
+# ระดับ zoom ที่เตรียม geometry ไว้ (แผนที่ tile: zoom 0 = ทั้งโลก 256 px)
+LOD_ZOOMS = (5, 8, 11, 14)
+# tolerance ของการ simplify ต่อระดับ zoom = ขนาด 1 pixel (องศา) * ค่านี้
+LOD_PIXEL_TOLERANCE = 1.0
+# ใช้ระดับรายละเอียดที่เตรียมไว้สำหรับ zoom ไม่เกิน zoom ของแผนที่ + ค่านี้ (ตอนเริ่มและตอนผู้ใช้ zoom)
+LOD_ZOOM_AHEAD = 2
+# JavaScript (post_script ของ write_html / show) สลับ trace ของ redline ตาม zoom ของแผนที่
+# plotly แทน {plot_id} ด้วย id ของ div - ค่าอื่นแทนด้วย _lod_post_script
+LOD_POST_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+var zooms = __ZOOMS__, current = __ACTIVE__;
+gd.on('plotly_relayout', function (event) {
+    var zoom = event['__SUBPLOT__.zoom'];
+    if (zoom === undefined) return;
+    var level = 0;
+    for (var i = 0; i < zooms.length; i++) {
+        if (zooms[i] <= zoom + __AHEAD__) level = i;
+    }
+    if (level === current) return;
+    current = level;
+    Plotly.restyle(gd, {visible: zooms.map(function (_, i) { return i === level; })},
+                   zooms.map(function (_, i) { return i; }));
+    if (gd.layout.updatemenus && gd.layout.updatemenus.length) Plotly.relayout(gd, {'updatemenus[0].active': level});
+});
+"""
+
+def visualize_kml_data_interactive(points, redlines, single_trace=False, **kwargs):
+    """
+    single_trace=False: แบบเดิม - Scattergeo 1 trace ต่อ redline
+    single_trace=True: ใช้ visualize_kml_data_fast (redline ทั้งหมดใน trace เดียว + WebGL + decimation ตาม zoom)
+    """
+    if single_trace:
+        return visualize_kml_data_fast(points, redlines, **kwargs)
 
-def visualize_kml_data_interactive(points, redlines):
     fig = go.Figure()
 
     # วาด Redlines
@@ -68,3 +108,167 @@ def visualize_kml_data_interactive(points, redlines):
     )
 
     fig.show()
+
+# ---------- single-trace / decimated mode ----------
+def _redline_parts(redlines):
+    """
+    แปลง redlines เป็น (ชื่อ, LineString parts)
+    รับได้ทั้ง shapely geometry, dict {'name', 'geom'} (utils) และ dict {'name', 'geometry'} (test4)
+    """
+    names, geoms = [], []
+    for i, rl in enumerate(redlines):
+        if isinstance(rl, dict):
+            geom = rl.get('geom', rl.get('geometry'))
+            name = rl.get('name', f"redline {i + 1}")
+        else:
+            geom, name = rl, f"redline {i + 1}"
+        if geom is None or geom.is_empty:
+            continue
+        parts = shapely.get_parts(geom)
+        names.extend([name] * len(parts))
+        geoms.extend(parts)
+    return names, np.array(geoms, dtype=object)
+
+def _zoom_tolerance_deg(zoom):
+    """ขนาด 1 pixel (องศา) ที่ระดับ zoom ของแผนที่ tile"""
+    return 360.0 / (256 * 2 ** zoom) * LOD_PIXEL_TOLERANCE
+
+def _fit_zoom(lons, lats):
+    """ระดับ zoom ที่เห็นข้อมูลทั้งหมดพอดี (ประมาณ)"""
+    if len(lons) == 0:
+        return 5
+    extent = max(np.nanmax(lons) - np.nanmin(lons), np.nanmax(lats) - np.nanmin(lats), 1e-6)
+    return int(min(max(math.log2(360.0 / extent), 0), 18))
+
+def pack_redlines(names, parts, tolerance_deg=None):
+    """
+    รวมทุกเส้นเป็น array เดียว คั่นแต่ละเส้นด้วย NaN (plotly ตัดเส้นที่ NaN)
+    tolerance_deg: ถ้ากำหนดจะ simplify (Douglas-Peucker) ก่อนรวม
+    คืน (lons, lats, hover_names) - hover_names ใช้เป็น lookup ชื่อ redline ต่อ vertex
+    """
+    if len(parts) == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=object)
+    if tolerance_deg:
+        parts = shapely.simplify(parts, tolerance_deg, preserve_topology=False)
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+
+    # ตำแหน่งที่ขึ้นเส้นใหม่ → แทรก NaN หนึ่งแถวก่อนหน้า
+    breaks = np.flatnonzero(np.diff(part_idx)) + 1
+    lons = np.insert(coords[:, 0], breaks, np.nan)
+    lats = np.insert(coords[:, 1], breaks, np.nan)
+    hover = np.insert(np.asarray(names, dtype=object)[part_idx], breaks, None)
+    return lons, lats, hover
+
+def _map_trace_class():
+    """Scattermap (MapLibre, WebGL) ถ้ามี ไม่งั้นใช้ Scattermapbox (plotly รุ่นเก่า, WebGL เช่นกัน)"""
+    if hasattr(go, "Scattermap"):
+        return go.Scattermap, "map"
+    return go.Scattermapbox, "mapbox"
+
+def build_fast_figure(points, redlines, lod_zooms=LOD_ZOOMS, max_vertices=300_000):
+    """
+    สร้าง figure แบบเร็ว:
+      - redline ทุกเส้นอยู่ใน 1 trace ต่อระดับรายละเอียด (คั่นด้วย NaN, hover บอกชื่อ redline)
+      - fault points วาดด้วย WebGL scatter บนแผนที่ tile
+      - เตรียม geometry ที่ simplify ตามระดับ zoom ไว้หลายชุด แสดงทีละชุดตาม zoom ของแผนที่
+        (สลับอัตโนมัติเมื่อส่ง lod_post_script(fig) ให้ write_html / show - เมนูเลือกเองใช้สำรอง)
+        ชุดที่มี vertex เกิน max_vertices จะถูกข้าม
+    """
+    Scatter, subplot = _map_trace_class()
+    fig = go.Figure()
+
+    names, parts = _redline_parts(redlines)
+    point_lons = np.array([float(p['lon']) for p in points])
+    point_lats = np.array([float(p['lat']) for p in points])
+
+    all_lons, all_lats = point_lons, point_lats
+    if len(parts):
+        coords = shapely.get_coordinates(parts)
+        all_lons = np.concatenate([all_lons, coords[:, 0]])
+        all_lats = np.concatenate([all_lats, coords[:, 1]])
+    start_zoom = _fit_zoom(all_lons, all_lats)
+
+    # ระดับรายละเอียดของ redline (zoom ต่ำ = simplify มาก)
+    levels = []
+    for zoom in lod_zooms:
+        lons, lats, hover = pack_redlines(names, parts, _zoom_tolerance_deg(zoom))
+        if levels and len(lons) > max_vertices:
+            break
+        levels.append((zoom, lons, lats, hover))
+    if not levels:
+        levels.append((None, *pack_redlines(names, parts)))
+
+    # ระดับเริ่มต้น = ระดับที่ละเอียดพอสำหรับ zoom ที่ fit ข้อมูล
+    active = 0
+    for i, (zoom, *_rest) in enumerate(levels):
+        if zoom is not None and zoom <= start_zoom + LOD_ZOOM_AHEAD:
+            active = i
+
+    for i, (zoom, lons, lats, hover) in enumerate(levels):
+        fig.add_trace(Scatter(
+            lon=lons,
+            lat=lats,
+            mode='lines',
+            line=dict(color='gray', width=1.5),
+            text=hover,
+            hovertemplate="%{text}<extra></extra>",
+            name=f"Redline (zoom {zoom}, {int(np.count_nonzero(~np.isnan(lons)))} vertices)",
+            visible=(i == active),
+        ))
+
+    fig.add_trace(Scatter(
+        lon=point_lons,
+        lat=point_lats,
+        mode='markers',
+        marker=dict(size=6, color='blue'),
+        text=[p.get('ticket') for p in points],
+        hovertemplate="%{text}<br>%{lat:.6f}, %{lon:.6f}<extra></extra>",
+        name='Points'
+    ))
+
+    # เมนูเลือกระดับรายละเอียดของ redline (trace สุดท้ายคือ points แสดงเสมอ)
+    buttons = []
+    for i, (zoom, lons, *_rest) in enumerate(levels):
+        visible = [j == i for j in range(len(levels))] + [True]
+        buttons.append(dict(label=f"redline zoom {zoom}", method="update", args=[{"visible": visible}]))
+
+    center = dict(lon=float(np.nanmean(all_lons)), lat=float(np.nanmean(all_lats))) if len(all_lons) else None
+    fig.update_layout(
+        title="Interactive KML Visualization",
+        margin=dict(l=0, r=0, t=40, b=0),
+        updatemenus=[dict(buttons=buttons, active=active, x=0.99, xanchor="right", y=0.99)] if len(buttons) > 1 else [],
+        legend=dict(
+            x=0.01,
+            y=0.99,
+            bgcolor='rgba(255,255,255,0.8)',
+            bordercolor='black'
+        ),
+        meta=dict(lod_zooms=[zoom for zoom, *_rest in levels], lod_active=active, lod_subplot=subplot),
+        **{subplot: dict(style="open-street-map", zoom=start_zoom, center=center)}
+    )
+    return fig
+
+def lod_post_script(fig):
+    """
+    post_script สำหรับ fig.write_html(..., post_script=...) / fig.show(post_script=...) ของ figure จาก build_fast_figure
+    เมื่อผู้ใช้ zoom แผนที่ (plotly_relayout) สลับไปแสดง redline ระดับรายละเอียดที่ตรงกับ zoom
+    คืน None ถ้ามีระดับเดียว
+    """
+    meta = fig.layout.meta or {}
+    zooms = meta.get('lod_zooms') or []
+    if len(zooms) < 2 or None in zooms:
+        return None
+    return (LOD_POST_SCRIPT.replace("__ZOOMS__", json.dumps(zooms))
+            .replace("__ACTIVE__", str(int(meta.get('lod_active', 0))))
+            .replace("__SUBPLOT__", meta.get('lod_subplot', "map"))
+            .replace("__AHEAD__", str(LOD_ZOOM_AHEAD)))
+
+def write_fast_html(fig, path, **kwargs):
+    """เขียน figure จาก build_fast_figure เป็น HTML พร้อมสลับระดับรายละเอียดตาม zoom (kwargs ส่งต่อให้ write_html)"""
+    fig.write_html(path, post_script=lod_post_script(fig), **kwargs)
+
+def visualize_kml_data_fast(points, redlines, **kwargs):
+    """แสดง figure จาก build_fast_figure (kwargs ส่งต่อให้ build_fast_figure)"""
+    fig = build_fast_figure(points, redlines, **kwargs)
+    fig.show(post_script=lod_post_script(fig))
+    return fig
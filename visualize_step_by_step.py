@@ -1,11 +1,39 @@
 import matplotlib.pyplot as plt
-from shapely.geometry import Point
-from shapely.ops import transform
+from matplotlib.collections import LineCollection
+import numpy as np
+import shapely
 from pyproj import Transformer
 
+from utils.geom_controller.geom import utm_epsg_for_lon
+
 # -------------------- เตรียม Projections --------------------
-utm_project = Transformer.from_crs("EPSG:4326", "EPSG:32647", always_xy=True).transform
-utm_project_inv = Transformer.from_crs("EPSG:32647", "EPSG:4326", always_xy=True).transform
+def projection_for_extent(redlines, points):
+    """
+    เลือก UTM zone จากกึ่งกลางของข้อมูล (redlines + points) แทนการ fix EPSG:32647
+    คืน (epsg, transformer ไป UTM, transformer กลับเป็น lon/lat)
+    """
+    coords = [shapely.get_coordinates(rl) for rl in redlines]
+    coords.append(np.array([[p['lon'], p['lat']] for p in points], dtype=float).reshape(-1, 2))
+    coords = np.concatenate(coords)
+    if len(coords) == 0:
+        lon, lat = 99.0, 15.0  # ประเทศไทย (zone 47N) กรณีไม่มีข้อมูล
+    else:
+        (min_lon, min_lat), (max_lon, max_lat) = coords.min(axis=0), coords.max(axis=0)
+        lon, lat = (min_lon + max_lon) / 2, (min_lat + max_lat) / 2
+    epsg = utm_epsg_for_lon(lon, lat)
+    forward = Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+    inverse = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+    return epsg, forward, inverse
+
+def _parts_xy(parts):
+    """พิกัดของหลาย part รวมเป็น x, y เดียว คั่นแต่ละ part ด้วย NaN สำหรับ Line2D เดียว"""
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+    breaks = np.flatnonzero(np.diff(part_idx)) + 1
+    return np.insert(coords[:, 0], breaks, np.nan), np.insert(coords[:, 1], breaks, np.nan)
+
+def _polygon_xy(polygon):
+    """พิกัดขอบนอกของ buffer (Polygon/MultiPolygon) คั่นแต่ละ part ด้วย NaN"""
+    return _parts_xy(shapely.get_exterior_ring(shapely.get_parts(polygon)))
 
 # -------------------- ข้อมูลตัวอย่าง (แทนที่ด้วยของคุณ) --------------------
 # redlines = [LineString([...]), ...]
@@ -14,55 +42,123 @@ utm_project_inv = Transformer.from_crs("EPSG:32647", "EPSG:4326", always_xy=True
 
 # -------------------- เริ่มต้น --------------------
 class RedlineVisualizer:
-    def __init__(self, redlines, points, sites, threshold_m=100):
-        self.redlines = [transform(utm_project, rl) for rl in redlines]
-        self.points_geom = [transform(utm_project, Point(p['lon'], p['lat'])) for p in points]
+    """
+    คลิกเพื่อไล่ดูทีละ redline
+    - คำนวณทุก step ไว้ก่อน (เส้น, buffer, จุดที่อยู่ใน buffer) ตอนเริ่ม
+    - พื้นหลัง (sites, redline ทั้งหมด, fault ทั้งหมดแบบจาง) วาดครั้งเดียวแล้วเก็บเป็นภาพ
+    - แต่ละ step อัปเดตเฉพาะ artist ของ redline ปัจจุบัน/buffer/จุดที่ match แล้ว blit
+    """
+
+    def __init__(self, redlines, points, sites, threshold_m=100, show=True):
         self.points_raw = points
         self.sites = sites
         self.threshold_m = threshold_m
         self.current_index = 0
+        self.epsg, forward, inverse = projection_for_extent(redlines, points)
+
+        self.steps = self._prepare_steps(redlines, points, forward, inverse)
+        self._background = None
 
         self.fig, self.ax = plt.subplots(figsize=(10, 8))
-        self._init_plot()
+        self._init_plot(redlines)
 
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
         self.cid = self.fig.canvas.mpl_connect('button_press_event', self.onclick)
-        plt.show()
+        if show:
+            plt.show()
+
+    def _prepare_steps(self, redlines, points, forward, inverse):
+        """คืน list ของ dict ต่อ redline: line_xy, buffer_xy, matched_lon, matched_lat"""
+        lons = np.array([p['lon'] for p in points], dtype=float)
+        lats = np.array([p['lat'] for p in points], dtype=float)
+        xs, ys = forward.transform(lons, lats)
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        point_tree = shapely.STRtree(shapely.points(xs, ys))
+
+        steps = []
+        for rl in redlines:
+            redline_utm = shapely.transform(rl, lambda c: np.column_stack(forward.transform(c[:, 0], c[:, 1])))
+            buffer = shapely.buffer(redline_utm, self.threshold_m)
+            shapely.prepare(buffer)
+
+            candidates = point_tree.query(buffer)
+            matched = candidates[shapely.contains_xy(buffer, xs[candidates], ys[candidates])]
+            matched.sort()
+
+            buffer_ll = shapely.transform(buffer, lambda c: np.column_stack(inverse.transform(c[:, 0], c[:, 1])))
+            steps.append({
+                'line_xy': _parts_xy(shapely.get_parts(rl)),
+                'buffer_xy': _polygon_xy(buffer_ll),
+                'matched_lon': lons[matched],
+                'matched_lat': lats[matched],
+            })
+        return steps
 
-    def _init_plot(self):
+    def _init_plot(self, redlines):
         self.ax.clear()
-        self.ax.set_title("Click to step through redlines")
+        self.ax.set_title(f"Click to step through redlines (UTM EPSG:{self.epsg})")
         self.ax.set_xlabel("Longitude")
         self.ax.set_ylabel("Latitude")
         self.ax.grid(True)
 
+        # พื้นหลัง: redline ทั้งหมด + fault ทั้งหมด (จาง) - วาดครั้งเดียว
+        segments = [shapely.get_coordinates(part) for rl in redlines for part in shapely.get_parts(rl)]
+        self.ax.add_collection(LineCollection(segments, colors='lightgray', linewidths=1, zorder=1))
+        self.ax.scatter([p['lon'] for p in self.points_raw], [p['lat'] for p in self.points_raw],
+                        c='lightsteelblue', s=8, marker='x', zorder=2, label='Faults')
+
         # วาด Sites
         site_lons = [s['lon'] for s in self.sites]
         site_lats = [s['lat'] for s in self.sites]
         self.ax.scatter(site_lons, site_lats, c='red', s=80, label='Sites', zorder=5)
+        self.ax.autoscale_view()
 
-        self.ax.legend()
+        # artist ของ step ปัจจุบัน (animated → ไม่ถูกวาดลงพื้นหลัง)
+        self.buffer_artist, = self.ax.plot([], [], color='orange', linewidth=1, zorder=3, animated=True)
+        self.redline_artist, = self.ax.plot([], [], color='gray', linestyle='--', linewidth=2,
+                                            zorder=3, animated=True)
+        self.matched_artist, = self.ax.plot([], [], linestyle='none', color='blue', markersize=7,
+                                            marker='x', zorder=4, animated=True)
+        self.status_artist = self.ax.text(0.01, 0.01, "", transform=self.ax.transAxes, zorder=6,
+                                          animated=True, bbox=dict(facecolor='white', alpha=0.8))
+        self.animated_artists = (self.buffer_artist, self.redline_artist, self.matched_artist, self.status_artist)
 
-    def onclick(self, event):
-        if self.current_index >= len(self.redlines):
-            self.ax.set_title("Redlines exhausted.")
-            self.fig.canvas.draw()
-            return
+        self.ax.legend(loc='upper right')
 
-        redline_utm = self.redlines[self.current_index]
-        redline_ll = transform(utm_project_inv, redline_utm)
-        x, y = redline_ll.xy
-        self.ax.plot(x, y, color='gray', linestyle='--', linewidth=2)
+    def _on_draw(self, event):
+        """เก็บภาพพื้นหลังใหม่ทุกครั้งที่มีการวาดเต็ม (เปิดหน้าต่าง/resize/zoom)"""
+        self._background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_animated()
 
-        buffer = redline_utm.buffer(self.threshold_m)
-        count = 0
+    def _draw_animated(self):
+        for artist in self.animated_artists:
+            self.ax.draw_artist(artist)
 
-        # วาด fault ที่อยู่ใน buffer
-        for pt_utm, pt_raw in zip(self.points_geom, self.points_raw):
-            if buffer.contains(pt_utm):
-                self.ax.scatter(pt_raw['lon'], pt_raw['lat'], c='blue', s=40, marker='x', zorder=4)
-                count += 1
+    def _blit(self):
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw()  # ครั้งแรก: _on_draw จะเก็บพื้นหลังและวาด artist ให้
+            return
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self.ax.bbox)
 
-        self.ax.set_title(f"Step {self.current_index+1}/{len(self.redlines)} - Found {count} faults")
-        self.current_index += 1
-        self.fig.canvas.draw()
+    def show_step(self, index):
+        """แสดง redline ลำดับ index (0-based)"""
+        step = self.steps[index]
+        self.redline_artist.set_data(*step['line_xy'])
+        self.buffer_artist.set_data(*step['buffer_xy'])
+        self.matched_artist.set_data(step['matched_lon'], step['matched_lat'])
+        self.status_artist.set_text(
+            f"Step {index+1}/{len(self.steps)} - Found {len(step['matched_lon'])} faults"
+        )
+        self._blit()
 
+    def onclick(self, event):
+        if self.current_index >= len(self.steps):
+            self.status_artist.set_text("Redlines exhausted.")
+            self._blit()
+            return
+
+        self.show_step(self.current_index)
+        self.current_index += 1